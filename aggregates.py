@@ -0,0 +1,316 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Mon Oct 19 01:34:09 2026
+
+@author: rogerduong
+
+Aggregates of the singapore_queries.sql reports, maintained by load.py while
+it streams the elements, so that the reports do not scan the loaded tables:
+
+- exact counters of the elements by type, of the tag keys, of the values of
+  the low cardinality keys of VALUE_KEYS, and of the DETAIL_KEYS values of
+  the nodes by DETAIL_AMENITIES amenity (cuisines of the restaurants,
+  religions of the places of worship...)
+- a HyperLogLog estimate of the number of unique users
+- Space-Saving top-k sketches of the contributing users and of the tags
+
+As in singapore_queries.sql, users and tags are counted over the nodes and
+ways, and the amenity details over the nodes with a tag of any key whose
+value is the amenity. The aggregates of the shards
+processed in parallel are merged.
+
+python aggregates.py [data/aggregates.json] prints the report.
+"""
+
+import argparse
+import collections
+import functools
+import hashlib
+import heapq
+import json
+import math
+import sqlite3
+
+AGGREGATES_PATH = "data/aggregates.json"
+
+# Keys whose values are counted exactly
+VALUE_KEYS = ('amenity', 'city', 'sport', 'leisure', 'shop', 'tourism')
+
+# Keys of the nodes counted by amenity, and the amenities of the report
+DETAIL_KEYS = ('cuisine', 'religion')
+DETAIL_AMENITIES = ('restaurant', 'cafe', 'fast_food', 'place_of_worship')
+
+# Items kept by the Space-Saving sketches, and items reported
+CAPACITY = 1000
+TOP = 20
+
+CREATE_SUMMARY = """
+DROP TABLE IF EXISTS summary;
+
+CREATE TABLE summary (
+    statistic TEXT NOT NULL,
+    key TEXT NOT NULL,
+    value TEXT NOT NULL,
+    count INTEGER NOT NULL,
+    error INTEGER NOT NULL
+);
+"""
+
+
+@functools.lru_cache(maxsize=1 << 16)
+def register(value, precision):
+    """Return the (index, rank) of the HyperLogLog register of a value
+
+    Values are hashed with a 64-bit blake2b digest, which unlike hash() does
+    not change between processes. Most elements come from a few users, so
+    the registers of the recent values are cached.
+    """
+    h = int.from_bytes(hashlib.blake2b(str(value).encode(), digest_size=8).digest(),
+                       'big')
+    rest_bits = 64 - precision
+    return h >> rest_bits, rest_bits - (h & ((1 << rest_bits) - 1)).bit_length() + 1
+
+
+class HyperLogLog(object):
+    """HyperLogLog estimate of the number of distinct values
+
+    The registers do not depend on the process (see register), so the
+    sketches of the workers can be merged.
+
+    Args:
+        precision: number of bits of the register index (2**precision
+            registers of one byte, relative standard error of
+            1.04 / sqrt(2**precision))
+    """
+
+    def __init__(self, precision=14):
+        self.precision = precision
+        self.registers = bytearray(1 << precision)
+
+    def add(self, value):
+        index, rank = register(value, self.precision)
+        if rank > self.registers[index]:
+            self.registers[index] = rank
+
+    def merge(self, other):
+        self.registers = bytearray(map(max, self.registers, other.registers))
+
+    def estimate(self):
+        m = len(self.registers)
+        estimate = (0.7213 / (1 + 1.079 / m) * m * m /
+                    sum(2.0 ** -register for register in self.registers))
+        zeros = self.registers.count(0)
+        if estimate <= 2.5 * m and zeros:
+            # Small range correction: linear counting
+            estimate = m * math.log(m / zeros)
+        return int(round(estimate))
+
+    def standard_error(self):
+        return 1.04 / math.sqrt(len(self.registers))
+
+
+class SpaceSaving(object):
+    """Space-Saving sketch of the most frequent items of a stream
+
+    At most capacity items are counted. A new item replaces the item with
+    the lowest count, and inherits its count as error: the count of an item
+    overestimates its frequency by at most its error. The items with the
+    lowest counts are found with a heap, with one entry per item, whose
+    counts are updated when they reach the top.
+
+    Args:
+        capacity: maximum number of items counted
+    """
+
+    def __init__(self, capacity=CAPACITY):
+        self.capacity = capacity
+        self.counts = {}
+        self.errors = {}
+        self.heap = []
+
+    def add(self, item):
+        counts = self.counts
+        if item in counts:
+            counts[item] += 1
+            return
+        if len(counts) < self.capacity:
+            counts[item] = 1
+            self.errors[item] = 0
+            heapq.heappush(self.heap, (1, item))
+            return
+        heap = self.heap
+        while heap[0][0] != counts[heap[0][1]]:
+            heapq.heapreplace(heap, (counts[heap[0][1]], heap[0][1]))
+        count, victim = heap[0]
+        del counts[victim]
+        del self.errors[victim]
+        counts[item] = count + 1
+        self.errors[item] = count
+        heapq.heapreplace(heap, (count + 1, item))
+
+    def min_count(self):
+        """Return the count of the items not kept: the lowest count if the
+        sketch is full, 0 otherwise"""
+        if len(self.counts) < self.capacity:
+            return 0
+        return min(self.counts.values())
+
+    def merge(self, other):
+        """Add the items of another sketch, as in the mergeable summaries of
+        Agarwal et al.: an item missing from a full sketch is counted with
+        its lowest count, as error"""
+        own_min, other_min = self.min_count(), other.min_count()
+        merged = []
+        for item in sorted(set(self.counts) | set(other.counts)):
+            merged.append((self.counts.get(item, own_min) + other.counts.get(item, other_min),
+                           self.errors.get(item, own_min) + other.errors.get(item, other_min),
+                           item))
+        merged = heapq.nsmallest(self.capacity, merged, key=lambda m: (-m[0], m[2]))
+        self.counts = {item: count for count, _, item in merged}
+        self.errors = {item: error for _, error, item in merged}
+        self.heap = [(count, item) for count, _, item in merged]
+        heapq.heapify(self.heap)
+
+    def top(self, n=TOP):
+        """Return the n items with the highest counts, as (item, count,
+        error), ties in item order"""
+        return [(item, count, self.errors[item]) for item, count in
+                heapq.nsmallest(n, self.counts.items(), key=lambda c: (-c[1], c[0]))]
+
+
+def ranked(counter):
+    """Return the (item, count) of a Counter by decreasing count, ties in
+    item order, so that the summary does not depend on the shards"""
+    return sorted(counter.items(), key=lambda c: (-c[1], c[0]))
+
+
+class Aggregates(object):
+    """Aggregates of the shaped and cleaned elements of a load
+
+    Args:
+        capacity: number of items of the Space-Saving sketches
+    """
+
+    def __init__(self, capacity=CAPACITY):
+        self.elements = collections.Counter()
+        self.users = HyperLogLog()
+        self.contributors = SpaceSaving(capacity)
+        self.tag_keys = collections.Counter()
+        self.top_tags = SpaceSaving(capacity)
+        self.tag_values = collections.Counter()
+        self.amenity_tags = collections.Counter()
+
+    def add(self, element_type, el):
+        """Add a shaped and cleaned element (see load.clean_element_dict)"""
+        self.elements[element_type] += 1
+        if element_type == 'relation':
+            return
+        attributes = el[element_type]
+        self.users.add(attributes['uid'])
+        self.contributors.add(attributes['user'])
+        tags = el[element_type + '_tags']
+        tag_keys, add_tag, tag_values = self.tag_keys, self.top_tags.add, self.tag_values
+        amenities = None
+        for tag in tags:
+            key, value = tag['key'], tag['value']
+            tag_keys[key] += 1
+            add_tag((key, value))
+            if key in VALUE_KEYS:
+                tag_values[(key, value)] += 1
+            if value in DETAIL_AMENITIES:
+                # Any key, as the subqueries of singapore_queries.sql
+                amenities = (amenities or set()) | {value}
+        if amenities and element_type == 'node':
+            for tag in tags:
+                if tag['key'] in DETAIL_KEYS:
+                    for amenity in sorted(amenities):
+                        self.amenity_tags[(amenity, tag['key'], tag['value'])] += 1
+
+    def merge(self, other):
+        """Add the aggregates of another load, e.g. of a shard"""
+        self.elements.update(other.elements)
+        self.users.merge(other.users)
+        self.contributors.merge(other.contributors)
+        self.tag_keys.update(other.tag_keys)
+        self.top_tags.merge(other.top_tags)
+        self.tag_values.update(other.tag_values)
+        self.amenity_tags.update(other.amenity_tags)
+
+    def rows(self, top=TOP):
+        """Return the (statistic, key, value, count, error) rows of the
+        summary table
+
+        statistic is 'elements' (key: element type), 'unique_users' (error:
+        standard error), 'top_users' (value: user), 'tag_keys', 'top_tags',
+        'tag_values' or 'amenity:<amenity>' (key: DETAIL_KEYS key).
+        """
+        rows = [('elements', element_type, '', count, 0)
+                for element_type, count in sorted(self.elements.items())]
+        unique_users = self.users.estimate()
+        rows.append(('unique_users', '', '', unique_users,
+                     int(round(unique_users * self.users.standard_error()))))
+        rows.extend(('top_users', '', user, count, error)
+                    for user, count, error in self.contributors.top(top))
+        rows.extend(('tag_keys', key, '', count, 0)
+                    for key, count in ranked(self.tag_keys))
+        rows.extend(('top_tags', key, value, count, error)
+                    for (key, value), count, error in self.top_tags.top(top))
+        rows.extend(('tag_values', key, value, count, 0)
+                    for (key, value), count in ranked(self.tag_values))
+        rows.extend(('amenity:' + amenity, key, value, count, 0)
+                    for (amenity, key, value), count in ranked(self.amenity_tags))
+        return rows
+
+    def summary(self, top=TOP):
+        """Return the summary as a dictionary of statistic: list of
+        {key, value, count, error}"""
+        summary = collections.OrderedDict()
+        for statistic, key, value, count, error in self.rows(top):
+            summary.setdefault(statistic, []).append(
+                {'key': key, 'value': value, 'count': count, 'error': error})
+        return summary
+
+    def write_json(self, path=AGGREGATES_PATH, top=TOP):
+        with open(path, 'w') as f:
+            json.dump(self.summary(top), f, indent=2)
+
+    def write_sqlite(self, db_path, top=TOP):
+        """Write the summary table of the database"""
+        conn = sqlite3.connect(db_path)
+        with conn:
+            conn.executescript(CREATE_SUMMARY)
+            conn.executemany('INSERT INTO summary VALUES (?, ?, ?, ?, ?)', self.rows(top))
+        conn.close()
+
+def print_report(summary, top=10):
+    """Print the statistics of the report from a summary"""
+    def print_rows(title, rows, label):
+        print(title)
+        for row in rows[:top]:
+            error = ' (+/- {0})'.format(row['error']) if row['error'] else ''
+            print('  {0:<30} {1:>10}{2}'.format(label(row), row['count'], error))
+
+    print_rows('Elements', summary.get('elements', []), lambda r: r['key'])
+    print_rows('Unique users', summary.get('unique_users', []), lambda r: 'estimate')
+    print_rows('Top contributing users', summary.get('top_users', []), lambda r: r['value'])
+    print_rows('Top tags', summary.get('tag_keys', []), lambda r: r['key'])
+    print_rows('Top tag values', summary.get('top_tags', []),
+               lambda r: '{0}={1}'.format(r['key'], r['value']))
+    for key in VALUE_KEYS:
+        print_rows('Top ' + key, [r for r in summary.get('tag_values', [])
+                                  if r['key'] == key], lambda r: r['value'])
+    for amenity in DETAIL_AMENITIES:
+        for key in DETAIL_KEYS:
+            rows = [r for r in summary.get('amenity:' + amenity, []) if r['key'] == key]
+            if rows:
+                print_rows('Top {0} of {1}'.format(key, amenity), rows, lambda r: r['value'])
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Print the report from the '
+                                     'aggregates of a load (load.py --aggregates)')
+    parser.add_argument('path', nargs='?', default=AGGREGATES_PATH)
+    parser.add_argument('--top', type=int, default=10)
+    args = parser.parse_args()
+    with open(args.path) as f:
+        print_report(json.load(f), args.top)
@@ -6,7 +6,11 @@ Created on Sat Sep  9 11:55:19 2017
 @author: rogerduong
 """
 
-import xml.etree.cElementTree as ET
+import compression
+import parsers
+
+import argparse
+import multiprocessing
 import re
 from collections import defaultdict
 
@@ -20,14 +24,52 @@ street_type_num looks for such strings.
 street_type_end = re.compile(r'([a-z]+)$', re.IGNORECASE)
 street_type_num = re.compile(r'([0-9]+)$', re.IGNORECASE)
 
-street_types = defaultdict(int)
-postal_codes_problem = defaultdict(int)
-
 lower = re.compile(r'^([a-z]|_)*$')
 lower_colon = re.compile(r'^([a-z]|_)*:([a-z]|_)*$')
 problemchars = re.compile(r'[=\/&<>;\'"\?%$@\,\. \t\r\n]')
 postal_code_correct = re.compile(r'^[0-9]{6}$')
 
+
+class AuditResult(object):
+    """Result of the audit of an OSM file (or of a shard of it)
+    
+    Attributes:
+        tags: dictionary counting the XML tags
+        keys: dictionary counting the tag keys by class (lower, lower_colon,
+            problemchars, other)
+        street_types: dictionary counting the street types
+        postal_codes_problem: dictionary counting the incorrect postal codes
+        street_corrections: dictionary counting the candidate corrections of
+            the street names, by (street_name, correction)
+    """
+
+    def __init__(self):
+        self.tags = defaultdict(int)
+        self.keys = {"lower": 0, "lower_colon": 0, "problemchars": 0, "other": 0}
+        self.street_types = defaultdict(int)
+        self.postal_codes_problem = defaultdict(int)
+        self.street_corrections = defaultdict(int)
+
+    def merge(self, other):
+        """Add the counts of another AuditResult to this one
+        
+        Args:
+            other: AuditResult to add
+        Returns:
+            self
+        """
+        for mine, theirs in [(self.tags, other.tags),
+                             (self.keys, other.keys),
+                             (self.street_types, other.street_types),
+                             (self.postal_codes_problem, other.postal_codes_problem),
+                             (self.street_corrections, other.street_corrections)]:
+            for k, v in theirs.items():
+                mine[k] = mine.get(k, 0) + v
+        return self
+
+    def __add__(self, other):
+        return AuditResult().merge(self).merge(other)
+
 def count_tags(filename):
     """Count the tags and return a dictionary with the tags
     
@@ -37,11 +79,7 @@ def count_tags(filename):
     Returns:
         tags_dict: a dictionary counting the tags       
     """
-    tags_dict = defaultdict(int)
-    for tag_elem in ET.iterparse(filename):
-        tags_dict[tag_elem[1].tag] += 1
-    print(tags_dict)
-    return tags_dict
+    return audit(filename).tags
 
 def key_type(element, keys):
     """Populate the dictionary 'keys' with element values with
@@ -54,26 +92,35 @@ def key_type(element, keys):
         keys: dictionary of audit summary
     """
     if element.tag == "tag":
-        value = element.get('v')
-        if lower.match(value):
+        key = element.get('k')
+        if lower.match(key):
             keys['lower'] += 1
-        elif lower_colon.match(value):
+        elif lower_colon.match(key):
             keys['lower_colon'] += 1
-        elif problemchars.match(value):
+        elif problemchars.search(key):
             keys['problemchars'] += 1
         else:
             keys['other'] += 1
     return keys
 
-def audit_street_type(street_types, street_name):
-    """Add the street_type in to the dictionary street_types
+def audit_street_type(street_types, street_name, corrector=None, corrections=None):
+    """Add the street_type in to the dictionary street_types, and the
+    candidate correction of street_name to the dictionary corrections
     
     Args:
         street_types: dictionary of street types
         street_name: string of street name to audit
+        corrector: fuzzy.StreetNameCorrector (see load.build_street_corrector),
+            or None not to look for corrections
+        corrections: dictionary of (street_name, correction)
     Returns:
         street_types: dictionary of street types
     """
+    if corrector is not None:
+        correction = corrector.correct(street_name)
+        if correction != street_name:
+            corrections[(street_name, correction)] += 1
+
     m_end = street_type_end.search(street_name)
     m_num = street_type_num.search(street_name)
 
@@ -116,31 +163,140 @@ def is_street_name(elem):
 def is_postal_code(elem):
     return (elem.tag == "tag") and (elem.attrib['k'] == "addr:postcode")
 
-def audit(osm_file):
-    """Audit function (main function). Print sorted dictionaries
-    for street names and postal codes
+def audit(osm_file, parser='etree', corrector=None):
+    """Audit function (main function). Count the tags, the tag keys by class,
+    the street types and the incorrect postal codes in a single pass
+    
+    Top level elements are cleared once audited, so memory use does not grow
+    with the file size.
+    
+    Args:
+        osm_file: OSM file (possibly compressed, or file-like object) to audit
+        parser: XML parser, 'etree', 'lxml' or 'expat' (see parsers.py)
+        corrector: fuzzy.StreetNameCorrector to count the candidate
+            corrections of the street names, or None
+    Returns:
+        AuditResult
+    """
+    result = AuditResult()
+    tags = result.tags
+    
+    tags['osm'] += 1
+    for elem in parsers.iterparse(osm_file, tags=None, parser=parser):
+        tags[elem.tag] += 1
+        for child in elem:
+            tags[child.tag] += 1
+            if child.tag == 'tag':
+                key_type(child, result.keys)
+                if is_street_name(child):
+                    audit_street_type(result.street_types, child.attrib['v'],
+                                      corrector, result.street_corrections)
+                elif is_postal_code(child):
+                    audit_postal_code(result.postal_codes_problem, child.attrib['v'])
+    return result
+
+def audit_shard(args):
+    """Audit one shard of an OSM file (see load.find_shards)
+    
+    Args:
+        args: tuple (osm_file, start, end, parser, corrector), osm_file
+            being the OSM file or the bytes of a chunk
+    Returns:
+        AuditResult
+    """
+    import load # load imports transform, which imports this module
+    osm_file, start, end, parser, corrector = args
+    reader = load.ShardReader(osm_file, start, end)
+    try:
+        result = audit(reader, parser, corrector)
+    finally:
+        reader.close()
+    # Each shard is wrapped in its own <osm> tag
+    result.tags['osm'] -= 1
+    return result
+
+def audit_parallel(osm_file, processes, parser='etree', corrector=None):
+    """Audit the shards of an OSM file in a process pool and merge the results
+    
+    Top level elements other than nodes, ways and relations (e.g. <bounds>)
+    are not part of any shard, and are not counted. Compressed files are
+    split into chunks of their decompressed stream (see load.iter_chunks).
+    
+    Args:
+        osm_file: OSM file to audit, possibly compressed
+        processes: number of worker processes
+        parser: XML parser, 'etree', 'lxml' or 'expat' (see parsers.py)
+        corrector: fuzzy.StreetNameCorrector to count the candidate
+            corrections of the street names, or None
+    Returns:
+        AuditResult
+    """
+    import load
+    result = AuditResult()
+    result.tags['osm'] += 1
+    source = None
+    try:
+        with multiprocessing.Pool(processes) as pool:
+            if compression.is_compressed(osm_file):
+                source = compression.open_input(osm_file, processes)
+                tasks = ((chunk, 0, len(chunk), parser, corrector)
+                         for chunk, _ in load.iter_chunks(source))
+            else:
+                tasks = [(osm_file, start, end, parser, corrector)
+                         for start, end in load.find_shards(osm_file, processes * 4)]
+            for shard_result in load.imap_bounded(pool, audit_shard, tasks,
+                                                  2 * processes):
+                result.merge(shard_result)
+    finally:
+        if source is not None:
+            source.close()
+    return result
+
+def print_audit(result):
+    """Print sorted dictionaries of an AuditResult
     
     Args:
-        osm_file: OSM file to audit
+        result: AuditResult
     Returns:
         print out of audit dictionary results:
             count_tags
             street_types
             postal_codes_problem
+            street_corrections
     """
-    keys = {"lower": 0, "lower_colon": 0, "problemchars": 0, "other": 0}
-    
-    for event, elem in ET.iterparse(osm_file):
-        keys = key_type(elem, keys)
-        if is_street_name(elem):
-            audit_street_type(street_types, elem.attrib['v'])
-        if is_postal_code(elem):
-            audit_postal_code(postal_codes_problem, elem.attrib['v'])
     print('--- Tag count ---')
-    count_tags(osm_file)
+    print(dict(result.tags))
     print('--- Street Types ---')
-    print_sorted_dict(street_types)
+    print_sorted_dict(result.street_types)
     print('--- Incorrect Postal Codes ---')
-    print_sorted_dict(postal_codes_problem)
+    print_sorted_dict(result.postal_codes_problem)
     print('--- Keys with suspected problems ---')
-    print(keys)
+    print(result.keys)
+    if result.street_corrections:
+        print('--- Candidate street name corrections ---')
+        for (street_name, correction), count in sorted(result.street_corrections.items()):
+            print("%s -> %s: %d" % (street_name, correction, count))
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Audit the tags, street types '
+                                     'and postal codes of an OSM file')
+    parser.add_argument('file_in', nargs='?', default=OSM_FILE,
+                        help='OSM file, possibly compressed (.osm.bz2, .osm.gz)')
+    parser.add_argument('--processes', type=int, default=1,
+                        help='number of worker processes')
+    parser.add_argument('--parser', choices=list(parsers.PARSERS), default='etree',
+                        help='XML parser (lxml requires lxml)')
+    parser.add_argument('--fuzzy-streets', action='store_true',
+                        help='report the candidate corrections of the misspelled '
+                             'street names, against the street names of the file '
+                             'counted by a first pass')
+    args = parser.parse_args()
+
+    corrector = None
+    if args.fuzzy_streets:
+        import load
+        corrector = load.build_street_corrector(args.file_in, args.parser)
+    if args.processes > 1:
+        print_audit(audit_parallel(args.file_in, args.processes, args.parser, corrector))
+    else:
+        print_audit(audit(args.file_in, args.parser, corrector))
@@ -0,0 +1,2 @@
+"""Benchmarks of the load pipeline. Run from the repository root, e.g.
+python -m benchmarks.bench_backends"""
@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 14:40:03 2026
+
+@author: rogerduong
+
+Compare the csv + sqlite3 shell .import path with the direct sqlite backend
+of load.process_map.
+"""
+
+import load
+import database
+
+import argparse
+import contextlib
+import os
+import time
+
+SAMPLE_PATH = "data/osm/singapore-shorter.osm"
+BENCH_DB_PATH = "data/bench.db"
+
+def time_csv(file_in, db_path):
+    """Write the csv(s), then import them as data/schema.sql does"""
+    start = time.perf_counter()
+    load.process_map(file_in, validate=False, backend='csv')
+    with database.SqliteWriter(load.FIELDS, db_path) as writer:
+        for key, path, _ in load.CSV_OUTPUTS:
+            writer.import_csv(key, path)
+    return time.perf_counter() - start
+
+def time_sqlite(file_in, db_path):
+    """Stream the shaped elements into the database"""
+    start = time.perf_counter()
+    load.process_map(file_in, validate=False, backend='sqlite', db_path=db_path)
+    return time.perf_counter() - start
+
+def bench(file_in, repeat):
+    results = {}
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        for name, func in [('csv + import', time_csv), ('sqlite', time_sqlite)]:
+            results[name] = min(func(file_in, BENCH_DB_PATH) for _ in range(repeat))
+    os.remove(BENCH_DB_PATH)
+
+    size = os.path.getsize(file_in) / 10**6
+    print('{0} ({1:.2f} MB), best of {2}'.format(file_in, size, repeat))
+    for name, seconds in results.items():
+        print('{0:<14}{1:8.3f} s {2:8.2f} MB/s'.format(name, seconds, size / seconds))
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('file_in', nargs='?', default=SAMPLE_PATH)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+    bench(args.file_in, args.repeat)
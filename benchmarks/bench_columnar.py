@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 19:58:26 2026
+
+@author: rogerduong
+
+Compare the csv and parquet backends of load.process_map: load time, size
+of the output, and time of reading it back for two analyses (top users of
+the nodes, histogram of the node tag keys).
+"""
+
+import load
+import columnar
+
+import argparse
+import collections
+import contextlib
+import csv
+import os
+import time
+
+SAMPLE_PATH = "data/osm/singapore-shorter.osm"
+PARQUET_DIR = "data/bench_parquet"
+
+def csv_analyses():
+    with open(load.NODES_PATH, newline='') as f:
+        users = collections.Counter(row['user'] for row in csv.DictReader(f))
+    with open(load.NODE_TAGS_PATH, newline='') as f:
+        keys = collections.Counter(row['key'] for row in csv.DictReader(f))
+    return users.most_common(10), keys.most_common(10)
+
+def parquet_analyses():
+    users = columnar.read_table('node', PARQUET_DIR, ['user']).column('user')
+    keys = columnar.read_table('node_tags', PARQUET_DIR, ['key']).column('key')
+    return [sorted(((c['counts'].as_py(), c['values'].as_py())
+                    for c in column.value_counts()), reverse=True)[:10]
+            for column in (users, keys)]
+
+def best_time(func, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+def size(paths):
+    return sum(os.path.getsize(path) for path in paths) / 10**6
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('file_in', nargs='?', default=SAMPLE_PATH)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        t_csv_load, _ = best_time(lambda: load.process_map(
+            args.file_in, validate=False, backend='csv'), args.repeat)
+        t_parquet_load, _ = best_time(lambda: load.process_map(
+            args.file_in, validate=False, backend='parquet',
+            parquet_dir=PARQUET_DIR), args.repeat)
+    csv_size = size(path for _, path, _ in load.CSV_OUTPUTS)
+    parquet_size = size(os.path.join(PARQUET_DIR, name)
+                        for name in columnar.FILES.values())
+
+    t_csv_read, (csv_users, csv_keys) = best_time(csv_analyses, args.repeat)
+    t_parquet_read, (parquet_users, parquet_keys) = best_time(parquet_analyses,
+                                                              args.repeat)
+    # Same counts (ties may be listed in a different order)
+    assert [c for _, c in csv_users] == [c for c, _ in parquet_users]
+    assert [c for _, c in csv_keys] == [c for c, _ in parquet_keys]
+
+    print('{0:<10} {1:>10} {2:>10} {3:>10}'.format('backend', 'load (s)', 'size (MB)', 'read (ms)'))
+    print('{0:<10} {1:>10.3f} {2:>10.2f} {3:>10.2f}'.format(
+        'csv', t_csv_load, csv_size, t_csv_read * 1000))
+    print('{0:<10} {1:>10.3f} {2:>10.2f} {3:>10.2f}'.format(
+        'parquet', t_parquet_load, parquet_size, t_parquet_read * 1000))
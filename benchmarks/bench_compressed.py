@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 23:37:52 2026
+
+@author: rogerduong
+
+Compare the load of a compressed OSM file streamed by load.process_map with
+the decompress-first flow (decompress to a .osm file, then load it), for
+single stream bzip2, multi-stream bzip2 (as written by pbzip2) and gzip
+files. Also time the decompression alone, by one process and in parallel.
+
+python -m benchmarks.bench_compressed --generate 100 --processes 4
+"""
+
+import compression
+import load
+from benchmarks import generate_osm
+
+import argparse
+import bz2
+import contextlib
+import gzip
+import os
+import shutil
+import time
+
+SAMPLE_PATH = "data/osm/singapore-shorter.osm"
+BENCH_DIR = "data/bench"
+
+# Uncompressed bytes per stream of the multi-stream bzip2 files, as pbzip2
+STREAM_SIZE = 900000
+
+def compress_inputs(file_in, out_dir):
+    """Write the single stream bzip2, multi-stream bzip2 and gzip versions of
+    file_in, and return their paths"""
+    name = os.path.join(out_dir, os.path.basename(file_in))
+    paths = {'bz2': name + '.bz2', 'bz2 multi-stream': name + '.multi.bz2',
+             'gzip': name + '.gz'}
+    with open(file_in, 'rb') as f, bz2.open(paths['bz2'], 'wb') as out:
+        shutil.copyfileobj(f, out, 1 << 20)
+    with open(file_in, 'rb') as f, open(paths['bz2 multi-stream'], 'wb') as out:
+        for block in iter(lambda: f.read(STREAM_SIZE), b''):
+            out.write(bz2.compress(block))
+    with open(file_in, 'rb') as f, gzip.open(paths['gzip'], 'wb') as out:
+        shutil.copyfileobj(f, out, 1 << 20)
+    return paths
+
+def time_decompress(path, processes):
+    """Return the seconds taken to decompress path, without writing it"""
+    start = time.perf_counter()
+    with compression.open_input(path, processes) as f:
+        while f.read(1 << 20):
+            pass
+    return time.perf_counter() - start
+
+def time_load(file_in, processes):
+    start = time.perf_counter()
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        load.process_map(file_in, validate=False, processes=processes)
+    return time.perf_counter() - start
+
+def time_decompress_first(path, processes, out_dir):
+    """Return the seconds taken to decompress path to disk, and to load it"""
+    start = time.perf_counter()
+    decompressed = os.path.join(out_dir, 'decompressed.osm')
+    with compression.open_input(path) as f, open(decompressed, 'wb') as out:
+        shutil.copyfileobj(f, out, 1 << 20)
+    decompress_seconds = time.perf_counter() - start
+    try:
+        return decompress_seconds, time_load(decompressed, processes)
+    finally:
+        os.remove(decompressed)
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('file_in', nargs='?', default=SAMPLE_PATH)
+    parser.add_argument('--generate', type=float, metavar='MB',
+                        help='use a generated input of this size instead')
+    parser.add_argument('--processes', type=int, default=os.cpu_count())
+    args = parser.parse_args()
+
+    out_dir = os.path.join(BENCH_DIR, 'compressed-{0}'.format(os.getpid()))
+    os.makedirs(out_dir, exist_ok=True)
+    try:
+        file_in = args.file_in
+        if args.generate:
+            file_in = os.path.join(out_dir, 'synthetic.osm')
+            generate_osm.generate(file_in, size=args.generate)
+        paths = compress_inputs(file_in, out_dir)
+        size = os.path.getsize(file_in) / 10**6
+        print('{0} ({1:.1f} MB), {2} processes'.format(file_in, size, args.processes))
+
+        print('{0:<18} {1:>8} {2:>16} {3:>16}'.format(
+            'decompression', 'MB', '1 process (MB/s)', 'parallel (MB/s)'))
+        for name, path in paths.items():
+            print('{0:<18} {1:>8.1f} {2:>16.1f} {3:>16.1f}'.format(
+                name, os.path.getsize(path) / 10**6, size / time_decompress(path, 1),
+                size / time_decompress(path, args.processes)))
+
+        print('{0:<18} {1:>17} {2:>10} {3:>10} {4:>12}'.format(
+            'load (s)', 'decompress first', 'of which', 'streamed', 'extra disk'))
+        print('{0:<18} {1:>17} {2:>10} {3:>10.2f} {4:>12}'.format(
+            'osm (no compression)', '', '', time_load(file_in, args.processes), ''))
+        for name, path in paths.items():
+            decompress_seconds, load_seconds = time_decompress_first(
+                path, args.processes, out_dir)
+            print('{0:<18} {1:>17.2f} {2:>10.2f} {3:>10.2f} {4:>9.1f} MB'.format(
+                name, decompress_seconds + load_seconds, decompress_seconds,
+                time_load(path, args.processes), size))
+    finally:
+        shutil.rmtree(out_dir, ignore_errors=True)
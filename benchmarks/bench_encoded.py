@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 23:58:31 2026
+
+@author: rogerduong
+
+Compare the storage layouts of the dataset: the csv files, the plain sqlite3
+database and the dictionary encoded database (load.py --encoded), by size,
+load time, and time of the singapore_queries.sql queries once both
+databases are optimized by database.optimize. The results of the queries
+(without their LIMIT, whose ties may come in any order) are checked to be
+the same in both layouts.
+
+python -m benchmarks.bench_encoded data/bench/synthetic-100mb.osm
+"""
+
+import database
+import load
+from benchmarks import bench_queries
+
+import argparse
+import contextlib
+import os
+import re
+import time
+
+SAMPLE_PATH = "data/osm/singapore-shorter.osm"
+PLAIN_DB_PATH = "data/bench_plain.db"
+ENCODED_DB_PATH = "data/bench_encoded.db"
+
+LIMIT = re.compile(r'\s+LIMIT\s+\d+', re.IGNORECASE)
+
+def time_load(file_in, backend, db_path=None, encoded=False):
+    start = time.perf_counter()
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        load.process_map(file_in, validate=False, backend=backend, db_path=db_path,
+                         encoded=encoded)
+    return time.perf_counter() - start
+
+def same_results(plain, encoded, query):
+    """Return True if the query has the same rows in both databases"""
+    query = LIMIT.sub('', query)
+    return (sorted(map(repr, plain.execute(query).fetchall())) ==
+            sorted(map(repr, encoded.execute(query).fetchall())))
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('file_in', nargs='?', default=SAMPLE_PATH)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    size = os.path.getsize(args.file_in) / 10**6
+    print('{0} ({1:.1f} MB)'.format(args.file_in, size))
+    print('{0:<10} {1:>10} {2:>16} {3:>16}'.format(
+        'layout', 'load (s)', 'size (MB)', 'optimized (MB)'))
+    seconds = time_load(args.file_in, 'csv')
+    print('{0:<10} {1:>10.2f} {2:>16.1f} {3:>16}'.format(
+        'csv', seconds, sum(os.path.getsize(path) for _, path, _ in load.CSV_OUTPUTS)
+        / 10**6, ''))
+    for name, db_path, encoded in [('sqlite', PLAIN_DB_PATH, False),
+                                   ('encoded', ENCODED_DB_PATH, True)]:
+        seconds = time_load(args.file_in, 'sqlite', db_path, encoded)
+        loaded = os.path.getsize(db_path) / 10**6
+        database.optimize(db_path)
+        print('{0:<10} {1:>10.2f} {2:>16.1f} {3:>16.1f}'.format(
+            name, seconds, loaded, os.path.getsize(db_path) / 10**6))
+
+    plain = database.connect(PLAIN_DB_PATH)
+    encoded = database.connect(ENCODED_DB_PATH)
+    print('{0:<40} {1:>12} {2:>13} {3:>8}'.format('query', 'sqlite (ms)', 'encoded (ms)',
+                                                  'speedup'))
+    totals = [0, 0]
+    for i, (title, query) in enumerate(bench_queries.read_queries(
+            bench_queries.AFTER_QUERIES), 1):
+        title = '{0}. {1}'.format(i, title)
+        t_plain = bench_queries.best_time(plain, query, args.repeat)
+        t_encoded = bench_queries.best_time(encoded, query, args.repeat)
+        totals[0] += t_plain
+        totals[1] += t_encoded
+        print('{0:<40} {1:>12.3f} {2:>13.3f} {3:>7.1f}x{4}'.format(
+            title[:40], t_plain * 1000, t_encoded * 1000, t_plain / t_encoded,
+            '' if same_results(plain, encoded, query) else '  (different rows)'))
+    print('{0:<40} {1:>12.3f} {2:>13.3f} {3:>7.1f}x'.format(
+        'total', totals[0] * 1000, totals[1] * 1000, totals[0] / totals[1]))
+    plain.close()
+    encoded.close()
+    os.remove(PLAIN_DB_PATH)
+    os.remove(ENCODED_DB_PATH)
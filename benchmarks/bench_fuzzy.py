@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Mon Oct 19 03:21:40 2026
+
+@author: rogerduong
+
+Compare the BK-tree searches of fuzzy.StreetNameCorrector with a scan of the
+whole vocabulary: the street names of an OSM file (see
+load.build_street_corrector) are misspelled with random edits, and the
+canonical names within max_distance of each misspelling are searched both
+ways. Both find the same names; the BK-tree computes fewer edit distances.
+The share of misspellings corrected back to their street name is reported.
+
+python -m benchmarks.bench_fuzzy data/bench/synthetic-100mb.osm
+"""
+
+import fuzzy
+import load
+
+import argparse
+import random
+import string
+import time
+
+SAMPLE_PATH = "data/osm/singapore-shorter.osm"
+
+def misspell(name, rng):
+    """Return name with a random deletion, insertion, substitution or
+    transposition of a letter"""
+    i = rng.randrange(len(name))
+    letter = rng.choice(string.ascii_lowercase)
+    edit = rng.choice(['delete', 'insert', 'substitute', 'transpose'])
+    if edit == 'delete':
+        return name[:i] + name[i + 1:]
+    if edit == 'insert':
+        return name[:i] + letter + name[i:]
+    if edit == 'substitute':
+        return name[:i] + letter + name[i + 1:]
+    return name[:i] + name[i + 1:i + 2] + name[i:i + 1] + name[i + 2:]
+
+def scan(vocabulary, word, k):
+    """Return the (distance, word) of the vocabulary within distance k of
+    word, comparing it with every word"""
+    found = []
+    for other in vocabulary:
+        d = fuzzy.edit_distance(word, other, k)
+        if d <= k:
+            found.append((d, other))
+    return sorted(found)
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('file_in', nargs='?', default=SAMPLE_PATH)
+    parser.add_argument('--misspellings', type=int, default=1000)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    corrector = load.build_street_corrector(args.file_in)
+    vocabulary = sorted(corrector.canonical_names)
+    print('{0}: {1} distinct street names, {2} canonical ({3:.2f} s)'.format(
+        args.file_in, len(corrector.names), len(vocabulary),
+        time.perf_counter() - start))
+    if not vocabulary:
+        raise SystemExit('No canonical street names')
+
+    rng = random.Random(args.seed)
+    names = [rng.choice(vocabulary) for _ in range(args.misspellings)]
+    misspellings = [misspell(name, rng) for name in names]
+
+    calls = [0]
+    edit_distance = fuzzy.edit_distance
+
+    def counted(a, b, limit=None):
+        calls[0] += 1
+        return edit_distance(a, b, limit)
+
+    results = {}
+    fuzzy.edit_distance = counted
+    try:
+        for method, search in [('scan', lambda w, k: scan(vocabulary, w, k)),
+                               ('bk-tree', corrector.name_tree.search)]:
+            calls[0] = 0
+            start = time.perf_counter()
+            results[method] = [search(word, fuzzy.max_distance(word))
+                               for word in misspellings]
+            results[method + ' seconds'] = time.perf_counter() - start
+            results[method + ' distances'] = calls[0]
+    finally:
+        fuzzy.edit_distance = edit_distance
+
+    print('{0:<8} {1:>12} {2:>16} {3:>12}'.format(
+        'method', 'seconds', 'distances/word', 'words/s'))
+    for method in ['scan', 'bk-tree']:
+        seconds = results[method + ' seconds']
+        print('{0:<8} {1:>12.3f} {2:>16.1f} {3:>12.0f}'.format(
+            method, seconds, results[method + ' distances'] / len(misspellings),
+            len(misspellings) / seconds))
+    print('same candidates: {0}'.format(
+        'yes' if results['scan'] == results['bk-tree'] else 'no'))
+    corrected = sum(corrector.name_spellings.get(name) == corrector.correct(word)
+                    for name, word in zip(names, misspellings))
+    print('corrected back: {0} of {1} misspellings'.format(corrected, len(misspellings)))
@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 20:47:15 2026
+
+@author: rogerduong
+
+Compare nodestore.NodeStore with a dict of node id: (lat, lon): memory per
+node and lookups per second, on synthetic nodes. Then time the load of an
+OSM file with and without the way geometries.
+"""
+
+import load
+import nodestore
+
+import argparse
+import contextlib
+import os
+import random
+import shutil
+import tempfile
+import time
+import tracemalloc
+
+SAMPLE_PATH = "data/osm/singapore-shorter.osm"
+
+def synthetic_nodes(count, seed=0):
+    """Yield (id, lat, lon) of count nodes with increasing ids, as in an
+    OSM file"""
+    rng = random.Random(seed)
+    node_id = 0
+    for _ in range(count):
+        node_id += rng.randint(1, 20)
+        yield node_id, rng.uniform(1.2, 1.5), rng.uniform(103.6, 104.1)
+
+def measure(build, count):
+    """Return the store built from count nodes and its memory per node"""
+    tracemalloc.start()
+    store = build(synthetic_nodes(count))
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return store, size / count
+
+def build_dict(nodes):
+    return {node_id: (lat, lon) for node_id, lat, lon in nodes}
+
+def build_store(nodes, path=None):
+    store = nodestore.NodeStore(path)
+    for node in nodes:
+        store.append(*node)
+    store.freeze()
+    return store
+
+def lookups_per_second(get, ids):
+    start = time.perf_counter()
+    for node_id in ids:
+        get(node_id)
+    return len(ids) / (time.perf_counter() - start)
+
+def time_load(file_in, geometry):
+    start = time.perf_counter()
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        load.process_map(file_in, validate=False, geometry=geometry)
+    return time.perf_counter() - start
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('file_in', nargs='?', default=SAMPLE_PATH)
+    parser.add_argument('--nodes', type=int, default=1000000)
+    parser.add_argument('--lookups', type=int, default=200000)
+    args = parser.parse_args()
+
+    tmp_dir = tempfile.mkdtemp()
+    ids = [node_id for node_id, _, _ in synthetic_nodes(args.nodes)]
+    ids = random.Random(1).sample(ids, min(args.lookups, len(ids)))
+    print('{0:<16} {1:>12} {2:>14}'.format('store', 'bytes/node', 'lookups/s'))
+    for name, build in [
+            ('dict', build_dict),
+            ('NodeStore', build_store),
+            ('NodeStore mmap', lambda nodes: build_store(
+                nodes, os.path.join(tmp_dir, 'nodes')))]:
+        store, per_node = measure(build, args.nodes)
+        rate = lookups_per_second(store.get, ids)
+        print('{0:<16} {1:>12.1f} {2:>14.0f}'.format(name, per_node, rate))
+        if isinstance(store, nodestore.NodeStore):
+            store.close()
+        del store
+    shutil.rmtree(tmp_dir)
+
+    t_without = time_load(args.file_in, geometry=False)
+    t_with = time_load(args.file_in, geometry=True)
+    print('load {0}: {1:.3f} s without way geometries, {2:.3f} s with'.format(
+        args.file_in, t_without, t_with))
@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 22:41:06 2026
+
+@author: rogerduong
+
+Compare the XML parsers of parsers.py: time to parse an OSM file, then to
+parse and shape its elements (load.shape_element), best of several runs.
+The shaped elements of each parser are checked against the ones of etree.
+
+python -m benchmarks.bench_parsers data/bench/synthetic-100mb.osm
+"""
+
+import load
+import parsers
+
+import argparse
+import hashlib
+import os
+import time
+
+SAMPLE_PATH = "data/osm/singapore-shorter.osm"
+
+def best_time(run, repeat):
+    """Return the lowest CPU time of repeat calls of run, and its result"""
+    best = None
+    for _ in range(repeat):
+        start = time.process_time()
+        result = run()
+        seconds = time.process_time() - start
+        best = seconds if best is None else min(best, seconds)
+    return best, result
+
+def parse(file_in, parser):
+    """Return the number of elements of file_in"""
+    return sum(1 for _ in parsers.iterparse(file_in, parser=parser))
+
+def parse_and_shape(file_in, parser):
+    """Shape the elements of file_in"""
+    for element in parsers.iterparse(file_in, parser=parser):
+        load.shape_element(element)
+
+def shaped_digest(file_in, parser):
+    """Return the digest of the shaped elements of file_in"""
+    digest = hashlib.md5()
+    for element in parsers.iterparse(file_in, parser=parser):
+        digest.update(repr(load.shape_element(element)).encode())
+    return digest.hexdigest()
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('file_in', nargs='?', default=SAMPLE_PATH)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    size = os.path.getsize(args.file_in) / 10**6
+    print('{0:<8} {1:>10} {2:>12} {3:>8} {4:>14} {5:>8}'.format(
+        'parser', 'parse (s)', 'elements/s', 'MB/s', 'and shape (s)', 'MB/s'))
+    reference = None
+    for name in parsers.available_parsers():
+        parse_seconds, elements = best_time(lambda: parse(args.file_in, name),
+                                            args.repeat)
+        shape_seconds, _ = best_time(lambda: parse_and_shape(args.file_in, name),
+                                     args.repeat)
+        digest = shaped_digest(args.file_in, name)
+        reference = reference or digest
+        print('{0:<8} {1:>10.3f} {2:>12.0f} {3:>8.2f} {4:>14.3f} {5:>8.2f}{6}'.format(
+            name, parse_seconds, elements / parse_seconds, size / parse_seconds,
+            shape_seconds, size / shape_seconds,
+            '' if digest == reference else '  (different output)'))
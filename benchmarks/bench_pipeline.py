@@ -0,0 +1,197 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 21:31:50 2026
+
+@author: rogerduong
+
+Benchmark of the load pipeline, stage by stage, as timed by
+instrument.Metrics in load.load_elements: parse (iterparse), shape
+(shape_element), validate (the compiled validator), clean
+(clean_element_dict) and write (the backend writer, including its close).
+Each input is processed in its own process, so that its peak RSS can be
+measured. Results are printed and can be saved as JSON, then compared with
+the results of another commit:
+
+python -m benchmarks.bench_pipeline --generate 100 1000 --json after.json \\
+    --compare before.json
+"""
+
+import load
+import columnar
+import database
+import instrument
+import nodestore
+import parsers
+from benchmarks import generate_osm
+
+import argparse
+import contextlib
+import json
+import os
+import platform
+import resource
+import shutil
+import subprocess
+import sys
+import time
+
+SAMPLE_PATH = "data/osm/singapore-shorter.osm"
+BENCH_DIR = "data/bench"
+
+STAGES = ['parse', 'shape', 'validate', 'clean', 'write']
+
+def get_bench_writer(backend, out_dir):
+    """Return a writer of a backend writing in out_dir"""
+    if backend == 'csv':
+        return load.CsvWriter([(key, os.path.join(out_dir, os.path.basename(path)), fields)
+                               for key, path, fields in load.CSV_OUTPUTS])
+    elif backend == 'sqlite':
+        return database.SqliteWriter(load.FIELDS, os.path.join(out_dir, 'bench.db'))
+    return columnar.ParquetWriter(load.FIELDS, out_dir)
+
+def run_stages(file_in, backend='csv', validate=True, geometry=True, parser='etree'):
+    """Process file_in with load.load_elements, timing each stage with
+    instrument.Metrics
+
+    Args:
+        file_in: input OSM file
+        backend: 'csv', 'sqlite' or 'parquet'
+        validate: boolean to specify if the elements must be validated
+        geometry: boolean to specify if the way geometries must be computed
+        parser: XML parser, 'etree', 'lxml' or 'expat' (see parsers.py)
+    Returns:
+        dictionary of the results
+
+    """
+    metrics = instrument.Metrics()
+    node_store = nodestore.NodeStore() if geometry else None
+    out_dir = os.path.join(BENCH_DIR, 'output-{0}'.format(os.getpid()))
+    os.makedirs(out_dir, exist_ok=True)
+    clock = time.perf_counter
+
+    start = clock()
+    try:
+        with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+            with get_bench_writer(backend, out_dir) as writer:
+                load.load_elements(file_in, validate, writer, node_store=node_store,
+                                   metrics=metrics, parser=parser)
+                t_close = clock()
+            metrics.seconds['write'] += clock() - t_close
+    finally:
+        shutil.rmtree(out_dir, ignore_errors=True)
+    total = clock() - start
+
+    size = os.path.getsize(file_in)
+    elements = {key: metrics.counts[key] for key in instrument.ELEMENTS}
+    return {
+        'input': file_in,
+        'megabytes': size / 10**6,
+        'backend': backend,
+        'validate': validate,
+        'geometry': geometry,
+        'parser': parser,
+        'elements': elements,
+        'seconds': total,
+        'elements_per_second': sum(elements.values()) / total,
+        'megabytes_per_second': size / 10**6 / total,
+        # ru_maxrss is in kilobytes on Linux, bytes on macOS
+        'peak_rss_megabytes': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+                              / (2**20 if sys.platform == 'darwin' else 2**10),
+        'stages': {stage: {'seconds': metrics.seconds[stage],
+                           'share': metrics.seconds[stage] / total}
+                   for stage in STAGES},
+    }
+
+def git_commit():
+    """Return the current git commit, or None"""
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], check=True,
+                              capture_output=True, text=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def generated_input(size):
+    """Return the path of a generated input of size MB, generating it once"""
+    path = os.path.join(BENCH_DIR, 'synthetic-{0:g}mb.osm'.format(size))
+    if not os.path.exists(path):
+        os.makedirs(BENCH_DIR, exist_ok=True)
+        print('Generating {0}'.format(path))
+        generate_osm.generate(path + '.tmp', size=size)
+        os.replace(path + '.tmp', path)
+    return path
+
+def run_in_process(file_in, backend, validate, geometry, parser):
+    """Run run_stages in a new Python process and return its results"""
+    command = [sys.executable, '-m', 'benchmarks.bench_pipeline', file_in,
+               '--worker', '--backend', backend, '--parser', parser]
+    if not validate:
+        command.append('--no-validate')
+    if not geometry:
+        command.append('--no-geometry')
+    output = subprocess.run(command, check=True, capture_output=True, text=True).stdout
+    return json.loads(output)
+
+def print_results(results, baseline=None):
+    """Print the results, and their speedup over a baseline if any"""
+    baseline = {(r['input'], r['backend']): r for r in (baseline or {}).get('results', [])}
+    print('{0:<36} {1:>9} {2:>10} {3:>7} {4:>8}  {5}'.format(
+        'input', 'elements', 'elements/s', 'MB/s', 'RSS (MB)',
+        '  '.join('{0:>8}'.format(stage) for stage in STAGES)))
+    for r in results:
+        print('{0:<36} {1:>9} {2:>10.0f} {3:>7.2f} {4:>8.1f}  {5}'.format(
+            os.path.basename(r['input'])[-36:], sum(r['elements'].values()),
+            r['elements_per_second'], r['megabytes_per_second'],
+            r['peak_rss_megabytes'],
+            '  '.join('{0:>7.1%}'.format(r['stages'][stage]['share'])
+                      for stage in STAGES)))
+        before = baseline.get((r['input'], r['backend']))
+        if before is not None:
+            print('{0:<36} {1:>9} {2:>9.2f}x {3:>7} {4:>7.2f}x  {5}'.format(
+                '  vs ' + (before.get('commit') or 'baseline'), '',
+                r['elements_per_second'] / before['elements_per_second'], '',
+                r['peak_rss_megabytes'] / before['peak_rss_megabytes'],
+                '  '.join('{0:>7.2f}x'.format(
+                    before['stages'][stage]['seconds'] / r['stages'][stage]['seconds']
+                    if r['stages'][stage]['seconds'] else float('nan'))
+                    for stage in STAGES)))
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('inputs', nargs='*', help='OSM files (default: the sample)')
+    parser.add_argument('--generate', type=float, nargs='+', default=[], metavar='MB',
+                        help='also run on generated inputs of these sizes')
+    parser.add_argument('--backend', choices=['csv', 'sqlite', 'parquet'], default='csv')
+    parser.add_argument('--no-validate', action='store_true')
+    parser.add_argument('--no-geometry', action='store_true')
+    parser.add_argument('--parser', choices=list(parsers.PARSERS), default='etree')
+    parser.add_argument('--json', help='save the results to this file')
+    parser.add_argument('--compare', help='results of a previous run to compare with')
+    parser.add_argument('--worker', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        json.dump(run_stages(args.inputs[0], args.backend, not args.no_validate,
+                             not args.no_geometry, args.parser), sys.stdout)
+        sys.exit()
+
+    inputs = args.inputs or ([] if args.generate else [SAMPLE_PATH])
+    inputs += [generated_input(size) for size in args.generate]
+    commit = git_commit()
+    results = []
+    for file_in in inputs:
+        result = run_in_process(file_in, args.backend, not args.no_validate,
+                                not args.no_geometry, args.parser)
+        result['commit'] = commit
+        results.append(result)
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+    print_results(results, baseline)
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({'commit': commit, 'python': platform.python_version(),
+                       'results': results}, f, indent=2)
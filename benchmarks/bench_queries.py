@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 19:12:05 2026
+
+@author: rogerduong
+
+Time each query of singapore_queries.sql on a database optimized by
+database.optimize, against the same query of queries_unoptimized.sql on the
+database as loaded by data/schema.sql (no indexes, no primary keys). Each
+query must return the same rows as its unoptimized version, compared without
+their LIMIT and in any order: the order of the rows with the same count, and
+so the rows kept by LIMIT, depend on the query plan.
+"""
+
+import load
+import database
+
+import argparse
+import contextlib
+import os
+import re
+import shutil
+import time
+
+SAMPLE_PATH = "data/osm/singapore-shorter.osm"
+BEFORE_QUERIES = os.path.join(os.path.dirname(__file__), 'queries_unoptimized.sql')
+AFTER_QUERIES = "singapore_queries.sql"
+BEFORE_DB_PATH = "data/bench_before.db"
+AFTER_DB_PATH = "data/bench_after.db"
+
+LIMIT = re.compile(r'\s+LIMIT\s+\d+\s*;\s*$', re.IGNORECASE)
+
+def read_queries(path):
+    """Return the (title, query) of a query file
+
+    Lines starting with # are titles, the other lines outside queries are
+    results. A query starts with SELECT and ends with ;
+    """
+    queries = []
+    title = ''
+    query = None
+    with open(path) as f:
+        for line in f:
+            stripped = line.strip()
+            if query is None:
+                if stripped.startswith('#'):
+                    title = stripped.lstrip('# ')
+                elif stripped.upper().startswith('SELECT'):
+                    query = []
+            if query is not None:
+                query.append(line)
+                if stripped.endswith(';'):
+                    queries.append((title, ''.join(query)))
+                    title = ''
+                    query = None
+    return queries
+
+def best_time(conn, query, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        conn.execute(query).fetchall()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+def same_rows(before, after, before_query, after_query):
+    """Return True if both queries, without their LIMIT, return the same
+    rows in any order"""
+    return (sorted(before.execute(LIMIT.sub(';', before_query)).fetchall(), key=repr) ==
+            sorted(after.execute(LIMIT.sub(';', after_query)).fetchall(), key=repr))
+
+def build_databases(file_in):
+    """Load file_in into the before and after databases"""
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        load.process_map(file_in, validate=False, backend='sqlite',
+                         db_path=BEFORE_DB_PATH)
+    shutil.copyfile(BEFORE_DB_PATH, AFTER_DB_PATH)
+
+    conn = database.connect(BEFORE_DB_PATH)
+    for (name,) in conn.execute("SELECT name FROM sqlite_master WHERE type = 'index' "
+                                "AND sql IS NOT NULL").fetchall():
+        conn.execute('DROP INDEX ' + name)
+    conn.execute('ANALYZE')
+    conn.close()
+    database.optimize(AFTER_DB_PATH)
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('file_in', nargs='?', default=SAMPLE_PATH)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    build_databases(args.file_in)
+    before_queries = read_queries(BEFORE_QUERIES)
+    after_queries = read_queries(AFTER_QUERIES)
+    assert len(before_queries) == len(after_queries)
+
+    before = database.connect(BEFORE_DB_PATH)
+    after = database.connect(AFTER_DB_PATH)
+    print('{0:<40} {1:>12} {2:>12} {3:>8} {4:>10}'.format(
+        'query', 'before (ms)', 'after (ms)', 'speedup', 'same rows'))
+    totals = [0, 0]
+    different = []
+    for i, ((title, before_query), (_, after_query)) in enumerate(
+            zip(before_queries, after_queries), 1):
+        title = '{0}. {1}'.format(i, title)
+        t_before = best_time(before, before_query, args.repeat)
+        t_after = best_time(after, after_query, args.repeat)
+        totals[0] += t_before
+        totals[1] += t_after
+        same = same_rows(before, after, before_query, after_query)
+        if not same:
+            different.append(title)
+        print('{0:<40} {1:>12.3f} {2:>12.3f} {3:>7.1f}x {4:>10}'.format(
+            title[:40], t_before * 1000, t_after * 1000, t_before / t_after,
+            'yes' if same else 'no'))
+    print('{0:<40} {1:>12.3f} {2:>12.3f} {3:>7.1f}x'.format(
+        'total', totals[0] * 1000, totals[1] * 1000, totals[0] / totals[1]))
+    before.close()
+    after.close()
+    os.remove(BEFORE_DB_PATH)
+    os.remove(AFTER_DB_PATH)
+    if different:
+        raise SystemExit('Queries returning other rows than before: ' +
+                         ', '.join(different))
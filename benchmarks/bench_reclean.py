@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Mon Oct 19 00:52:18 2026
+
+@author: rogerduong
+
+Compare reclean.py with a full load.process_map rerun after a change of
+transform.mapping: the dataset is loaded without some street types of the
+mapping, then the mapping is restored and the dataset is re-cleaned, or
+loaded again. Both give the same tags, for the csv and the sqlite backends.
+
+python -m benchmarks.bench_reclean data/bench/synthetic-100mb.osm
+"""
+
+import database
+import load
+import reclean
+import transform
+
+import argparse
+import contextlib
+import hashlib
+import os
+import time
+
+SAMPLE_PATH = "data/osm/singapore-shorter.osm"
+BENCH_DB_PATH = "data/bench_reclean.db"
+
+def set_mapping(mapping):
+    """Replace transform.mapping, and the street name normalizer using it"""
+    transform.mapping.clear()
+    transform.mapping.update(mapping)
+    transform.street_name_normalizer = transform.StreetNameNormalizer(transform.mapping)
+
+def load_dataset(file_in, backend):
+    """Return the seconds taken to load file_in with the current mapping"""
+    start = time.perf_counter()
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        load.process_map(file_in, validate=False, backend=backend,
+                         db_path=BENCH_DB_PATH)
+    return time.perf_counter() - start
+
+def tags_digest(backend):
+    """Return the digest of the loaded tags"""
+    digest = hashlib.md5()
+    if backend == 'csv':
+        for _, path in reclean.TAG_PATHS:
+            with open(path, 'rb') as f:
+                digest.update(f.read())
+        return digest.hexdigest()
+    conn = database.connect(BENCH_DB_PATH)
+    for tag_type, _ in reclean.TAG_PATHS:
+        for row in conn.execute('SELECT * FROM {0} ORDER BY rowid'.format(
+                database.TABLES[tag_type])):
+            digest.update(repr(row).encode())
+    conn.close()
+    return digest.hexdigest()
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('file_in', nargs='?', default=SAMPLE_PATH)
+    parser.add_argument('--drop', default='Rd,Ave,St',
+                        help='street types of transform.mapping missing from the '
+                             'first load')
+    args = parser.parse_args()
+
+    mapping = dict(transform.mapping)
+    reduced = {k: v for k, v in mapping.items() if k not in args.drop.split(',')}
+    size = os.path.getsize(args.file_in) / 10**6
+    print('{0} ({1:.1f} MB), without {2} in the first load'.format(
+        args.file_in, size, args.drop))
+    print('{0:<8} {1:>14} {2:>12} {3:>10} {4:>8} {5:>10}'.format(
+        'backend', 'tags changed', 'rerun (s)', 'reclean (s)', 'speedup', 'same tags'))
+    try:
+        for backend in ['csv', 'sqlite']:
+            set_mapping(reduced)
+            load_dataset(args.file_in, backend)
+            set_mapping(mapping)
+            start = time.perf_counter()
+            with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+                counts = reclean.reclean(backend, BENCH_DB_PATH)
+            reclean_seconds = time.perf_counter() - start
+            recleaned = tags_digest(backend)
+            rerun_seconds = load_dataset(args.file_in, backend)
+            print('{0:<8} {1:>14} {2:>12.2f} {3:>10.2f} {4:>7.1f}x {5:>10}'.format(
+                backend, sum(counts[key] for key in reclean.ADDRESS_KEYS),
+                rerun_seconds, reclean_seconds, rerun_seconds / reclean_seconds,
+                'yes' if recleaned == tags_digest(backend) else 'no'))
+    finally:
+        set_mapping(mapping)
+        if os.path.exists(BENCH_DB_PATH):
+            os.remove(BENCH_DB_PATH)
@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 19:24:31 2026
+
+@author: rogerduong
+
+Time the bbox, radius and nearest queries of spatial.py against the same
+queries scanning the nodes table, on random points of the loaded extract,
+and check that both return the same nodes.
+"""
+
+import load
+import spatial
+
+import argparse
+import contextlib
+import os
+import random
+import sqlite3
+import time
+
+SAMPLE_PATH = "data/osm/singapore-shorter.osm"
+DB_PATH = "data/bench_spatial.db"
+
+def scan_bbox(conn, min_lat, min_lon, max_lat, max_lon):
+    return conn.execute('SELECT id, lat, lon FROM nodes WHERE lat BETWEEN ? AND ? '
+                        'AND lon BETWEEN ? AND ?',
+                        (min_lat, max_lat, min_lon, max_lon)).fetchall()
+
+def scan_radius(conn, lat, lon, meters):
+    results = []
+    for node_id, node_lat, node_lon in conn.execute('SELECT id, lat, lon FROM nodes'):
+        distance = spatial.haversine(lat, lon, node_lat, node_lon)
+        if distance <= meters:
+            results.append((distance, node_id, node_lat, node_lon))
+    results.sort()
+    return results
+
+def scan_nearest(conn, lat, lon, k):
+    return scan_radius(conn, lat, lon, float('inf'))[:k]
+
+def timed(function, points):
+    """Return the total time and the results of function on each point"""
+    start = time.perf_counter()
+    results = [function(*point) for point in points]
+    return time.perf_counter() - start, results
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('file_in', nargs='?', default=SAMPLE_PATH)
+    parser.add_argument('--queries', type=int, default=200)
+    parser.add_argument('--meters', type=float, default=500)
+    parser.add_argument('-k', type=int, default=10)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        load.process_map(args.file_in, validate=False, backend='sqlite',
+                         db_path=DB_PATH)
+    conn = sqlite3.connect(DB_PATH)
+
+    # Query points drawn from the nodes, so that the queries are not empty
+    random.seed(args.seed)
+    nodes = conn.execute('SELECT lat, lon FROM nodes').fetchall()
+    centers = random.sample(nodes, min(args.queries, len(nodes)))
+    boxes = [spatial.radius_bbox(lat, lon, args.meters) for lat, lon in centers]
+
+    cases = [
+        ('bbox', lambda *b: spatial.bbox(conn, *b), lambda *b: scan_bbox(conn, *b),
+         boxes, lambda rows: sorted(row[0] for row in rows)),
+        ('radius', lambda lat, lon: spatial.radius(conn, lat, lon, args.meters),
+         lambda lat, lon: scan_radius(conn, lat, lon, args.meters),
+         centers, lambda rows: sorted(row[1] for row in rows)),
+        ('nearest', lambda lat, lon: spatial.nearest(conn, lat, lon, args.k),
+         lambda lat, lon: scan_nearest(conn, lat, lon, args.k),
+         centers, lambda rows: [round(row[0], 6) for row in rows]),
+    ]
+    print('{0} nodes, {1} queries'.format(len(nodes), len(centers)))
+    print('{0:<10} {1:>12} {2:>12} {3:>8}'.format('query', 'scan (ms)', 'rtree (ms)', 'speedup'))
+    for name, indexed, scan, points, key in cases:
+        t_indexed, indexed_results = timed(indexed, points)
+        t_scan, scan_results = timed(scan, points)
+        assert ([key(rows) for rows in indexed_results] ==
+                [key(rows) for rows in scan_results]), name
+        print('{0:<10} {1:>12.3f} {2:>12.3f} {3:>7.1f}x'.format(
+            name, t_scan / len(points) * 1000, t_indexed / len(points) * 1000,
+            t_scan / t_indexed))
+    conn.close()
+    os.remove(DB_PATH)
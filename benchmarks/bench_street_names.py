@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 17:58:09 2026
+
+@author: rogerduong
+
+Time transform.StreetNameNormalizer on the addr:street values of an OSM file,
+with and without the LRU cache, and report the cache hit and miss rates.
+"""
+
+import audit
+import parsers
+import transform
+
+import argparse
+import time
+
+SAMPLE_PATH = "data/osm/singapore-shorter.osm"
+
+def street_names(osm_file):
+    """Return the addr:street values of osm_file, in file order"""
+    names = []
+    for element in parsers.iterparse(osm_file):
+        for child in element:
+            if audit.is_street_name(child):
+                names.append(child.attrib['v'])
+    return names
+
+def time_normalizer(names, maxsize, repeat):
+    normalizer = transform.StreetNameNormalizer(transform.mapping, maxsize=maxsize)
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for name in names:
+            normalizer(name)
+    return time.perf_counter() - start, normalizer
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('file_in', nargs='?', default=SAMPLE_PATH)
+    parser.add_argument('--repeat', type=int, default=100,
+                        help='passes over the street names, to simulate a '
+                             'larger extract repeating the same streets')
+    parser.add_argument('--maxsize', type=int, default=65536)
+    args = parser.parse_args()
+
+    names = street_names(args.file_in)
+    calls = len(names) * args.repeat
+    print('{0} street names, {1} distinct, {2} calls'.format(
+        len(names), len(set(names)), calls))
+
+    uncached, _ = time_normalizer(names, 0, args.repeat)
+    cached, normalizer = time_normalizer(names, args.maxsize, args.repeat)
+    info = normalizer.cache_info()
+    print('uncached {0:8.3f} s {1:8.2f} us / call'.format(uncached, uncached / calls * 10**6))
+    print('cached   {0:8.3f} s {1:8.2f} us / call'.format(cached, cached / calls * 10**6))
+    print('hits {0} ({1:.1%}), misses {2} ({3:.1%})'.format(
+        info.hits, info.hits / calls, info.misses, info.misses / calls))
+    print('{0} distinct changes, e.g.:'.format(len(normalizer.changes)))
+    for (old, new), count in normalizer.changes.most_common(5):
+        print('  {0} --> {1} ({2})'.format(old, new, count))
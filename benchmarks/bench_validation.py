@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 17:20:44 2026
+
+@author: rogerduong
+
+Time load.process_map with and without validation, and the validation of the
+shaped elements alone with the compiled validator and with cerberus.
+"""
+
+import load
+import validation
+
+import argparse
+import contextlib
+import os
+import time
+
+SAMPLE_PATH = "data/osm/singapore-shorter.osm"
+
+def time_load(file_in, validate):
+    start = time.perf_counter()
+    load.process_map(file_in, validate=validate)
+    return time.perf_counter() - start
+
+def time_validators(file_in):
+    """Time the validation of the shaped elements of file_in"""
+    elements = [load.shape_element(e) for e in load.get_element(file_in)]
+    results = {}
+
+    validator = validation.ElementValidator(load.SCHEMA, load.TUPLE_FIELDS)
+    start = time.perf_counter()
+    for element in elements:
+        validator.validate(element)
+    results['compiled'] = time.perf_counter() - start
+
+    try:
+        import cerberus
+    except ImportError:
+        return results
+    as_dicts = [dict(e, **{key: [dict(zip(load.FIELDS[key], row)) for row in e[key]]
+                           for key in load.TUPLE_ROWS if key in e})
+                for e in elements]
+    validator = cerberus.Validator()
+    start = time.perf_counter()
+    for element in as_dicts:
+        validator.validate(element, load.SCHEMA)
+    results['cerberus'] = time.perf_counter() - start
+    return results
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('file_in', nargs='?', default=SAMPLE_PATH)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        plain = min(time_load(args.file_in, False) for _ in range(args.repeat))
+        validated = min(time_load(args.file_in, True) for _ in range(args.repeat))
+    print('load              {0:8.3f} s'.format(plain))
+    print('load + validation {0:8.3f} s ({1:+.1f}%)'.format(
+        validated, (validated / plain - 1) * 100))
+    for name, seconds in time_validators(args.file_in).items():
+        print('validation only, {0:<9}{1:8.3f} s'.format(name, seconds))
@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 16:02:31 2026
+
+@author: rogerduong
+
+Time load.shape_element on synthetic ways of 10, 1k and 100k node references.
+The time per reference should stay flat as the ways get longer.
+"""
+
+import load
+
+import argparse
+import time
+import xml.etree.ElementTree as ET
+
+WAY_ATTRIBS = {'id': '1', 'user': 'user', 'uid': '1', 'version': '1',
+               'changeset': '1', 'timestamp': '2017-01-01T00:00:00Z'}
+
+def make_way(refs, tags=5):
+    """Return a way element with refs <nd> and tags <tag> children"""
+    way = ET.Element('way', WAY_ATTRIBS)
+    for i in range(refs):
+        ET.SubElement(way, 'nd', {'ref': str(1000000 + i)})
+    for i in range(tags):
+        ET.SubElement(way, 'tag', {'k': 'key{0}'.format(i), 'v': 'value'})
+    return way
+
+def quadratic_positions(way):
+    """Position computation of the previous shape_element, for comparison"""
+    return [list(way).index(child) for child in way if child.tag == 'nd']
+
+def best_time(func, arg, budget=1.0):
+    """Best time of func(arg) over repeated calls within budget seconds"""
+    best = float('inf')
+    deadline = time.perf_counter() + budget
+    while True:
+        start = time.perf_counter()
+        func(arg)
+        elapsed = time.perf_counter() - start
+        best = min(best, elapsed)
+        if start + elapsed > deadline:
+            return best
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10, 1000, 100000])
+    parser.add_argument('--quadratic-max', type=int, default=10000,
+                        help='largest way timed with the previous algorithm')
+    args = parser.parse_args()
+
+    print('{0:>8} {1:>12} {2:>12} {3:>16}'.format(
+        'refs', 'shape (s)', 'ns / ref', 'previous (s)'))
+    for refs in args.sizes:
+        way = make_way(refs)
+        seconds = best_time(load.shape_element, way)
+        previous = (best_time(quadratic_positions, way)
+                    if refs <= args.quadratic_max else float('nan'))
+        print('{0:>8} {1:>12.6f} {2:>12.1f} {3:>16.6f}'.format(
+            refs, seconds, seconds / refs * 10**9, previous))
@@ -0,0 +1,207 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 21:08:33 2026
+
+@author: rogerduong
+
+Generate a synthetic OSM file around Singapore, for benchmarks. The output
+only depends on the arguments and the seed. A share of the nodes and ways
+have an address, and a share of the addresses are dirty: abbreviated or
+lower case street types, and postal codes missing their leading zero, which
+load.py cleans without any Singapore Post lookup.
+
+python -m benchmarks.generate_osm data/bench/100mb.osm --size 100
+"""
+
+import argparse
+import array
+import random
+from xml.sax.saxutils import quoteattr
+
+# Bounding box of Singapore
+MIN_LAT, MAX_LAT = 1.22, 1.47
+MIN_LON, MAX_LON = 103.6, 104.05
+
+STREET_NAMES = ['Ang Mo Kio', 'Bedok North', 'Bukit Timah', 'Clementi', 'Geylang',
+                'Holland', 'Jurong West', 'Orchard', 'Pasir Ris', 'Serangoon',
+                'Tampines', 'Toa Payoh', 'Woodlands', 'Yishun', 'Marine Parade']
+STREET_TYPES = ['Road', 'Avenue', 'Street', 'Drive', 'Place', 'Boulevard']
+DIRTY_TYPES = {'Road': ['Rd', 'road'], 'Avenue': ['Ave', 'avenue'],
+               'Street': ['St'], 'Drive': ['Dr', 'drive'], 'Place': ['Pl'],
+               'Boulevard': ['Blvd']}
+NODE_TAGS = [('amenity', ['restaurant', 'cafe', 'school', 'bank', 'place_of_worship']),
+             ('shop', ['supermarket', 'convenience', 'mall']),
+             ('name', ['Block', 'Tower', 'Centre', 'Plaza'])]
+WAY_TAGS = [('highway', ['residential', 'service', 'primary', 'footway']),
+            ('building', ['yes', 'residential', 'commercial']),
+            ('name', ['Road', 'Park', 'Court'])]
+
+# Approximate size of a node, with its share of the ways, for --size
+BYTES_PER_NODE = 225
+
+
+class OsmGenerator(object):
+    """Deterministic generator of OSM elements
+
+    Args:
+        nodes: number of nodes
+        ways: number of ways
+        relations: number of relations
+        way_length: (min, max) number of nodes of a way
+        tag_ratio: share of the nodes with tags (all the ways have tags)
+        tags_per_element: maximum number of tags of a tagged element, besides
+            its address
+        address_ratio: share of the tagged elements with an address
+        dirty_ratio: share of the addresses needing cleaning
+        users: number of distinct users
+        seed: random seed
+    """
+
+    def __init__(self, nodes=100000, ways=15000, relations=200, way_length=(2, 20),
+                 tag_ratio=0.1, tags_per_element=3, address_ratio=0.3,
+                 dirty_ratio=0.2, users=500, seed=0):
+        self.nodes = nodes
+        self.ways = ways
+        self.relations = relations
+        self.way_length = way_length
+        self.tag_ratio = tag_ratio
+        self.tags_per_element = tags_per_element
+        self.address_ratio = address_ratio
+        self.dirty_ratio = dirty_ratio
+        self.users = ['user_{0}'.format(i) for i in range(users)]
+        self.rng = random.Random(seed)
+
+    def attributes(self):
+        """Return the version, timestamp, changeset and user attributes"""
+        rng = self.rng
+        uid = rng.randrange(len(self.users))
+        return ('version="{0}" timestamp="20{1:02d}-{2:02d}-{3:02d}T12:00:00Z" '
+                'changeset="{4}" uid="{5}" user={6}').format(
+                    rng.randint(1, 9), rng.randint(8, 17), rng.randint(1, 12),
+                    rng.randint(1, 28), rng.randint(1, 50000000), uid + 1,
+                    quoteattr(self.users[uid]))
+
+    def address(self):
+        """Return the addr tags of an address, dirty or not"""
+        rng = self.rng
+        street_type = rng.choice(STREET_TYPES)
+        postal_code = '{0:06d}'.format(rng.randint(10000, 829999))
+        if rng.random() < self.dirty_ratio:
+            street_type = rng.choice(DIRTY_TYPES[street_type])
+            # A postal code starting with 0, without its leading zero
+            postal_code = '{0:05d}'.format(rng.randint(10000, 99999))
+        return [('addr:street', '{0} {1}'.format(rng.choice(STREET_NAMES), street_type)),
+                ('addr:housenumber', str(rng.randint(1, 999))),
+                ('addr:postcode', postal_code)]
+
+    def tags(self, choices):
+        rng = self.rng
+        tags = [(key, rng.choice(values))
+                for key, values in rng.sample(choices, rng.randint(1, min(
+                    self.tags_per_element, len(choices))))]
+        if rng.random() < self.address_ratio:
+            tags.extend(self.address())
+        return tags
+
+    @staticmethod
+    def write_tags(write, tags):
+        for key, value in tags:
+            write('    <tag k={0} v={1}/>\n'.format(quoteattr(key), quoteattr(value)))
+
+    def write(self, f):
+        """Write the OSM document to a text file"""
+        rng = self.rng
+        write = f.write
+        write('<?xml version="1.0" encoding="UTF-8"?>\n')
+        write('<osm version="0.6" generator="benchmarks.generate_osm">\n')
+        write(' <bounds minlat="{0}" minlon="{1}" maxlat="{2}" maxlon="{3}"/>\n'.format(
+            MIN_LAT, MIN_LON, MAX_LAT, MAX_LON))
+
+        node_ids = array.array('q')
+        node_id = 0
+        for _ in range(self.nodes):
+            node_id += rng.randint(1, 8)
+            node_ids.append(node_id)
+            lat = rng.uniform(MIN_LAT, MAX_LAT)
+            lon = rng.uniform(MIN_LON, MAX_LON)
+            attributes = 'id="{0}" lat="{1:.7f}" lon="{2:.7f}" {3}'.format(
+                node_id, lat, lon, self.attributes())
+            if rng.random() < self.tag_ratio:
+                write('  <node {0}>\n'.format(attributes))
+                self.write_tags(write, self.tags(NODE_TAGS))
+                write('  </node>\n')
+            else:
+                write('  <node {0}/>\n'.format(attributes))
+
+        way_ids = array.array('q')
+        way_id = 0
+        for _ in range(self.ways):
+            way_id += rng.randint(1, 8)
+            way_ids.append(way_id)
+            write('  <way id="{0}" {1}>\n'.format(way_id, self.attributes()))
+            # Ways use nearby nodes, as in real data
+            length = rng.randint(*self.way_length)
+            start = rng.randrange(max(1, len(node_ids) - length))
+            for ref in node_ids[start:start + length]:
+                write('    <nd ref="{0}"/>\n'.format(ref))
+            self.write_tags(write, self.tags(WAY_TAGS))
+            write('  </way>\n')
+
+        for relation_id in range(1, self.relations + 1):
+            write('  <relation id="{0}" {1}>\n'.format(relation_id, self.attributes()))
+            for _ in range(rng.randint(2, 10)):
+                if rng.random() < 0.8 and way_ids:
+                    write('    <member type="way" ref="{0}" role="outer"/>\n'.format(
+                        rng.choice(way_ids)))
+                else:
+                    write('    <member type="node" ref="{0}" role=""/>\n'.format(
+                        rng.choice(node_ids)))
+            self.write_tags(write, [('type', 'multipolygon'),
+                                    ('name', 'Relation {0}'.format(relation_id))])
+            write('  </relation>\n')
+        write('</osm>\n')
+
+def generate(path, size=None, seed=0, **kwargs):
+    """Write a synthetic OSM file
+
+    Args:
+        path: output file
+        size: approximate size in MB, setting the numbers of nodes, ways and
+            relations, or None to use kwargs
+        seed: random seed
+        kwargs: arguments of OsmGenerator
+    Returns:
+        None
+
+    """
+    if size is not None:
+        nodes = int(size * 10**6 / BYTES_PER_NODE)
+        kwargs.update(nodes=nodes, ways=nodes // 7, relations=max(1, nodes // 500))
+    generator = OsmGenerator(seed=seed, **kwargs)
+    with open(path, 'w', encoding='utf-8', buffering=1 << 20) as f:
+        generator.write(f)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('path')
+    parser.add_argument('--size', type=float, help='approximate size in MB')
+    parser.add_argument('--nodes', type=int, default=100000)
+    parser.add_argument('--ways', type=int, default=15000)
+    parser.add_argument('--relations', type=int, default=200)
+    parser.add_argument('--way-length', type=int, nargs=2, default=[2, 20],
+                        metavar=('MIN', 'MAX'))
+    parser.add_argument('--tag-ratio', type=float, default=0.1)
+    parser.add_argument('--tags-per-element', type=int, default=3)
+    parser.add_argument('--address-ratio', type=float, default=0.3)
+    parser.add_argument('--dirty-ratio', type=float, default=0.2)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    generate(args.path, size=args.size, seed=args.seed, nodes=args.nodes,
+             ways=args.ways, relations=args.relations,
+             way_length=tuple(args.way_length), tag_ratio=args.tag_ratio,
+             tags_per_element=args.tags_per_element,
+             address_ratio=args.address_ratio, dirty_ratio=args.dirty_ratio)
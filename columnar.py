@@ -0,0 +1,216 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 19:41:08 2026
+
+@author: rogerduong
+
+Columnar output of load.py: one Parquet file per table, with the column
+types of schema.py (int64 ids, float64 coordinates) and dictionary encoded
+low cardinality strings (tag keys and types, users, member types and roles).
+The files are written in row groups while streaming, and can be read back
+with read_table without parsing any csv.
+
+Requires pyarrow.
+"""
+
+import schema
+
+import csv
+import os
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = pq = None
+
+PARQUET_DIR = "data/parquet"
+
+SCHEMA = schema.schema
+
+# Shaped element keys and their files, named as the database tables
+FILES = {
+    'node': 'nodes.parquet',
+    'node_tags': 'nodes_tags.parquet',
+    'way': 'ways.parquet',
+    'way_nodes': 'ways_nodes.parquet',
+    'way_tags': 'ways_tags.parquet',
+    'way_geometry': 'ways_geometry.parquet',
+    'relation': 'relations.parquet',
+    'relation_tags': 'relations_tags.parquet',
+    'relation_members': 'relations_members.parquet',
+}
+
+# Fields with few distinct values, stored dictionary encoded
+DICTIONARY_FIELDS = {'key', 'type', 'user', 'member_type', 'role'}
+
+# Python coercion of the cerberus types used in schema.py
+COERCE = {'integer': int, 'float': float, 'string': str}
+
+def row_rule(key):
+    """Return the dictionary of field: cerberus rule of the rows of a key"""
+    rule = SCHEMA[key]
+    return rule['schema']['schema'] if rule['type'] == 'list' else rule['schema']
+
+def arrow_type(name, rule):
+    """Return the Arrow type of a field
+
+    Args:
+        name: field name
+        rule: cerberus rule of the field
+    Returns:
+        pyarrow DataType
+    """
+    if rule['type'] == 'integer':
+        return pa.int64()
+    elif rule['type'] == 'float':
+        return pa.float64()
+    elif name in DICTIONARY_FIELDS:
+        return pa.dictionary(pa.int32(), pa.string())
+    return pa.string()
+
+def arrow_schema(key, fields):
+    """Return the Arrow schema of the file of a key, in the fields order"""
+    rules = row_rule(key)
+    return pa.schema([pa.field(name, arrow_type(name, rules[name]))
+                      for name in fields])
+
+def read_table(key, parquet_dir=PARQUET_DIR, columns=None):
+    """Read the file of a shaped element key
+
+    Args:
+        key: shaped element key ('node', 'node_tags', ...)
+        parquet_dir: directory of the Parquet files
+        columns: list of the columns to read, or None for all of them
+    Returns:
+        pyarrow Table (Table.to_pandas() for a pandas DataFrame)
+    """
+    return pq.read_table(os.path.join(parquet_dir, FILES[key]), columns=columns)
+
+def patch_tags(parquet_dir, patches, key):
+    """Replace the values of the key tags of the given ids
+
+    Parquet files cannot be updated in place: the tags files with patches
+    are rewritten, one row group at a time.
+
+    Args:
+        parquet_dir: directory of the Parquet files
+        patches: dictionary of shaped element key ('node_tags', 'way_tags'
+            or 'relation_tags'): {id: new value}
+        key: tag key to patch
+    """
+    for tag_type, values in patches.items():
+        if not values:
+            continue
+        values = {int(element_id): value for element_id, value in values.items()}
+        path = os.path.join(parquet_dir, FILES[tag_type])
+        tmp_path = path + '.tmp'
+        parquet_file = pq.ParquetFile(path)
+        with pq.ParquetWriter(tmp_path, parquet_file.schema_arrow) as writer:
+            for i in range(parquet_file.num_row_groups):
+                table = parquet_file.read_row_group(i)
+                ids = table.column('id').to_pylist()
+                keys = table.column('key').to_pylist()
+                column = table.column('value').to_pylist()
+                for j, (element_id, tag_key) in enumerate(zip(ids, keys)):
+                    if tag_key == key and element_id in values:
+                        column[j] = values[element_id]
+                index = table.schema.get_field_index('value')
+                table = table.set_column(index, table.schema.field(index),
+                                         pa.array(column, pa.string()))
+                writer.write_table(table)
+        os.replace(tmp_path, path)
+
+
+class ParquetWriter(object):
+    """Write shaped elements to one Parquet file per table
+
+    Rows are buffered per table and written as a row group every
+    row_group_size rows, so memory does not grow with the input size.
+
+    Args:
+        fields: dictionary of shaped element key: list of fields
+        parquet_dir: directory of the Parquet files
+        row_group_size: number of rows per row group
+        compression: Parquet compression codec
+    """
+
+    def __init__(self, fields, parquet_dir=PARQUET_DIR, row_group_size=100000,
+                 compression='snappy'):
+        if pa is None:
+            raise ImportError('The parquet backend requires pyarrow')
+        self.fields = fields
+        self.parquet_dir = parquet_dir
+        self.row_group_size = row_group_size
+        self.compression = compression
+        self.writers = {}
+        self.schemas = {}
+        self.coerce = {}
+        self.pending = {}
+
+    def __enter__(self):
+        self.open()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def open(self):
+        os.makedirs(self.parquet_dir, exist_ok=True)
+        for key, fields in self.fields.items():
+            rules = row_rule(key)
+            self.schemas[key] = arrow_schema(key, fields)
+            self.coerce[key] = [COERCE[rules[name]['type']] for name in fields]
+            self.writers[key] = pq.ParquetWriter(
+                os.path.join(self.parquet_dir, FILES[key]), self.schemas[key],
+                compression=self.compression)
+            self.pending[key] = []
+
+    def writerow(self, key, row):
+        pending = self.pending[key]
+        # None is written as '', as csv.DictWriter does
+        pending.append(tuple([row[f] if row[f] is not None else ''
+                              for f in self.fields[key]]))
+        if len(pending) >= self.row_group_size:
+            self.flush(key)
+
+    def writerows(self, key, rows):
+        for row in rows:
+            self.writerow(key, row)
+
+    def writetuples(self, key, rows):
+        """Write rows given as tuples in the fields order"""
+        pending = self.pending[key]
+        pending.extend(rows)
+        if len(pending) >= self.row_group_size:
+            self.flush(key)
+
+    def import_csv(self, key, path, header=True):
+        """Write the rows of a csv file written by load.CsvWriter"""
+        with open(path, newline='') as f:
+            reader = csv.reader(f)
+            if header is True:
+                next(reader, None)
+            for row in reader:
+                pending = self.pending[key]
+                pending.append(row)
+                if len(pending) >= self.row_group_size:
+                    self.flush(key)
+
+    def flush(self, key):
+        pending = self.pending[key]
+        if not pending:
+            return
+        schema = self.schemas[key]
+        columns = [pa.array(list(map(coerce, values)), field.type)
+                   for coerce, values, field
+                   in zip(self.coerce[key], zip(*pending), schema)]
+        self.writers[key].write_table(pa.Table.from_arrays(columns, schema=schema))
+        self.pending[key] = []
+
+    def close(self):
+        for key, writer in self.writers.items():
+            self.flush(key)
+            writer.close()
+        self.writers = {}
@@ -0,0 +1,279 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 23:02:15 2026
+
+@author: rogerduong
+
+Read compressed OSM files (.osm.bz2, .osm.gz, .osc.gz) while streaming,
+without decompressing them to disk first.
+
+bzip2 files made of several streams (as written by pbzip2 or lbzip2, like
+the planet files) can be decompressed by a pool of processes: the streams
+start on byte boundaries with a known signature, so they are found by a
+scan of the compressed file, grouped into segments, and the segments are
+decompressed in parallel and read back in order. Single stream files are
+decompressed by a thread of the reading process, ahead of the parsing.
+"""
+
+import bz2
+import collections
+import gzip
+import mmap
+import multiprocessing
+import os
+import queue
+import re
+import threading
+
+# Start of a bzip2 stream: magic, block size, then the magic of the first block
+BZ2_STREAM = re.compile(rb'BZh[1-9]1AY&SY')
+
+# Compressed bytes per segment decompressed by a worker
+SEGMENT_SIZE = 1 << 20
+
+# Decompressed bytes read at a time from a single stream: decompressing in
+# large blocks is much faster than in the small reads of the XML parsers
+BLOCK_SIZE = 1 << 20
+
+def compression_of(path):
+    """Return the compression of a file from its extension: 'bz2', 'gzip'
+    or None"""
+    if path.endswith('.bz2'):
+        return 'bz2'
+    elif path.endswith('.gz'):
+        return 'gzip'
+    return None
+
+def is_compressed(path):
+    return compression_of(path) is not None
+
+def bz2_segments(path, segment_size=SEGMENT_SIZE):
+    """Split a bzip2 file into segments of whole streams
+
+    Args:
+        path: bzip2 file
+        segment_size: minimum compressed size of a segment
+    Returns:
+        list of (start, end) byte ranges, a single one if the file has a
+        single stream
+
+    """
+    size = os.path.getsize(path)
+    if size == 0:
+        return []
+    with open(path, 'rb') as f, \
+            mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+        starts = [m.start() for m in BZ2_STREAM.finditer(data)]
+    if not starts or starts[0] != 0:
+        raise OSError('Not a bzip2 file: ' + path)
+    segments = []
+    start = 0
+    for offset in starts[1:]:
+        if offset - start >= segment_size:
+            segments.append((start, offset))
+            start = offset
+    segments.append((start, size))
+    return segments
+
+def decompress_segment(args):
+    """Decompress the bzip2 streams of a segment
+
+    Args:
+        args: tuple (path, start, end)
+    Returns:
+        decompressed bytes
+
+    """
+    path, start, end = args
+    with open(path, 'rb') as f:
+        f.seek(start)
+        data = f.read(end - start)
+    parts = []
+    while data:
+        decompressor = bz2.BZ2Decompressor()
+        parts.append(decompressor.decompress(data))
+        if not decompressor.eof:
+            # A stream signature found inside compressed data
+            raise OSError('Truncated bzip2 stream at offset {0} of {1}, '
+                          'decompress it with a single process'.format(start, path))
+        data = decompressor.unused_data
+    return b''.join(parts)
+
+
+class ParallelBz2Reader(object):
+    """Read the segments of a bzip2 file decompressed by a process pool,
+    with at most 2 segments per process in memory
+
+    Args:
+        path: bzip2 file
+        segments: list of (start, end) segments, see bz2_segments
+        processes: number of worker processes
+    """
+
+    def __init__(self, path, segments, processes):
+        self.pool = multiprocessing.Pool(processes)
+        self.tasks = iter([(path, start, end) for start, end in segments])
+        self.pending = collections.deque()
+        self.window = 2 * processes
+        self.position = 0
+        self.submit()
+
+    def submit(self):
+        while len(self.pending) < self.window:
+            task = next(self.tasks, None)
+            if task is None:
+                break
+            self.pending.append((task[2], self.pool.apply_async(decompress_segment,
+                                                                (task,))))
+
+    def read_block(self):
+        """Return the next decompressed segment, or b'' at the end"""
+        while self.pending:
+            self.position, result = self.pending.popleft()
+            block = result.get()
+            self.submit()
+            if block:
+                return block
+        return b''
+
+    def tell(self):
+        """Return the end of the segment read, in the compressed file"""
+        return self.position
+
+    def close(self):
+        self.pool.terminate()
+        self.pool.join()
+
+
+class ReadAhead(object):
+    """Read the blocks of a decompressing stream in a background thread: the
+    decompression releases the GIL, so it runs while the blocks already read
+    are parsed
+
+    Args:
+        stream: bz2.BZ2File or gzip.GzipFile
+        raw: compressed file read by stream
+        block_size: decompressed bytes per block
+        blocks: maximum number of blocks read ahead
+    """
+
+    def __init__(self, stream, raw, block_size=BLOCK_SIZE, blocks=4):
+        self.stream = stream
+        self.raw = raw
+        self.block_size = block_size
+        self.queue = queue.Queue(blocks)
+        self.eof = False
+        self.closed = threading.Event()
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def run(self):
+        try:
+            while not self.closed.is_set():
+                block = self.stream.read(self.block_size)
+                self.put(block)
+                if not block:
+                    return
+        except Exception as e:
+            self.put(e)
+
+    def put(self, item):
+        while not self.closed.is_set():
+            try:
+                self.queue.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                pass
+
+    def read_block(self):
+        """Return the next decompressed block, or b'' at the end"""
+        if self.eof:
+            return b''
+        block = self.queue.get()
+        if isinstance(block, Exception):
+            raise block
+        self.eof = not block
+        return block
+
+    def tell(self):
+        """Return the bytes of the compressed file read, including the
+        blocks read ahead"""
+        return self.raw.tell()
+
+    def close(self):
+        self.closed.set()
+        self.thread.join()
+        self.stream.close()
+
+
+class DecompressingReader(object):
+    """Binary file-like object reading a compressed file, decompressed in
+    blocks by a background thread, or by a process pool (multi-stream bzip2
+    files with processes > 1)
+
+    Args:
+        path: .bz2 or .gz file
+        processes: number of processes decompressing a multi-stream bzip2
+            file
+    """
+
+    def __init__(self, path, processes=1):
+        self.raw = open(path, 'rb')
+        self.buffer = b''
+        self.offset = 0
+        if compression_of(path) == 'bz2':
+            segments = bz2_segments(path) if processes > 1 else []
+            if len(segments) > 1:
+                self.blocks = ParallelBz2Reader(path, segments, processes)
+            else:
+                self.blocks = ReadAhead(bz2.BZ2File(self.raw), self.raw)
+        else:
+            self.blocks = ReadAhead(gzip.GzipFile(fileobj=self.raw), self.raw)
+
+    def read(self, size=-1):
+        if size is None or size < 0:
+            parts = [self.buffer[self.offset:]]
+            parts.extend(iter(self.blocks.read_block, b''))
+            self.buffer, self.offset = b'', 0
+            return b''.join(parts)
+        if self.offset == len(self.buffer):
+            self.buffer, self.offset = self.blocks.read_block(), 0
+        data = self.buffer[self.offset:self.offset + size]
+        self.offset += len(data)
+        return data
+
+    def tell(self):
+        """Return the bytes of the compressed file read, for the progress
+        (not an offset in the decompressed data)"""
+        return self.blocks.tell()
+
+    def close(self):
+        self.blocks.close()
+        self.raw.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+def open_input(path, processes=1):
+    """Open an OSM file for reading in binary mode, decompressing it while
+    streaming if it is compressed
+
+    The file objects of compressed files only support read (which may
+    return less than the size requested before the end of the file), tell
+    (in the compressed file) and close.
+
+    Args:
+        path: OSM file, .osm, .osm.bz2 or .osm.gz
+        processes: number of processes decompressing a multi-stream bzip2
+            file
+    Returns:
+        binary file-like object
+
+    """
+    if is_compressed(path):
+        return DecompressingReader(path, processes)
+    return open(path, 'rb')
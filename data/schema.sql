@@ -3,6 +3,10 @@ DROP TABLE nodes_tags;
 DROP TABLE ways;
 DROP TABLE ways_tags;
 DROP TABLE ways_nodes;
+DROP TABLE ways_geometry;
+DROP TABLE relations;
+DROP TABLE relations_tags;
+DROP TABLE relations_members;
 
 CREATE TABLE nodes (
     id INTEGER NOT NULL,
@@ -48,9 +52,51 @@ CREATE TABLE ways_nodes (
     FOREIGN KEY (node_id) REFERENCES nodes(id)
 );
 
+CREATE TABLE ways_geometry (
+    id INTEGER NOT NULL,
+    min_lat REAL,
+    min_lon REAL,
+    max_lat REAL,
+    max_lon REAL,
+    length REAL,
+    centroid_lat REAL,
+    centroid_lon REAL,
+    FOREIGN KEY (id) REFERENCES ways(id)
+);
+
+CREATE TABLE relations (
+    id INTEGER NOT NULL,
+    user TEXT,
+    uid INTEGER,
+    version TEXT,
+    changeset INTEGER,
+    timestamp TEXT
+);
+
+CREATE TABLE relations_tags (
+    id INTEGER NOT NULL,
+    key TEXT NOT NULL,
+    value TEXT NOT NULL,
+    type TEXT,
+    FOREIGN KEY (id) REFERENCES relations(id)
+);
+
+CREATE TABLE relations_members (
+    id INTEGER NOT NULL,
+    member_type TEXT NOT NULL,
+    member_id INTEGER NOT NULL,
+    role TEXT,
+    position INTEGER NOT NULL,
+    FOREIGN KEY (id) REFERENCES relations(id)
+);
+
 .mode csv
 .import nodes.csv nodes
 .import nodes_tags.csv nodes_tags
 .import ways.csv ways
 .import ways_tags.csv ways_tags
-.import ways_nodes.csv ways_nodes
\ No newline at end of file
+.import ways_nodes.csv ways_nodes
+.import ways_geometry.csv ways_geometry
+.import relations.csv relations
+.import relations_tags.csv relations_tags
+.import relations_members.csv relations_members
\ No newline at end of file
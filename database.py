@@ -0,0 +1,890 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 14:05:12 2026
+
+@author: rogerduong
+"""
+
+import argparse
+import csv
+import os
+import sqlite3
+
+DB_PATH = "data/singapore.db"
+
+# Same tables as data/schema.sql
+CREATE_TABLES = """
+CREATE TABLE nodes (
+    id INTEGER NOT NULL,
+    lat REAL,
+    lon REAL,
+    user TEXT,
+    uid INTEGER,
+    version INTEGER,
+    changeset INTEGER,
+    timestamp TEXT
+);
+
+CREATE TABLE nodes_tags (
+    id INTEGER,
+    key TEXT,
+    value TEXT,
+    type TEXT,
+    FOREIGN KEY (id) REFERENCES nodes(id)
+);
+
+CREATE TABLE ways (
+    id INTEGER NOT NULL,
+    user TEXT,
+    uid INTEGER,
+    version TEXT,
+    changeset INTEGER,
+    timestamp TEXT
+);
+
+CREATE TABLE ways_tags (
+    id INTEGER NOT NULL,
+    key TEXT NOT NULL,
+    value TEXT NOT NULL,
+    type TEXT,
+    FOREIGN KEY (id) REFERENCES ways(id)
+);
+
+CREATE TABLE ways_nodes (
+    id INTEGER NOT NULL,
+    node_id INTEGER NOT NULL,
+    position INTEGER NOT NULL,
+    FOREIGN KEY (id) REFERENCES ways(id),
+    FOREIGN KEY (node_id) REFERENCES nodes(id)
+);
+
+CREATE TABLE ways_geometry (
+    id INTEGER NOT NULL,
+    min_lat REAL,
+    min_lon REAL,
+    max_lat REAL,
+    max_lon REAL,
+    length REAL,
+    centroid_lat REAL,
+    centroid_lon REAL,
+    FOREIGN KEY (id) REFERENCES ways(id)
+);
+
+CREATE TABLE relations (
+    id INTEGER NOT NULL,
+    user TEXT,
+    uid INTEGER,
+    version TEXT,
+    changeset INTEGER,
+    timestamp TEXT
+);
+
+CREATE TABLE relations_tags (
+    id INTEGER NOT NULL,
+    key TEXT NOT NULL,
+    value TEXT NOT NULL,
+    type TEXT,
+    FOREIGN KEY (id) REFERENCES relations(id)
+);
+
+CREATE TABLE relations_members (
+    id INTEGER NOT NULL,
+    member_type TEXT NOT NULL,
+    member_id INTEGER NOT NULL,
+    role TEXT,
+    position INTEGER NOT NULL,
+    FOREIGN KEY (id) REFERENCES relations(id)
+);
+"""
+
+# Dictionary encoded layout (see SqliteWriter): the tag keys and types, tag
+# values and user names are stored once in dictionary tables, and the tables
+# of the elements and their tags keep their integer ids
+CREATE_ENCODED_TABLES = """
+CREATE TABLE tag_keys (
+    id INTEGER PRIMARY KEY,
+    key TEXT NOT NULL,
+    type TEXT NOT NULL,
+    UNIQUE (key, type)
+);
+
+CREATE TABLE tag_values (
+    id INTEGER PRIMARY KEY,
+    value TEXT NOT NULL UNIQUE
+);
+
+CREATE TABLE users (
+    id INTEGER PRIMARY KEY,
+    user TEXT NOT NULL UNIQUE
+);
+
+CREATE TABLE nodes_encoded (
+    id INTEGER NOT NULL,
+    lat REAL,
+    lon REAL,
+    user_id INTEGER REFERENCES users(id),
+    uid INTEGER,
+    version INTEGER,
+    changeset INTEGER,
+    timestamp TEXT
+);
+
+CREATE TABLE nodes_tags_encoded (
+    id INTEGER NOT NULL,
+    key_id INTEGER NOT NULL REFERENCES tag_keys(id),
+    value_id INTEGER NOT NULL REFERENCES tag_values(id)
+);
+
+CREATE TABLE ways_encoded (
+    id INTEGER NOT NULL,
+    user_id INTEGER REFERENCES users(id),
+    uid INTEGER,
+    version TEXT,
+    changeset INTEGER,
+    timestamp TEXT
+);
+
+CREATE TABLE ways_tags_encoded (
+    id INTEGER NOT NULL,
+    key_id INTEGER NOT NULL REFERENCES tag_keys(id),
+    value_id INTEGER NOT NULL REFERENCES tag_values(id)
+);
+
+CREATE TABLE relations_encoded (
+    id INTEGER NOT NULL,
+    user_id INTEGER REFERENCES users(id),
+    uid INTEGER,
+    version TEXT,
+    changeset INTEGER,
+    timestamp TEXT
+);
+
+CREATE TABLE relations_tags_encoded (
+    id INTEGER NOT NULL,
+    key_id INTEGER NOT NULL REFERENCES tag_keys(id),
+    value_id INTEGER NOT NULL REFERENCES tag_values(id)
+);
+"""
+
+# Compatibility views of the encoded tables, with the columns of the tables
+# of data/schema.sql, so that singapore_queries.sql, spatial.py and
+# incremental.py work unchanged. Inserts and deletes (and updates of the tag
+# values) are encoded by INSTEAD OF triggers.
+ELEMENT_VIEW = """
+CREATE VIEW {table} AS
+    SELECT {columns}
+    FROM {table}_encoded AS e LEFT JOIN users ON users.id = e.user_id;
+
+CREATE TRIGGER {table}_insert INSTEAD OF INSERT ON {table}
+BEGIN
+    INSERT OR IGNORE INTO users (user) VALUES (NEW.user);
+    INSERT INTO {table}_encoded ({encoded_columns}) VALUES ({new_values});
+END;
+
+CREATE TRIGGER {table}_delete INSTEAD OF DELETE ON {table}
+BEGIN
+    DELETE FROM {table}_encoded WHERE id = OLD.id;
+END;
+"""
+
+TAG_VIEW = """
+CREATE VIEW {table} AS
+    SELECT t.id, tag_keys.key, tag_values.value, tag_keys.type{columns}
+    FROM {table}_encoded AS t
+    JOIN tag_keys ON tag_keys.id = t.key_id
+    LEFT JOIN tag_values ON tag_values.id = t.value_id;
+
+CREATE TRIGGER {table}_insert INSTEAD OF INSERT ON {table}
+BEGIN
+    INSERT OR IGNORE INTO tag_keys (key, type) VALUES (NEW.key, NEW.type);
+    INSERT OR IGNORE INTO tag_values (value) VALUES (NEW.value);
+    INSERT INTO {table}_encoded
+        VALUES (NEW.id,
+                (SELECT id FROM tag_keys WHERE key = NEW.key AND type = NEW.type),
+                (SELECT id FROM tag_values WHERE value = NEW.value){new_values});
+END;
+
+CREATE TRIGGER {table}_delete INSTEAD OF DELETE ON {table}
+BEGIN
+    DELETE FROM {table}_encoded
+    WHERE id = OLD.id{where}
+      AND key_id = (SELECT id FROM tag_keys WHERE key = OLD.key AND type = OLD.type)
+      AND value_id = (SELECT id FROM tag_values WHERE value = OLD.value);
+END;
+
+CREATE TRIGGER {table}_update INSTEAD OF UPDATE OF value ON {table}
+BEGIN
+    INSERT OR IGNORE INTO tag_values (value) VALUES (NEW.value);
+    UPDATE {table}_encoded
+    SET value_id = (SELECT id FROM tag_values WHERE value = NEW.value)
+    WHERE id = OLD.id{where}
+      AND key_id = (SELECT id FROM tag_keys WHERE key = OLD.key AND type = OLD.type)
+      AND value_id = (SELECT id FROM tag_values WHERE value = OLD.value);
+END;
+"""
+
+# Columns of the element tables, and dictionary of the encoded tables: id
+ENCODED_ELEMENTS = {
+    'nodes': ['id', 'lat', 'lon', 'user', 'uid', 'version', 'changeset', 'timestamp'],
+    'ways': ['id', 'user', 'uid', 'version', 'changeset', 'timestamp'],
+    'relations': ['id', 'user', 'uid', 'version', 'changeset', 'timestamp'],
+}
+ENCODED_TAGS = ['nodes_tags', 'ways_tags', 'relations_tags']
+DICTIONARY_TABLES = ['tag_keys', 'tag_values', 'users']
+ENCODED_TABLES = [table + '_encoded' for table in list(ENCODED_ELEMENTS) + ENCODED_TAGS]
+
+# Built after the load, so that inserts do not have to maintain them
+CREATE_INDEXES = """
+CREATE INDEX IF NOT EXISTS nodes_id ON nodes (id);
+CREATE INDEX IF NOT EXISTS ways_id ON ways (id);
+CREATE INDEX IF NOT EXISTS relations_id ON relations (id);
+CREATE INDEX IF NOT EXISTS nodes_tags_id ON nodes_tags (id);
+CREATE INDEX IF NOT EXISTS ways_tags_id ON ways_tags (id);
+CREATE INDEX IF NOT EXISTS ways_nodes_id ON ways_nodes (id, position);
+CREATE INDEX IF NOT EXISTS ways_nodes_node_id ON ways_nodes (node_id);
+CREATE INDEX IF NOT EXISTS ways_geometry_id ON ways_geometry (id);
+CREATE INDEX IF NOT EXISTS relations_tags_id ON relations_tags (id);
+CREATE INDEX IF NOT EXISTS relations_members_id ON relations_members (id, position);
+CREATE INDEX IF NOT EXISTS relations_members_member ON relations_members (member_type, member_id);
+"""
+
+CREATE_ENCODED_INDEXES = """
+CREATE INDEX IF NOT EXISTS nodes_encoded_id ON nodes_encoded (id);
+CREATE INDEX IF NOT EXISTS ways_encoded_id ON ways_encoded (id);
+CREATE INDEX IF NOT EXISTS relations_encoded_id ON relations_encoded (id);
+CREATE INDEX IF NOT EXISTS nodes_tags_encoded_id ON nodes_tags_encoded (id);
+CREATE INDEX IF NOT EXISTS ways_tags_encoded_id ON ways_tags_encoded (id);
+CREATE INDEX IF NOT EXISTS ways_nodes_id ON ways_nodes (id, position);
+CREATE INDEX IF NOT EXISTS ways_nodes_node_id ON ways_nodes (node_id);
+CREATE INDEX IF NOT EXISTS ways_geometry_id ON ways_geometry (id);
+CREATE INDEX IF NOT EXISTS relations_tags_encoded_id ON relations_tags_encoded (id);
+CREATE INDEX IF NOT EXISTS relations_members_id ON relations_members (id, position);
+CREATE INDEX IF NOT EXISTS relations_members_member ON relations_members (member_type, member_id);
+"""
+
+# Post-load optimization of the singapore_queries.sql workload (see optimize):
+# covering indexes of the tag lookups by key and value (and by value alone,
+# for the nodes with a value under any key), and a materialized tags table
+# with the tags of all the elements
+CREATE_TAGS = """
+DROP TABLE IF EXISTS tags;
+
+CREATE TABLE tags (
+    id INTEGER NOT NULL,
+    key TEXT,
+    value TEXT,
+    type TEXT,
+    element_type TEXT NOT NULL
+);
+
+INSERT INTO tags
+    SELECT id, key, value, type, 'node' FROM nodes_tags
+    UNION ALL
+    SELECT id, key, value, type, 'way' FROM ways_tags
+    UNION ALL
+    SELECT id, key, value, type, 'relation' FROM relations_tags;
+
+CREATE INDEX tags_key_value ON tags (key, value, element_type, id);
+CREATE INDEX tags_id ON tags (element_type, id);
+"""
+
+CREATE_COVERING_INDEXES = """
+CREATE INDEX IF NOT EXISTS nodes_tags_key_value ON nodes_tags (key, value, id);
+CREATE INDEX IF NOT EXISTS ways_tags_key_value ON ways_tags (key, value, id);
+CREATE INDEX IF NOT EXISTS relations_tags_key_value ON relations_tags (key, value, id);
+CREATE INDEX IF NOT EXISTS nodes_tags_value ON nodes_tags (value, id);
+"""
+
+# Encoded version of the tags table: the view keeps the columns of CREATE_TAGS
+CREATE_ENCODED_TAGS = """
+DROP TABLE IF EXISTS tags_encoded;
+
+CREATE TABLE tags_encoded (
+    id INTEGER NOT NULL,
+    key_id INTEGER NOT NULL,
+    value_id INTEGER NOT NULL,
+    element_type TEXT NOT NULL
+);
+
+INSERT INTO tags_encoded
+    SELECT id, key_id, value_id, 'node' FROM nodes_tags_encoded
+    UNION ALL
+    SELECT id, key_id, value_id, 'way' FROM ways_tags_encoded
+    UNION ALL
+    SELECT id, key_id, value_id, 'relation' FROM relations_tags_encoded;
+
+CREATE INDEX tags_encoded_key_value ON tags_encoded (key_id, value_id, element_type, id);
+CREATE INDEX tags_encoded_id ON tags_encoded (element_type, id);
+"""
+
+CREATE_ENCODED_COVERING_INDEXES = """
+CREATE INDEX IF NOT EXISTS nodes_tags_encoded_key_value ON nodes_tags_encoded (key_id, value_id, id);
+CREATE INDEX IF NOT EXISTS ways_tags_encoded_key_value ON ways_tags_encoded (key_id, value_id, id);
+CREATE INDEX IF NOT EXISTS relations_tags_encoded_key_value ON relations_tags_encoded (key_id, value_id, id);
+CREATE INDEX IF NOT EXISTS nodes_tags_encoded_value ON nodes_tags_encoded (value_id, id);
+"""
+
+# Element tables rebuilt with their id as primary key, and their id indexes
+# made redundant by the primary keys
+PRIMARY_KEY_TABLES = [('nodes', 'nodes_id'), ('ways', 'ways_id'),
+                      ('relations', 'relations_id')]
+ENCODED_PRIMARY_KEY_TABLES = [('nodes_encoded', 'nodes_encoded_id'),
+                              ('ways_encoded', 'ways_encoded_id'),
+                              ('relations_encoded', 'relations_encoded_id')]
+
+# Spatial indexes: R*Tree of the node coordinates, filled during the load,
+# and of the way bounding boxes, computed from ways_nodes after the load
+CREATE_SPATIAL = """
+CREATE VIRTUAL TABLE nodes_rtree USING rtree(id, min_lat, max_lat, min_lon, max_lon);
+CREATE VIRTUAL TABLE ways_rtree USING rtree(id, min_lat, max_lat, min_lon, max_lon);
+"""
+
+SPATIAL_TABLES = ['nodes_rtree', 'ways_rtree']
+
+# State of a load with checkpoints, committed with its rows (see
+# SqliteWriter.checkpoint)
+CREATE_CHECKPOINT = """
+CREATE TABLE IF NOT EXISTS load_checkpoint (
+    id INTEGER PRIMARY KEY,
+    state BLOB NOT NULL
+);
+"""
+
+INSERT_WAYS_BBOX = """
+INSERT INTO ways_rtree
+    SELECT ways_nodes.id, MIN(nodes.lat), MAX(nodes.lat), MIN(nodes.lon), MAX(nodes.lon)
+    FROM ways_nodes JOIN nodes ON nodes.id = ways_nodes.node_id
+    {0}
+    GROUP BY ways_nodes.id
+"""
+
+# Shaped element keys and their tables
+TABLES = {
+    'node': 'nodes',
+    'node_tags': 'nodes_tags',
+    'way': 'ways',
+    'way_nodes': 'ways_nodes',
+    'way_tags': 'ways_tags',
+    'way_geometry': 'ways_geometry',
+    'relation': 'relations',
+    'relation_tags': 'relations_tags',
+    'relation_members': 'relations_members',
+}
+
+# Bulk load settings: no rollback journal, no fsync, 1 GB page cache
+BULK_PRAGMAS = [
+    'PRAGMA journal_mode = OFF',
+    'PRAGMA synchronous = OFF',
+    'PRAGMA cache_size = -1048576',
+    'PRAGMA temp_store = MEMORY',
+    'PRAGMA locking_mode = EXCLUSIVE',
+]
+
+def connect(db_path=DB_PATH, bulk=False):
+    """Open the sqlite3 database
+
+    Args:
+        db_path: path of the database file
+        bulk: boolean to specify if the bulk load pragmas must be set
+    Returns:
+        connection
+
+    """
+    conn = sqlite3.connect(db_path, isolation_level=None)
+    if bulk is True:
+        for pragma in BULK_PRAGMAS:
+            conn.execute(pragma)
+    return conn
+
+def create_tables(conn, encoded=False):
+    """Drop and recreate the tables of data/schema.sql
+
+    With encoded=True, the element and tags tables are created in the
+    dictionary encoded layout, behind views of the same name and columns.
+
+    Args:
+        conn: sqlite3 connection
+        encoded: boolean to specify if the encoded layout must be created
+
+    """
+    # Tables of both layouts, the summary of the aggregates of the previous
+    # load, and the tags table (or view) of an optimized database, which
+    # would keep the tags of the previous load
+    tables = (list(TABLES.values()) + SPATIAL_TABLES + ENCODED_TABLES +
+              DICTIONARY_TABLES + ['tags', 'tags_encoded', 'summary', 'load_checkpoint'])
+    for (name,) in conn.execute("SELECT name FROM sqlite_master "
+                                "WHERE type IN ('table', 'view')").fetchall():
+        if name in tables:
+            drop_table(conn, name)
+    conn.executescript(CREATE_TABLES)
+    if encoded is True:
+        for table in list(ENCODED_ELEMENTS) + ENCODED_TAGS:
+            conn.execute('DROP TABLE ' + table)
+        conn.executescript(CREATE_ENCODED_TABLES)
+        create_views(conn)
+
+def element_view(table, columns):
+    """Return the view and triggers of an encoded element table"""
+    return ELEMENT_VIEW.format(
+        table=table,
+        columns=', '.join('users.user' if c == 'user' else 'e.' + c for c in columns),
+        encoded_columns=', '.join('user_id' if c == 'user' else c for c in columns),
+        new_values=', '.join('(SELECT id FROM users WHERE user = NEW.user)'
+                             if c == 'user' else 'NEW.' + c for c in columns))
+
+def create_views(conn):
+    """Create the compatibility views of the encoded element and tags tables
+
+    Args:
+        conn: sqlite3 connection
+
+    """
+    for table, columns in ENCODED_ELEMENTS.items():
+        conn.executescript(element_view(table, columns))
+    for table in ENCODED_TAGS:
+        conn.executescript(TAG_VIEW.format(table=table, columns='', new_values='',
+                                           where=''))
+
+def is_encoded(conn):
+    """Return True if the database has the dictionary encoded layout"""
+    return table_exists(conn, 'nodes_encoded')
+
+def create_indexes(conn, encoded=False):
+    """Create the indexes on the loaded tables
+
+    Args:
+        conn: sqlite3 connection
+        encoded: boolean to specify if the tables have the encoded layout
+
+    """
+    conn.executescript(CREATE_ENCODED_INDEXES if encoded is True else CREATE_INDEXES)
+    conn.execute('ANALYZE')
+
+def build_ways_bbox(conn, way_ids=None):
+    """Compute the bounding boxes of ways in ways_rtree from their nodes
+
+    Args:
+        conn: sqlite3 connection
+        way_ids: ids of the ways to (re)compute, or None for all the ways
+
+    """
+    if way_ids is None:
+        conn.execute(INSERT_WAYS_BBOX.format(''))
+        return
+    way_ids = [(int(way_id),) for way_id in way_ids]
+    conn.executemany('DELETE FROM ways_rtree WHERE id = ?', way_ids)
+    conn.executemany(INSERT_WAYS_BBOX.format('WHERE ways_nodes.id = ?'), way_ids)
+
+def drop_table(conn, table):
+    """Drop a table or a view, if it exists"""
+    row = conn.execute("SELECT type FROM sqlite_master WHERE type IN ('table', 'view') "
+                       "AND name = ?", (table,)).fetchone()
+    if row is not None:
+        conn.execute('DROP {0} {1}'.format(row[0].upper(), table))
+
+def table_exists(conn, table):
+    """Return True if the table (or the view of an encoded table) exists in
+    the database"""
+    return conn.execute("SELECT 1 FROM sqlite_master WHERE type IN ('table', 'view') "
+                        "AND name = ?", (table,)).fetchone() is not None
+
+def add_primary_key(conn, table):
+    """Rebuild an element table with its id as INTEGER PRIMARY KEY, sorted
+    by id. Does nothing if the table already has a primary key.
+
+    Args:
+        conn: sqlite3 connection
+        table: nodes, ways or relations
+
+    """
+    columns = conn.execute('PRAGMA table_info({0})'.format(table)).fetchall()
+    if any(pk for _, _, _, _, _, pk in columns):
+        return
+    definitions = ['{0} {1}{2}'.format(name, col_type,
+                                       ' PRIMARY KEY' if name == 'id' else '')
+                   for _, name, col_type, _, _, _ in columns]
+    conn.executescript("""
+        BEGIN;
+        CREATE TABLE {0}_pk ({1});
+        INSERT INTO {0}_pk SELECT * FROM {0} ORDER BY id;
+        DROP TABLE {0};
+        ALTER TABLE {0}_pk RENAME TO {0};
+        COMMIT;
+        """.format(table, ', '.join(definitions)))
+
+def optimize(db_path=DB_PATH):
+    """Optimize a loaded database for the singapore_queries.sql workload
+
+    Adds primary keys on the element ids, covering (key, value, id) indexes
+    on the tags tables, a (value, id) index on nodes_tags, and the
+    materialized tags table, with the tags of nodes, ways and relations and
+    their element_type. The tags table is kept up to date by incremental.py,
+    but is dropped by a new load: optimize the database again after it.
+
+    In the encoded layout, the same optimizations apply to the encoded
+    tables, with (key_id, value_id, id) indexes, and tags is a view of the
+    tags_encoded table.
+
+    Args:
+        db_path: path of the database file
+
+    """
+    conn = connect(db_path, bulk=True)
+    # The tags table or view of a previous optimization, of either layout
+    drop_table(conn, 'tags')
+    if is_encoded(conn):
+        # The tables are rebuilt under the views referring to them
+        conn.execute('PRAGMA legacy_alter_table = ON')
+        for table, index in ENCODED_PRIMARY_KEY_TABLES:
+            add_primary_key(conn, table)
+            conn.execute('DROP INDEX IF EXISTS ' + index)
+        conn.executescript(CREATE_ENCODED_COVERING_INDEXES)
+        conn.executescript(CREATE_ENCODED_TAGS)
+        conn.executescript(TAG_VIEW.format(
+            table='tags', columns=', t.element_type', new_values=', NEW.element_type',
+            where=' AND element_type = OLD.element_type'))
+    else:
+        for table, index in PRIMARY_KEY_TABLES:
+            add_primary_key(conn, table)
+            conn.execute('DROP INDEX IF EXISTS ' + index)
+        conn.executescript(CREATE_COVERING_INDEXES)
+        conn.executescript(CREATE_TAGS)
+    conn.execute('ANALYZE')
+    conn.close()
+
+def patch_tags(db_path, patches, key):
+    """Replace the values of the key tags of the given ids in one transaction
+
+    Args:
+        db_path: path of the database file
+        patches: dictionary of shaped element key ('node_tags', 'way_tags'
+            or 'relation_tags'): {id: new value}
+        key: tag key to patch
+
+    """
+    conn = connect(db_path)
+    with conn:
+        conn.execute('BEGIN')
+        has_tags = table_exists(conn, 'tags')
+        for tag_type, values in patches.items():
+            rows = [(value, int(element_id), key) for element_id, value in values.items()]
+            conn.executemany(
+                'UPDATE {0} SET value = ? WHERE id = ? AND key = ?'.format(TABLES[tag_type]),
+                rows)
+            if has_tags:
+                conn.executemany(
+                    "UPDATE tags SET value = ? WHERE id = ? AND key = ? "
+                    "AND element_type = '{0}'".format(tag_type.split('_')[0]), rows)
+    conn.close()
+
+def update_tags(db_path, updates):
+    """Replace the values of tags in one transaction
+
+    Args:
+        db_path: path of the database file
+        updates: dictionary of shaped element key ('node_tags', 'way_tags'
+            or 'relation_tags'): list of (new value, id, key, old value)
+
+    """
+    conn = connect(db_path)
+    with conn:
+        conn.execute('BEGIN')
+        has_tags = table_exists(conn, 'tags')
+        for tag_type, rows in updates.items():
+            conn.executemany(
+                'UPDATE {0} SET value = ? WHERE id = ? AND key = ? AND value = ?'.format(
+                    TABLES[tag_type]), rows)
+            if has_tags:
+                conn.executemany(
+                    "UPDATE tags SET value = ? WHERE id = ? AND key = ? AND value = ? "
+                    "AND element_type = '{0}'".format(tag_type.split('_')[0]), rows)
+    conn.close()
+
+def read_checkpoint(db_path=DB_PATH):
+    """Return the state of the last checkpoint of an unfinished load (see
+    SqliteWriter.checkpoint), or None
+
+    Args:
+        db_path: path of the database file
+    Returns:
+        bytes of the state
+
+    """
+    if not os.path.exists(db_path):
+        return None
+    conn = connect(db_path)
+    try:
+        if not table_exists(conn, 'load_checkpoint'):
+            return None
+        row = conn.execute('SELECT state FROM load_checkpoint WHERE id = 1').fetchone()
+        return row[0] if row is not None else None
+    finally:
+        conn.close()
+
+
+class SqliteWriter(object):
+    """Stream shaped elements into the sqlite3 database
+
+    Rows are buffered per table and inserted with executemany, inside
+    transactions of transaction_size rows. Indexes are built on close.
+
+    With spatial=True, the node coordinates are also inserted in the
+    nodes_rtree R*Tree, and the way bounding boxes in ways_rtree: from the
+    way_geometry rows if there are any, from ways_nodes on close otherwise.
+
+    With encoded=True, the tables are created in the dictionary encoded
+    layout (see create_tables): the tag keys and types, tag values and user
+    names are given ids by in-memory interning tables as the rows are
+    written, and the dictionary tables are written on close.
+
+    With checkpoints=True, the rows are only committed by checkpoint, with
+    the state of the load, in the WAL journal mode: a load killed or failing
+    between two checkpoints is rolled back to the last one. With
+    resume=True, the tables are not created again, and the rows are
+    appended to the ones of the last checkpoint.
+
+    Args:
+        fields: dictionary of shaped element key: list of fields
+        db_path: path of the database file
+        batch_size: number of rows per executemany
+        transaction_size: number of rows per transaction
+        spatial: boolean to specify if the spatial indexes must be built
+        encoded: boolean to specify if the encoded layout must be used
+        checkpoints: boolean to specify if the rows must only be committed
+            by checkpoint
+        resume: boolean to specify if the load resumes from a checkpoint
+    """
+
+    def __init__(self, fields, db_path=DB_PATH, batch_size=10000,
+                 transaction_size=500000, spatial=True, encoded=False,
+                 checkpoints=False, resume=False):
+        self.fields = fields
+        self.db_path = db_path
+        self.batch_size = batch_size
+        self.transaction_size = transaction_size
+        self.spatial = spatial
+        self.encoded = encoded
+        self.checkpoints = checkpoints
+        self.resume = resume
+        self.conn = None
+        self.inserts = {}
+        self.pending = {}
+        self.encoders = {}
+        self.dictionaries = {table: {} for table in DICTIONARY_TABLES}
+        self.written = dict.fromkeys(DICTIONARY_TABLES, 0)
+        self.uncommitted = 0
+        self.geometries = 0
+
+    def __enter__(self):
+        self.open()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close(exc_type is None)
+
+    def open(self):
+        self.conn = connect(self.db_path, bulk=True)
+        if self.checkpoints is True:
+            self.conn.execute('PRAGMA journal_mode = WAL')
+        if self.resume is True:
+            self.read_dictionaries()
+            if self.spatial is True:
+                self.geometries = self.conn.execute(
+                    'SELECT COUNT(*) FROM ways_rtree').fetchone()[0]
+        else:
+            create_tables(self.conn, self.encoded)
+            if self.spatial is True:
+                self.conn.executescript(CREATE_SPATIAL)
+        if self.spatial is True:
+            node_fields = self.fields['node']
+            self.node_coords = [node_fields.index(f) for f in ('id', 'lat', 'lon')]
+            geometry_fields = self.fields.get('way_geometry')
+            if geometry_fields is not None:
+                self.way_bbox = [geometry_fields.index(f) for f in
+                                 ('id', 'min_lat', 'max_lat', 'min_lon', 'max_lon')]
+        for key, fields in self.fields.items():
+            table, columns = TABLES[key], fields
+            if self.encoded is True and table in ENCODED_ELEMENTS:
+                table += '_encoded'
+                columns = ['user_id' if f == 'user' else f for f in fields]
+                self.encoders[key] = self.user_encoder(fields)
+            elif self.encoded is True and table in ENCODED_TAGS:
+                table += '_encoded'
+                columns = ['id', 'key_id', 'value_id']
+                self.encoders[key] = self.tag_encoder(fields)
+            self.inserts[key] = 'INSERT INTO {0} ({1}) VALUES ({2})'.format(
+                table, ', '.join(columns), ', '.join('?' * len(columns)))
+            self.pending[key] = []
+        self.conn.execute('BEGIN')
+
+    def user_encoder(self, fields):
+        """Return the function replacing the user names of element rows by
+        their ids"""
+        i = fields.index('user')
+        users = self.dictionaries['users']
+
+        def encode(rows):
+            encoded = []
+            for row in rows:
+                row = list(row)
+                user_id = users.get(row[i])
+                if user_id is None:
+                    user_id = users[row[i]] = len(users) + 1
+                row[i] = user_id
+                encoded.append(row)
+            return encoded
+        return encode
+
+    def tag_encoder(self, fields):
+        """Return the function encoding tag rows into (id, key_id, value_id)"""
+        i, k, v, t = [fields.index(f) for f in ('id', 'key', 'value', 'type')]
+        keys = self.dictionaries['tag_keys']
+        values = self.dictionaries['tag_values']
+
+        def encode(rows):
+            encoded = []
+            for row in rows:
+                key = (row[k], row[t])
+                key_id = keys.get(key)
+                if key_id is None:
+                    key_id = keys[key] = len(keys) + 1
+                value_id = values.get(row[v])
+                if value_id is None:
+                    value_id = values[row[v]] = len(values) + 1
+                encoded.append((row[i], key_id, value_id))
+            return encoded
+        return encode
+
+    def writerow(self, key, row):
+        pending = self.pending[key]
+        # None is written as '', as csv.DictWriter does
+        pending.append(tuple([row[f] if row[f] is not None else ''
+                              for f in self.fields[key]]))
+        if len(pending) >= self.batch_size:
+            self.flush(key)
+
+    def writerows(self, key, rows):
+        for row in rows:
+            self.writerow(key, row)
+
+    def writetuples(self, key, rows):
+        """Write rows given as tuples in the fields order"""
+        pending = self.pending[key]
+        pending.extend(rows)
+        if len(pending) >= self.batch_size:
+            self.flush(key)
+
+    def import_csv(self, key, path, header=True):
+        """Insert the rows of a csv file written by load.CsvWriter"""
+        with open(path, newline='') as f:
+            reader = csv.reader(f)
+            if header is True:
+                next(reader, None)
+            for row in reader:
+                pending = self.pending[key]
+                pending.append(row)
+                if len(pending) >= self.batch_size:
+                    self.flush(key)
+
+    def flush(self, key):
+        pending = self.pending[key]
+        if not pending:
+            return
+        encode = self.encoders.get(key)
+        self.conn.executemany(self.inserts[key],
+                              encode(pending) if encode is not None else pending)
+        if key == 'node' and self.spatial is True:
+            i, lat, lon = self.node_coords
+            self.conn.executemany('INSERT INTO nodes_rtree VALUES (?, ?, ?, ?, ?)',
+                                  [(row[i], row[lat], row[lat], row[lon], row[lon])
+                                   for row in pending])
+        elif key == 'way_geometry' and self.spatial is True:
+            self.conn.executemany('INSERT INTO ways_rtree VALUES (?, ?, ?, ?, ?)',
+                                  [tuple([row[i] for i in self.way_bbox])
+                                   for row in pending])
+            self.geometries += len(pending)
+        self.uncommitted += len(pending)
+        self.pending[key] = []
+        if not self.checkpoints and self.uncommitted >= self.transaction_size:
+            self.conn.execute('COMMIT')
+            self.conn.execute('BEGIN')
+            self.uncommitted = 0
+
+    def read_dictionaries(self):
+        """Read the dictionary tables written by the last checkpoint into the
+        interning tables"""
+        if self.encoded is not True:
+            return
+        self.dictionaries['tag_keys'] = {
+            (key, tag_type): key_id for key_id, key, tag_type in
+            self.conn.execute('SELECT id, key, type FROM tag_keys')}
+        self.dictionaries['tag_values'] = dict(
+            self.conn.execute('SELECT value, id FROM tag_values'))
+        self.dictionaries['users'] = dict(self.conn.execute('SELECT user, id FROM users'))
+        self.written = {table: len(entries) for table, entries in self.dictionaries.items()}
+
+    def write_dictionaries(self):
+        """Insert the entries of the interning tables not written yet in the
+        dictionary tables"""
+        written = self.written
+        self.conn.executemany('INSERT INTO tag_keys (id, key, type) VALUES (?, ?, ?)',
+                              [(key_id, key, tag_type) for (key, tag_type), key_id
+                               in self.dictionaries['tag_keys'].items()
+                               if key_id > written['tag_keys']])
+        self.conn.executemany('INSERT INTO tag_values (id, value) VALUES (?, ?)',
+                              [(value_id, value) for value, value_id
+                               in self.dictionaries['tag_values'].items()
+                               if value_id > written['tag_values']])
+        self.conn.executemany('INSERT INTO users (id, user) VALUES (?, ?)',
+                              [(user_id, user) for user, user_id
+                               in self.dictionaries['users'].items()
+                               if user_id > written['users']])
+        self.written = {table: len(entries) for table, entries in self.dictionaries.items()}
+
+    def checkpoint(self, state):
+        """Commit the rows written, with the state of the load to resume
+        from (see read_checkpoint)"""
+        for key in self.pending:
+            self.flush(key)
+        if self.encoded is True:
+            self.write_dictionaries()
+        self.conn.execute(CREATE_CHECKPOINT)
+        self.conn.execute('INSERT OR REPLACE INTO load_checkpoint (id, state) VALUES (1, ?)',
+                          (state,))
+        self.conn.execute('COMMIT')
+        self.conn.execute('BEGIN')
+        self.uncommitted = 0
+
+    def close(self, index=True):
+        if self.conn is None:
+            return
+        if self.checkpoints is True and index is not True:
+            # Failed load: back to the last checkpoint
+            self.conn.execute('ROLLBACK')
+            self.conn.close()
+            self.conn = None
+            return
+        for key in self.pending:
+            self.flush(key)
+        if self.encoded is True:
+            self.write_dictionaries()
+        if self.checkpoints is True:
+            self.conn.execute('DROP TABLE IF EXISTS load_checkpoint')
+        self.conn.execute('COMMIT')
+        if self.checkpoints is True:
+            self.conn.execute('PRAGMA journal_mode = DELETE')
+        if index is True:
+            create_indexes(self.conn, self.encoded)
+            if self.spatial is True and self.geometries == 0:
+                build_ways_bbox(self.conn)
+        self.conn.close()
+        self.conn = None
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Optimize the loaded database '
+                                     'for the singapore_queries.sql workload')
+    parser.add_argument('db_path', nargs='?', default=DB_PATH)
+    args = parser.parse_args()
+    optimize(args.db_path)
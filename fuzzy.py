@@ -0,0 +1,261 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Mon Oct 19 02:47:25 2026
+
+@author: rogerduong
+
+Correction of the misspelled street names beyond transform.mapping, against
+a vocabulary built from the street names of the dataset itself:
+
+- street types (the last word of a street name, or the word before its
+  number, as in transform.StreetNameNormalizer) used by at least
+  MIN_TYPE_NAMES distinct street names, e.g. 'Avenue' for 'Avebue'
+- street names found at least MIN_COUNT times, e.g. 'Orchard Road' for
+  'Orchad Road'
+
+Both vocabularies are indexed in BK-trees, so that the words within edit
+distance k of a misspelled word are found without comparing it with the
+whole vocabulary. A correction is accepted if its edit distance is within
+max_distance (which grows with the length of the word), if it is the only
+candidate at that distance, if it is RATIO times as frequent as the
+misspelled word, and if a street name keeps its numbers (so that 'Ang Mo
+Kio Avenue 3' is never corrected to 'Ang Mo Kio Avenue 8'). The corrections
+are memoized per distinct street name.
+"""
+
+import collections
+import functools
+import re
+
+# Minimum occurrences of a canonical street name, and minimum distinct street
+# names of a canonical street type
+MIN_COUNT = 3
+MIN_TYPE_NAMES = 3
+
+# Minimum ratio of the occurrences of a correction and of the misspelled word
+RATIO = 5
+
+number = re.compile(r'[0-9]')
+
+def edit_distance(a, b, limit=None):
+    """Return the Levenshtein distance of two strings
+
+    Args:
+        a: string
+        b: string
+        limit: maximum distance of interest, or None
+    Returns:
+        distance, or limit + 1 if it is above limit
+
+    """
+    if a == b:
+        return 0
+    if len(a) < len(b):
+        a, b = b, a
+    if limit is not None and len(a) - len(b) > limit:
+        return limit + 1
+    # The common prefix and suffix (e.g. the street type) cost nothing
+    start = 0
+    while start < len(b) and a[start] == b[start]:
+        start += 1
+    end = 0
+    while end < len(b) - start and a[-1 - end] == b[-1 - end]:
+        end += 1
+    a, b = a[start:len(a) - end], b[start:len(b) - end]
+    if not b:
+        return len(a) if limit is None or len(a) <= limit else limit + 1
+    row = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        previous, row[0] = row[0], i
+        for j, cb in enumerate(b, 1):
+            current = min(row[j] + 1, row[j - 1] + 1, previous + (ca != cb))
+            previous, row[j] = row[j], current
+        if limit is not None and min(row) > limit:
+            return limit + 1
+    if limit is not None and row[-1] > limit:
+        return limit + 1
+    return row[-1]
+
+def max_distance(word):
+    """Return the maximum edit distance of a correction of word: none for
+    abbreviations, 1 up to 5 characters, 2 above"""
+    if len(word) <= 3:
+        return 0
+    return 1 if len(word) <= 5 else 2
+
+def street_type_index(words):
+    """Return the index of the street type in the words of a street name: the
+    last word, or the word before the number (see
+    transform.StreetNameNormalizer), or None"""
+    if len(words) >= 2 and number.search(words[-1]):
+        return len(words) - 2
+    if words and not number.search(words[-1]):
+        return len(words) - 1
+    return None
+
+
+class BKTree(object):
+    """BK-tree of words, for the edit distance
+
+    Each node keeps its children by their distance to it. A search within
+    distance k of a word only visits the children whose distance to their
+    parent is within k of the distance of the word to the parent (triangle
+    inequality).
+
+    Args:
+        words: iterable of words
+    """
+
+    def __init__(self, words=()):
+        self.root = None
+        self.size = 0
+        for word in words:
+            self.add(word)
+
+    def __len__(self):
+        return self.size
+
+    def add(self, word):
+        if self.root is None:
+            self.root = (word, {})
+            self.size = 1
+            return
+        node_word, children = self.root
+        while True:
+            d = edit_distance(word, node_word)
+            if d == 0:
+                return
+            child = children.get(d)
+            if child is None:
+                children[d] = (word, {})
+                self.size += 1
+                return
+            node_word, children = child
+
+    def search(self, word, k):
+        """Return the (distance, word) of the words within distance k of
+        word, closest first
+
+        Args:
+            word: string
+            k: maximum edit distance
+        Returns:
+            sorted list of (distance, word)
+
+        """
+        if self.root is None:
+            return []
+        found = []
+        nodes = [self.root]
+        while nodes:
+            node_word, children = nodes.pop()
+            # Bounded by the largest distance of the children to visit
+            d = edit_distance(word, node_word, k + max(children, default=0))
+            if d <= k:
+                found.append((d, node_word))
+            for child_distance, child in children.items():
+                if d - k <= child_distance <= d + k:
+                    nodes.append(child)
+        return sorted(found)
+
+
+class StreetNameCorrector(object):
+    """Correct the misspelled street names and street types, against the
+    vocabulary of the street names of a dataset
+
+    Words are compared in lower case, and corrected to the most frequent
+    spelling of their match.
+
+    Args:
+        counts: dictionary of street name: occurrences in the dataset (with
+            the street types of transform.mapping cleaned already)
+        min_count: minimum occurrences of a canonical street name
+        min_type_names: minimum distinct street names of a canonical street
+            type
+        ratio: minimum ratio of the occurrences of a correction and of the
+            misspelled word
+        maxsize: maximum number of street names in the cache
+    Attributes:
+        changes: counter of (street_name, new_street_name) changes
+    """
+
+    def __init__(self, counts, min_count=MIN_COUNT, min_type_names=MIN_TYPE_NAMES,
+                 ratio=RATIO, maxsize=65536):
+        self.ratio = ratio
+        self.maxsize = maxsize
+        self.names = collections.Counter()
+        self.types = collections.Counter()
+        name_spellings = collections.defaultdict(collections.Counter)
+        type_spellings = collections.defaultdict(collections.Counter)
+        for name, count in counts.items():
+            name_spellings[name.lower()][name] += count
+            self.names[name.lower()] += count
+            words = name.split()
+            i = street_type_index(words)
+            if i is not None:
+                type_spellings[words[i].lower()][words[i]] += 1
+                self.types[words[i].lower()] += 1
+        self.name_spellings = {name: spellings.most_common(1)[0][0]
+                               for name, spellings in name_spellings.items()}
+        self.type_spellings = {word: spellings.most_common(1)[0][0]
+                               for word, spellings in type_spellings.items()}
+        self.canonical_names = {name for name, count in self.names.items()
+                                if count >= min_count}
+        self.canonical_types = {word for word, count in self.types.items()
+                                if count >= min_type_names}
+        self.name_tree = BKTree(sorted(self.canonical_names))
+        self.type_tree = BKTree(sorted(self.canonical_types))
+        self.changes = collections.Counter()
+        self.correct = functools.lru_cache(maxsize=maxsize)(self._correct)
+
+    def __call__(self, street_name):
+        new_street_name = self.correct(street_name)
+        if new_street_name != street_name:
+            self.changes[(street_name, new_street_name)] += 1
+        return new_street_name
+
+    def __getstate__(self):
+        # The cache is not pickled (e.g. to the workers of audit.audit_parallel)
+        state = dict(self.__dict__)
+        del state['correct']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.correct = functools.lru_cache(maxsize=self.maxsize)(self._correct)
+
+    def best_match(self, tree, counts, word, key=None):
+        """Return the closest word of a BK-tree within max_distance of word,
+        if it is the only one at that distance, is ratio times as frequent
+        as word and has the same key, or None"""
+        k = max_distance(word)
+        if k == 0:
+            return None
+        candidates = [(d, match) for d, match in tree.search(word, k)
+                      if key is None or key(match) == key(word)]
+        if not candidates or (len(candidates) > 1 and
+                              candidates[0][0] == candidates[1][0]):
+            return None
+        match = candidates[0][1]
+        if counts[match] < self.ratio * max(counts[word], 1):
+            return None
+        return match
+
+    def _correct(self, street_name):
+        words = street_name.split()
+        i = street_type_index(words)
+        if i is not None and words[i].lower() not in self.canonical_types:
+            match = self.best_match(self.type_tree, self.types, words[i].lower())
+            if match is not None:
+                words[i] = self.type_spellings[match]
+                street_name = ' '.join(words)
+        if street_name.lower() not in self.canonical_names:
+            match = self.best_match(self.name_tree, self.names, street_name.lower(),
+                                    key=number.findall)
+            if match is not None:
+                return self.name_spellings[match]
+        return street_name
+
+    def cache_info(self):
+        return self.correct.cache_info()
@@ -0,0 +1,285 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 18:21:37 2026
+
+@author: rogerduong
+
+Apply OpenStreetMap change files (.osc) to the sqlite3 database loaded by
+load.py, instead of reloading the full extract.
+"""
+
+import load
+import database
+import parsers
+import validation
+
+import argparse
+import os
+import re
+
+STATE_PATH = "data/state.txt"
+
+# Rows of each element type, in the shaped element
+CHILD_KEYS = {
+    'node': ['node_tags'],
+    'way': ['way_nodes', 'way_tags'],
+    'relation': ['relation_members', 'relation_tags'],
+}
+
+TAG_KEYS = {'node': 'node_tags', 'way': 'way_tags', 'relation': 'relation_tags'}
+
+def read_state(state_path=STATE_PATH):
+    """Return the last applied replication sequence number of a state file,
+    or None if there is none
+
+    The state file uses the key=value format of the OSM replication
+    state.txt files.
+
+    Args:
+        state_path: path of the state file
+    Returns:
+        sequence number
+    """
+    if not os.path.exists(state_path):
+        return None
+    with open(state_path) as f:
+        for line in f:
+            key, _, value = line.strip().partition('=')
+            if key == 'sequenceNumber':
+                return int(value)
+    return None
+
+def write_state(sequence, state_path=STATE_PATH):
+    """Write the last applied replication sequence number to a state file"""
+    tmp_path = state_path + '.tmp'
+    with open(tmp_path, 'w') as f:
+        f.write('sequenceNumber={0}\n'.format(sequence))
+    os.replace(tmp_path, state_path)
+
+def sequence_from_path(osc_file):
+    """Return the replication sequence number of a change file named like the
+    replication files (e.g. 004/123/456.osc.gz is 4123456), or None"""
+    m = re.search(r'(\d{3})/(\d{3})/(\d{3})\.osc', osc_file.replace(os.sep, '/'))
+    if m:
+        return int(''.join(m.groups()))
+    m = re.search(r'(\d+)\.osc', os.path.basename(osc_file))
+    return int(m.group(1)) if m else None
+
+def get_changes(osc_file, parser='etree'):
+    """Yield (action, element) for each element of an osmChange file
+
+    Args:
+        osc_file: osmChange file, possibly compressed (.osc.gz)
+        parser: XML parser, 'etree', 'lxml' or 'expat' (see parsers.py)
+    Returns:
+        (action, element) tuples, action being create, modify or delete
+    """
+    return parsers.iterparse_changes(osc_file, parser)
+
+def stored_version(conn, element_type, element_id):
+    """Return the version of an element in the database, or None"""
+    row = conn.execute('SELECT MAX(CAST(version AS INTEGER)) FROM {0} WHERE id = ?'.format(
+        database.TABLES[element_type]), (element_id,)).fetchone()
+    return row[0]
+
+def derived_tables(conn):
+    """Return the set of the derived tables present in the database: tags
+    (database.optimize), ways_geometry, nodes_rtree and ways_rtree (spatial
+    indexes)"""
+    return {table for table in ['tags', 'ways_geometry'] + database.SPATIAL_TABLES
+            if database.table_exists(conn, table)}
+
+def delete_element(conn, element_type, element_id, derived=()):
+    """Delete an element and its rows from the database, and from the
+    derived tables"""
+    for key in [element_type] + CHILD_KEYS[element_type]:
+        conn.execute('DELETE FROM {0} WHERE id = ?'.format(database.TABLES[key]),
+                     (element_id,))
+    if 'tags' in derived:
+        conn.execute('DELETE FROM tags WHERE element_type = ? AND id = ?',
+                     (element_type, element_id))
+    if element_type == 'node' and 'nodes_rtree' in derived:
+        conn.execute('DELETE FROM nodes_rtree WHERE id = ?', (element_id,))
+    if element_type == 'way' and 'ways_rtree' in derived:
+        conn.execute('DELETE FROM ways_rtree WHERE id = ?', (element_id,))
+
+def insert_element(conn, element_type, el, derived=()):
+    """Insert a shaped element and its rows in the database, and in the
+    derived tables (except ways_geometry and ways_rtree, see update_ways)"""
+    if 'tags' in derived:
+        conn.executemany('INSERT INTO tags VALUES (?, ?, ?, ?, ?)',
+                         [(tag['id'], tag['key'], tag['value'] or '', tag['type'],
+                           element_type) for tag in el[TAG_KEYS[element_type]]])
+    if element_type == 'node' and 'nodes_rtree' in derived:
+        node = el['node']
+        conn.execute('INSERT INTO nodes_rtree VALUES (?, ?, ?, ?, ?)',
+                     (node['id'], node['lat'], node['lat'], node['lon'], node['lon']))
+    for key in [element_type] + CHILD_KEYS[element_type]:
+        fields = load.FIELDS[key]
+        insert = 'INSERT INTO {0} ({1}) VALUES ({2})'.format(
+            database.TABLES[key], ', '.join(fields), ', '.join('?' * len(fields)))
+        if key == element_type:
+            rows = [el[key]]
+        else:
+            rows = el[key]
+        if key in load.TUPLE_ROWS:
+            conn.executemany(insert, rows)
+        else:
+            # None is written as '', as the bulk load does
+            conn.executemany(insert, [tuple([row[f] if row[f] is not None else ''
+                                             for f in fields]) for row in rows])
+
+class StoredNodes(object):
+    """Node locations read from the nodes table, with the get method of
+    nodestore.NodeStore"""
+
+    def __init__(self, conn):
+        self.conn = conn
+
+    def get(self, node_id):
+        row = self.conn.execute('SELECT lat, lon FROM nodes WHERE id = ?',
+                                (node_id,)).fetchone()
+        return tuple(row) if row is not None else None
+
+def update_ways(conn, way_ids, node_ids, derived):
+    """Recompute the geometry and the bounding box of the changed ways, and of
+    the ways referencing the changed nodes"""
+    way_ids = set(way_ids)
+    for node_id in node_ids:
+        way_ids.update(way_id for (way_id,) in conn.execute(
+            'SELECT id FROM ways_nodes WHERE node_id = ?', (node_id,)))
+    way_ids = sorted(way_ids)
+    if 'ways_geometry' not in derived:
+        if 'ways_rtree' in derived:
+            database.build_ways_bbox(conn, way_ids)
+        return
+
+    nodes = StoredNodes(conn)
+    fields = load.WAY_GEOMETRY_FIELDS
+    insert = 'INSERT INTO ways_geometry ({0}) VALUES ({1})'.format(
+        ', '.join(fields), ', '.join('?' * len(fields)))
+    for way_id in way_ids:
+        conn.execute('DELETE FROM ways_geometry WHERE id = ?', (way_id,))
+        if 'ways_rtree' in derived:
+            conn.execute('DELETE FROM ways_rtree WHERE id = ?', (way_id,))
+        node_ids = [node_id for (node_id,) in conn.execute(
+            'SELECT node_id FROM ways_nodes WHERE id = ? ORDER BY position',
+            (way_id,))]
+        geometry = load.way_geometry(way_id, node_ids, nodes)
+        if geometry is None:
+            continue
+        conn.execute(insert, [geometry[f] for f in fields])
+        if 'ways_rtree' in derived:
+            conn.execute('INSERT INTO ways_rtree VALUES (?, ?, ?, ?, ?)',
+                         [geometry[f] for f in
+                          ('id', 'min_lat', 'max_lat', 'min_lon', 'max_lon')])
+
+def apply_changes(osc_file, db_path=database.DB_PATH, validate=False, parser='etree'):
+    """Apply the creations, modifications and deletions of a change file
+
+    Created and modified elements are shaped and cleaned as in
+    load.process_map, and replace the stored element only if their version
+    is newer. Deleted elements are removed if the stored version is not
+    newer than the deleted one. Applying the same file twice is a no-op.
+    The whole file is applied in a single transaction.
+
+    Args:
+        osc_file: osmChange file
+        db_path: path of the database file
+        validate: boolean to specify if data must be validated or not
+        parser: XML parser, 'etree', 'lxml' or 'expat' (see parsers.py)
+    Returns:
+        dictionary counting the applied and skipped changes
+    """
+    counts = {'create': 0, 'modify': 0, 'delete': 0, 'skipped': 0}
+    validator = validation.ElementValidator(load.SCHEMA, load.TUPLE_FIELDS)
+
+    conn = database.connect(db_path)
+    try:
+        conn.execute('BEGIN')
+        derived = derived_tables(conn)
+        changed = {'node': set(), 'way': set(), 'relation': set()}
+        for action, element in get_changes(osc_file, parser):
+            element_type = element.tag
+            element_id = int(element.attrib['id'])
+            version = int(element.attrib.get('version', 0))
+            current = stored_version(conn, element_type, element_id)
+
+            if action == 'delete':
+                if current is not None and current <= version:
+                    delete_element(conn, element_type, element_id, derived)
+                    changed[element_type].add(element_id)
+                    counts['delete'] += 1
+                else:
+                    counts['skipped'] += 1
+                continue
+
+            if current is not None and current >= version:
+                counts['skipped'] += 1
+                continue
+            el = load.shape_element(element)
+            if validate is True:
+                load.validate_element(el, validator)
+            el = load.clean_element_dict(el, TAG_KEYS[element_type])
+            if current is not None:
+                delete_element(conn, element_type, element_id, derived)
+            insert_element(conn, element_type, el, derived)
+            changed[element_type].add(element_id)
+            counts[action or 'modify'] += 1
+        update_ways(conn, changed['way'], changed['node'], derived)
+        conn.execute('COMMIT')
+    except BaseException:
+        conn.execute('ROLLBACK')
+        raise
+    finally:
+        conn.close()
+    return counts
+
+def apply_replication(osc_file, sequence=None, db_path=database.DB_PATH,
+                      state_path=STATE_PATH, validate=False, parser='etree'):
+    """Apply a replication change file, unless its sequence number has
+    already been applied according to the state file
+
+    Args:
+        osc_file: osmChange file
+        sequence: replication sequence number of the file (by default,
+            taken from the file name)
+        db_path: path of the database file
+        state_path: path of the state file
+        validate: boolean to specify if data must be validated or not
+        parser: XML parser, 'etree', 'lxml' or 'expat' (see parsers.py)
+    Returns:
+        dictionary counting the applied and skipped changes, or None if the
+        file was already applied
+    """
+    if sequence is None:
+        sequence = sequence_from_path(osc_file)
+    last = read_state(state_path)
+    if sequence is not None and last is not None and sequence <= last:
+        print('Sequence {0} already applied (state: {1})'.format(sequence, last))
+        return None
+
+    counts = apply_changes(osc_file, db_path, validate, parser)
+    if sequence is not None:
+        write_state(sequence, state_path)
+    print('Applied {0}: {1}'.format(osc_file, counts))
+    return counts
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('osc_files', nargs='+',
+                        help='change files, applied in the given order')
+    parser.add_argument('--db', default=database.DB_PATH)
+    parser.add_argument('--state', default=STATE_PATH)
+    parser.add_argument('--sequence', type=int,
+                        help='sequence number of a single change file')
+    parser.add_argument('--validate', action='store_true')
+    parser.add_argument('--parser', choices=list(parsers.PARSERS), default='etree',
+                        help='XML parser (lxml requires lxml)')
+    args = parser.parse_args()
+
+    for osc_file in args.osc_files:
+        apply_replication(osc_file, args.sequence, args.db, args.state,
+                          args.validate, args.parser)
@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 21:58:12 2026
+
+@author: rogerduong
+
+Metrics of a load.process_map run: elements and tags counted by type, time
+spent in each stage, bytes read from the input (for the throughput and the
+ETA) and cleaning outcomes. They are reported on a periodic progress line,
+and summarized as JSON at the end of the run.
+"""
+
+import collections
+import json
+import sys
+import time
+
+# Stages of the load, in order: the ones of each element, then the closing
+# of the writer (indexes), the merge of the shards and the deferred geocoding
+STAGES = ['parse', 'shape', 'validate', 'clean', 'write', 'finish', 'merge', 'geocode']
+ELEMENTS = ['node', 'way', 'relation']
+TAGS = ['node_tags', 'way_tags', 'relation_tags']
+
+def format_duration(seconds):
+    seconds = int(seconds)
+    return '{0}:{1:02d}:{2:02d}'.format(seconds // 3600, seconds // 60 % 60, seconds % 60)
+
+
+class Metrics(object):
+    """Counters and stage timers of a load
+
+    Args:
+        total_bytes: size of the input, for the progress and the ETA
+        interval: seconds between progress lines, or None for no progress
+        stream: stream of the progress lines
+    Attributes:
+        counts: counter of the elements and tags by type, and of the cleaning
+            outcomes
+        seconds: dictionary of stage: seconds
+        bytes_read: bytes of the input processed
+    """
+
+    def __init__(self, total_bytes=None, interval=None, stream=sys.stderr):
+        self.total_bytes = total_bytes
+        self.interval = interval
+        self.stream = stream
+        self.counts = collections.Counter()
+        self.seconds = dict.fromkeys(STAGES, 0.0)
+        self.bytes_read = 0
+        self.start = time.perf_counter()
+        self.next_report = self.start + (interval or 0)
+
+    def elements(self):
+        return sum(self.counts[key] for key in ELEMENTS)
+
+    def progress(self, bytes_read):
+        """Record the bytes of the input processed, and print the progress
+        line if it is due"""
+        self.bytes_read = bytes_read
+        if self.interval is not None and time.perf_counter() >= self.next_report:
+            self.report()
+
+    def report(self):
+        """Print the progress line"""
+        now = time.perf_counter()
+        self.next_report = now + (self.interval or 0)
+        elapsed = max(now - self.start, 1e-9)
+        rate = self.bytes_read / elapsed
+        line = '{0:,} elements {1:,.0f}/s {2:.1f} MB {3:.2f} MB/s'.format(
+            self.elements(), self.elements() / elapsed, self.bytes_read / 10**6,
+            rate / 10**6)
+        if self.total_bytes:
+            line = '{0:5.1f}% {1}'.format(100 * self.bytes_read / self.total_bytes, line)
+            if rate > 0:
+                line += ' ETA ' + format_duration((self.total_bytes - self.bytes_read) / rate)
+        print(line, file=self.stream, flush=True)
+
+    def add_counts(self, before, after):
+        """Count the difference of two snapshots of cumulative counters"""
+        for key, value in after.items():
+            self.counts[key] += value - before.get(key, 0)
+
+    def as_dict(self):
+        """Return the raw metrics, to be merged by another Metrics"""
+        return {'counts': dict(self.counts), 'seconds': dict(self.seconds),
+                'bytes_read': self.bytes_read}
+
+    def merge(self, metrics):
+        """Add the raw metrics of another run, e.g. of a shard"""
+        self.counts.update(metrics['counts'])
+        for stage, seconds in metrics['seconds'].items():
+            self.seconds[stage] += seconds
+
+    def summary(self, **fields):
+        """Return the summary of the run, with extra fields
+
+        Stage times of shards processed in parallel are summed over the
+        workers, so their shares are relative to the sum of the stage times.
+        """
+        elapsed = time.perf_counter() - self.start
+        total = sum(self.seconds.values()) or 1e-9
+        summary = dict(fields)
+        summary.update({
+            'seconds': elapsed,
+            'bytes': self.bytes_read,
+            'elements': {key: self.counts[key] for key in ELEMENTS},
+            'tags': {key: self.counts[key] for key in TAGS},
+            'elements_per_second': self.elements() / elapsed,
+            'megabytes_per_second': self.bytes_read / 10**6 / elapsed,
+            'stages': {stage: {'seconds': seconds, 'share': seconds / total}
+                       for stage, seconds in self.seconds.items()},
+            'cleaning': {key: value for key, value in sorted(self.counts.items())
+                         if key not in ELEMENTS and key not in TAGS},
+        })
+        return summary
+
+    def write_json(self, path, **fields):
+        """Write the summary of the run to a JSON file"""
+        with open(path, 'w') as f:
+            json.dump(self.summary(**fields), f, indent=2)
@@ -7,15 +7,32 @@ Created on Sat Sep  9 11:55:19 2017
 """
 
 import transform
+import audit
+import compression
 import schema
+import database
+import columnar
+import nodestore
+import parsers
+import spatial
+import postcode
+import validation
+import instrument
+import fuzzy
+import aggregates as aggregates_module
 
+import argparse
 import csv
 import codecs
+import collections
+import hashlib
+import io
+import multiprocessing
 import os
-import pprint
+import pickle
 import re
-import xml.etree.cElementTree as ET
-import cerberus
+import shutil
+import time
 
 OSM_PATH = "data/osm/singapore.osm"
 
@@ -24,8 +41,35 @@ NODE_TAGS_PATH = "data/nodes_tags.csv"
 WAYS_PATH = "data/ways.csv"
 WAY_NODES_PATH = "data/ways_nodes.csv"
 WAY_TAGS_PATH = "data/ways_tags.csv"
+WAY_GEOMETRY_PATH = "data/ways_geometry.csv"
+RELATIONS_PATH = "data/relations.csv"
+RELATION_TAGS_PATH = "data/relations_tags.csv"
+RELATION_MEMBERS_PATH = "data/relations_members.csv"
 
-dataset = [OSM_PATH, NODES_PATH, NODE_TAGS_PATH, WAYS_PATH, WAY_NODES_PATH, WAY_TAGS_PATH]
+SHARDS_DIR = "data/shards"
+
+# Elements between two reports of the bytes read, with metrics
+PROGRESS_ELEMENTS = 1000
+
+# Decompressed bytes per shard of a compressed input, with processes > 1
+CHUNK_SIZE = 1 << 24
+VALIDATION_REPORT_PATH = "data/validation_errors.csv"
+
+# Checkpoint of a load with the csv backend, and minimum seconds between two
+# checkpoints
+CHECKPOINT_PATH = "data/checkpoint.pickle"
+CHECKPOINT_INTERVAL = 60.0
+
+# Bytes before the input position of a checkpoint searched for its last
+# element when resuming (the parsers read ahead of the elements they yield)
+RESUME_WINDOW = 1 << 24
+
+# Tags of the addresses indexed by build_address_index, and their keys
+ADDRESS_TAGS = {'addr:street': 'street', 'addr:housenumber': 'housenumber',
+                'addr:postcode': 'postcode'}
+
+dataset = [OSM_PATH, NODES_PATH, NODE_TAGS_PATH, WAYS_PATH, WAY_NODES_PATH, WAY_TAGS_PATH,
+           WAY_GEOMETRY_PATH, RELATIONS_PATH, RELATION_TAGS_PATH, RELATION_MEMBERS_PATH]
 
 LOWER_COLON = re.compile(r'^([a-z]|_)+:([a-z]|_)+')
 PROBLEMCHARS = re.compile(r'[=\+/&<>;\'"\?%#$@\,\. \t\r\n]')
@@ -38,20 +82,86 @@ NODE_TAGS_FIELDS = ['id', 'key', 'value', 'type']
 WAY_FIELDS = ['id', 'user', 'uid', 'version', 'changeset', 'timestamp']
 WAY_TAGS_FIELDS = ['id', 'key', 'value', 'type']
 WAY_NODES_FIELDS = ['id', 'node_id', 'position']
+WAY_GEOMETRY_FIELDS = ['id', 'min_lat', 'min_lon', 'max_lat', 'max_lon', 'length',
+                       'centroid_lat', 'centroid_lon']
+RELATION_FIELDS = ['id', 'user', 'uid', 'version', 'changeset', 'timestamp']
+RELATION_TAGS_FIELDS = ['id', 'key', 'value', 'type']
+RELATION_MEMBERS_FIELDS = ['id', 'member_type', 'member_id', 'role', 'position']
+
+# Output csvs of each shaped element key: (key, path, fields)
+CSV_OUTPUTS = [('node', NODES_PATH, NODE_FIELDS),
+               ('node_tags', NODE_TAGS_PATH, NODE_TAGS_FIELDS),
+               ('way', WAYS_PATH, WAY_FIELDS),
+               ('way_nodes', WAY_NODES_PATH, WAY_NODES_FIELDS),
+               ('way_tags', WAY_TAGS_PATH, WAY_TAGS_FIELDS),
+               ('way_geometry', WAY_GEOMETRY_PATH, WAY_GEOMETRY_FIELDS),
+               ('relation', RELATIONS_PATH, RELATION_FIELDS),
+               ('relation_tags', RELATION_TAGS_PATH, RELATION_TAGS_FIELDS),
+               ('relation_members', RELATION_MEMBERS_PATH, RELATION_MEMBERS_FIELDS)]
+
+FIELDS = {key: fields for key, _, fields in CSV_OUTPUTS}
+
+# Shaped element keys holding rows as tuples rather than dictionaries
+TUPLE_ROWS = ['way_nodes', 'relation_members']
+TUPLE_FIELDS = {key: FIELDS[key] for key in TUPLE_ROWS}
+
+# Start of a top level element. Children of nodes, ways and relations are
+# <tag>, <nd> and <member>, so these tags can only appear at the top level.
+TOP_LEVEL_ELEMENT = re.compile(rb'<(?:node|way|relation)[\s/>]')
+OSM_HEAD = b'<?xml version="1.0" encoding="UTF-8"?>\n<osm>\n'
+OSM_END = b'</osm>'
 
 # ================================================== #
 #               Extract Functions                  #
 # ================================================== #
 
+def shape_tag(child, element_id, problem_chars=PROBLEMCHARS,
+              default_tag_type='regular'):
+    """Shape a <tag> child of a node, way or relation to Python dict
+    
+    Args:
+        child: tag XML element
+        element_id: id of the parent element
+        problem_chars=PROBLEMCHARS
+        default_tag_type='regular'
+    Returns:
+        A dictionary
+    
+    """
+    child_attribs = {}
+    child_attribs['id'] = element_id
+    child_attribs['value'] = child.attrib['v']
+    
+    #Handle problem characters and colons
+    if problem_chars.match(child.attrib['k']):
+        child_attribs['type'] = default_tag_type
+        child_attribs['key'] = ''
+    elif LOWER_COLON.match(child.attrib['k']): #Split if tag contains colon
+        child_attribs['type'], child_attribs['key'] = child.attrib['k'].split(':', 1)
+    else:
+        child_attribs['type'] = default_tag_type
+        child_attribs['key'] = child.attrib['k']
+    return child_attribs
+
 def shape_element(element, node_attr_fields=NODE_FIELDS, way_attr_fields=WAY_FIELDS,
-                  problem_chars=PROBLEMCHARS, default_tag_type='regular'):
-    """Clean and shape node or way XML element to Python dict
+                  problem_chars=PROBLEMCHARS, default_tag_type='regular',
+                  relation_attr_fields=RELATION_FIELDS, node_store=None):
+    """Clean and shape node, way or relation XML element to Python dict
+    
+    The way_nodes of a way and the relation_members of a relation are
+    (id, node_id, position) and (id, member_type, member_id, role, position)
+    tuples rather than dictionaries, as they can hold thousands of rows.
+    
+    With a node_store, the shaped way also has a way_geometry row (see
+    way_geometry), unless none of its nodes is in the store.
     
     Args:
         element:
         node_attr_fields=NODE_FIELDS
         way_attr_fields=WAY_FIELDS
         problem_chars=PROBLEMCHARS
+        relation_attr_fields=RELATION_FIELDS
+        node_store: nodestore.NodeStore of the node locations, or None
     Returns:
         A dictionary
     
@@ -59,10 +169,11 @@ def shape_element(element, node_attr_fields=NODE_FIELDS, way_attr_fields=WAY_FIE
 
     node_attribs = {}
     way_attribs = {}
+    relation_attribs = {}
     way_nodes = []
-    tags = []  # Handle secondary tags the same way for both node and way elements
+    members = []
+    tags = []  # Handle secondary tags the same way for all elements
 
-    # YOUR CODE HERE
     if element.tag == 'node':
         #attribs
         for key in node_attr_fields:
@@ -70,22 +181,8 @@ def shape_element(element, node_attr_fields=NODE_FIELDS, way_attr_fields=WAY_FIE
         #tags
         for child in element:
             if child.tag == 'tag':
-                child_attribs = {}
-                child_attribs['id'] = node_attribs['id']
-                child_attribs['value'] = child.attrib['v']
-                
-                #Handle problem characters and colons
-                if PROBLEMCHARS.match(child.attrib['k']):
-                    child_attribs['type'] = default_tag_type
-                    child_attribs['key'] = ''
-                elif LOWER_COLON.match(child.attrib['k']): #Split if tag contains colon
-                    child_attribs['type'] = re.split(':', child.attrib['k'], maxsplit = 1)[0]
-                    child_attribs['key'] = re.split(':', child.attrib['k'], maxsplit = 1)[1]
-                else:
-                    child_attribs['type'] = default_tag_type
-                    child_attribs['key'] = child.attrib['k']
-                #Add tags    
-                tags.append(child_attribs)
+                tags.append(shape_tag(child, node_attribs['id'], problem_chars,
+                                      default_tag_type))
 
         return {'node': node_attribs, 'node_tags': tags}
     
@@ -93,63 +190,494 @@ def shape_element(element, node_attr_fields=NODE_FIELDS, way_attr_fields=WAY_FIE
         #attribs
         for key in way_attr_fields:
             way_attribs[key] = element.attrib[key]
-        #tags
+        way_id = way_attribs['id']
+        position = 0
+        #tags and node references, in a single pass over the children
         for child in element:
-            child_attribs = {} 
-            child_attribs['id'] = way_attribs['id']
-            
             if child.tag == 'tag':        
-                child_attribs['value'] = child.attrib['v']
-
-                #Handle problem characters and colons
-                if PROBLEMCHARS.match(child.attrib['k']):
-                    child_attribs['type'] = default_tag_type
-                    child_attribs['key'] = ''
-                elif LOWER_COLON.match(child.attrib['k']): #Split if tag contains colon
-                    child_attribs['type'] = re.split(':', child.attrib['k'], maxsplit = 1)[0]
-                    child_attribs['key'] = re.split(':', child.attrib['k'], maxsplit = 1)[1]
-                else:
-                    child_attribs['type'] = default_tag_type
-                    child_attribs['key'] = child.attrib['k']
-                #Add tags   
-                tags.append(child_attribs)
-                
+                tags.append(shape_tag(child, way_id, problem_chars,
+                                      default_tag_type))
             elif child.tag == 'nd':
-                child_attribs['node_id'] = child.attrib['ref']
-                child_attribs['position'] = element.getchildren().index(child)
-                way_nodes.append(child_attribs)
-            
+                #(id, node_id, position) tuple, in WAY_NODES_FIELDS order
+                way_nodes.append((way_id, child.attrib['ref'], position))
+                position += 1
             
-        return {'way': way_attribs, 'way_nodes': way_nodes, 'way_tags': tags}
+        shaped = {'way': way_attribs, 'way_nodes': way_nodes, 'way_tags': tags}
+        if node_store is not None:
+            geometry = way_geometry(way_id, [int(nd[1]) for nd in way_nodes],
+                                    node_store)
+            if geometry is not None:
+                shaped['way_geometry'] = geometry
+        return shaped
+
+    elif element.tag == 'relation':
+        #attribs
+        for key in relation_attr_fields:
+            relation_attribs[key] = element.attrib[key]
+        relation_id = relation_attribs['id']
+        position = 0
+        #tags and members, in a single pass over the children
+        for child in element:
+            if child.tag == 'tag':
+                tags.append(shape_tag(child, relation_id, problem_chars,
+                                      default_tag_type))
+            elif child.tag == 'member':
+                #tuple in RELATION_MEMBERS_FIELDS order
+                attrib = child.attrib
+                members.append((relation_id, attrib['type'], attrib['ref'],
+                                attrib.get('role', ''), position))
+                position += 1
+
+        return {'relation': relation_attribs, 'relation_members': members,
+                'relation_tags': tags}
 
 # ================================================== #
 #               Extract Helper Functions             #
 # ================================================== #
 
-def get_element(osm_file, tags=('node', 'way', 'relation')):
-    """Yield element if it is the right type of tag
+def way_geometry(way_id, node_ids, node_store):
+    """Return the bounding box, length and centroid of a way
+    
+    Nodes missing from the store (outside of the extract) are skipped. The
+    length is the sum of the great circle distances between consecutive
+    nodes, the centroid the length weighted mean of the segment midpoints
+    (the mean of the nodes if the length is 0).
+    
+    Args:
+        way_id: id of the way
+        node_ids: list of the node ids of the way, in order
+        node_store: nodestore.NodeStore of the node locations
+    Returns:
+        dictionary of WAY_GEOMETRY_FIELDS, or None if no node is stored
+    
+    """
+    points = [point for point in map(node_store.get, node_ids) if point is not None]
+    if not points:
+        return None
+    lats = [lat for lat, _ in points]
+    lons = [lon for _, lon in points]
+
+    length = 0.0
+    centroid_lat = centroid_lon = 0.0
+    for (lat1, lon1), (lat2, lon2) in zip(points, points[1:]):
+        distance = spatial.haversine(lat1, lon1, lat2, lon2)
+        length += distance
+        centroid_lat += distance * (lat1 + lat2) / 2
+        centroid_lon += distance * (lon1 + lon2) / 2
+    if length > 0:
+        centroid_lat /= length
+        centroid_lon /= length
+    else:
+        centroid_lat = sum(lats) / len(lats)
+        centroid_lon = sum(lons) / len(lons)
+
+    return {'id': way_id, 'min_lat': min(lats), 'min_lon': min(lons),
+            'max_lat': max(lats), 'max_lon': max(lons), 'length': length,
+            'centroid_lat': centroid_lat, 'centroid_lon': centroid_lon}
+
+def build_node_store(osm_file, path=None, parser='etree', processes=1):
+    """Store the locations of the nodes of an OSM file
+    
+    All the nodes of the file are stored, including the nodes after its
+    first way: every way gets the locations of all its nodes, in the
+    workers of a parallel load and in a serial load of a file with nodes
+    after its ways (see process_map).
+    
+    Args:
+        osm_file: OSM file
+        path: path of a memory-mapped store, or None to keep it in memory
+        parser: XML parser, 'etree', 'lxml' or 'expat' (see parsers.py)
+        processes: number of processes decompressing a multi-stream bzip2
+            file
+    Returns:
+        frozen nodestore.NodeStore
+    
+    """
+    node_store = nodestore.NodeStore(path)
+    fill_node_store(node_store, osm_file, parser, processes)
+    node_store.freeze()
+    return node_store
+
+def fill_node_store(node_store, osm_file, parser='etree', processes=1, last=None,
+                    until_way=False):
+    """Add the locations of the nodes of an OSM file to a store, up to the
+    element last (or the first way with until_way=True), or to the end of
+    the file
+    
+    Args:
+        node_store: nodestore.NodeStore
+        osm_file: OSM file
+        parser: XML parser, 'etree', 'lxml' or 'expat' (see parsers.py)
+        processes: number of processes decompressing a multi-stream bzip2
+            file
+        last: (element type, id) of the last element to read (the last
+            element loaded before a checkpoint), or None
+        until_way: True to stop at the first way, after which a serial load
+            adds no node to its store (see load_elements)
+    Returns:
+        None
+    
+    """
+    last_tag, last_id = last if last is not None else (None, None)
+    with compression.open_input(osm_file, processes) as f:
+        for element in get_element(f, parser=parser):
+            attrib = element.attrib
+            if element.tag == 'node':
+                node_store.append(int(attrib['id']), float(attrib['lat']),
+                                  float(attrib['lon']))
+            elif until_way and element.tag == 'way':
+                break
+            if element.tag == last_tag and attrib['id'] == str(last_id):
+                break
+
+def build_address_index(osm_file, path=postcode.ADDRESS_INDEX_PATH, parser='etree'):
+    """Index the postal codes of the addresses of an OSM file
+    
+    The elements with an addr:street, an addr:housenumber and a correct
+    addr:postcode are indexed by address (see transform.address_key). The
+    elements whose postal code needs a Singapore Post lookup are counted,
+    with the ones the index resolves, for the hit rate of the index.
+    
+    The index is saved to path, and read from it instead of being built
+    again while the OSM file and transform.mapping are unchanged.
+    
+    Args:
+        osm_file: OSM file
+        path: path of the saved index, or None not to save it
+        parser: XML parser, 'etree', 'lxml' or 'expat' (see parsers.py)
+    Returns:
+        postcode.AddressIndex
+    
+    """
+    rules = hashlib.md5(repr(sorted(transform.mapping.items())).encode()).hexdigest()
+    source = postcode.source_of(osm_file, rules)
+    if path is not None and os.path.exists(path):
+        index = postcode.AddressIndex.load(path)
+        if index.source is not None and all(index.source[k] == v
+                                            for k, v in source.items()):
+            return index
+
+    index = postcode.AddressIndex()
+    lookups = collections.Counter()
+    for element in get_element(osm_file, parser=parser):
+        address = {}
+        for child in element:
+            if child.tag == 'tag' and child.get('k') in ADDRESS_TAGS:
+                address[ADDRESS_TAGS[child.get('k')]] = child.get('v')
+        postal_code = address.get('postcode', '').strip()
+        if not (postal_code and address.get('street') and address.get('housenumber')):
+            continue
+        key = transform.address_key(address['housenumber'], address['street'])
+        if audit.postal_code_correct.match(postal_code):
+            index.add(key, postal_code)
+        elif transform.needs_postal_code_lookup(postal_code):
+            lookups[key] += 1
+
+    source['lookups'] = sum(lookups.values())
+    source['resolved'] = sum(count for key, count in lookups.items()
+                             if index.resolve(key) is not None)
+    index.source = source
+    if path is not None:
+        index.save(path)
+    return index
+
+def build_street_corrector(osm_file, parser='etree'):
+    """Build the corrector of the misspelled street names of an OSM file
+    
+    The addr:street values of the file are counted, cleaned with
+    transform.mapping, as the vocabulary of fuzzy.StreetNameCorrector.
     
     Args:
         osm_file: OSM file
+        parser: XML parser, 'etree', 'lxml' or 'expat' (see parsers.py)
+    Returns:
+        fuzzy.StreetNameCorrector
+    
+    """
+    counts = collections.Counter()
+    for element in get_element(osm_file, parser=parser):
+        for child in element:
+            if child.tag == 'tag' and child.get('k') == 'addr:street':
+                counts[transform.street_name_normalizer.normalize(child.get('v'))] += 1
+    return fuzzy.StreetNameCorrector(counts)
+
+def get_element(osm_file, tags=('node', 'way', 'relation'), parser='etree'):
+    """Yield element if it is the right type of tag
+    
+    Args:
+        osm_file: OSM file (possibly compressed), or binary file-like object
         tags: tags type to select
+        parser: XML parser, 'etree', 'lxml' or 'expat' (see parsers.py)
 
     Returns:
         element   
         
     """
+    return parsers.iterparse(osm_file, tags, parser)
+
+class ShardReader(object):
+    """File-like object reading the byte range [start, end) of an OSM file,
+    wrapped in <osm> tags so that it can be parsed as a standalone document
+
+    Args:
+        osm_file: OSM file, or bytes of top level elements
+        start: offset of the first top level element of the shard
+        end: offset after the last top level element of the shard
+    """
+
+    def __init__(self, osm_file, start, end):
+        if isinstance(osm_file, bytes):
+            self.file = io.BytesIO(osm_file)
+        else:
+            self.file = open(osm_file, 'rb')
+        self.file.seek(start)
+        self.size = end - start
+        self.remaining = self.size
+        self.head = OSM_HEAD
+        self.tail = b'\n</osm>\n'
+
+    def read(self, size=-1):
+        if size is None or size < 0:
+            size = len(self.head) + self.remaining + len(self.tail)
+        data = b''
+        if self.head:
+            data, self.head = self.head[:size], self.head[size:]
+        if len(data) < size and self.remaining > 0:
+            chunk = self.file.read(min(size - len(data), self.remaining))
+            self.remaining -= len(chunk)
+            if not chunk:
+                self.remaining = 0
+            data += chunk
+        if len(data) < size and self.remaining == 0 and self.tail:
+            n = size - len(data)
+            data, self.tail = data + self.tail[:n], self.tail[n:]
+        return data
+
+    def tell(self):
+        """Return the bytes of the shard read"""
+        return self.size - self.remaining
+
+    def close(self):
+        self.file.close()
+
+class CheckpointReader(object):
+    """Binary file-like object reading an OSM file for a load with
+    checkpoints, counting the (decompressed) bytes of the file read, i.e.
+    the input position of the checkpoints
+
+    Args:
+        stream: binary file-like object of the OSM file (see
+            compression.open_input)
+        data: bytes of the file already read from the stream, read first
+        position: position of data (or of the stream) in the file
+        head: bytes read before data, not part of the file (the <osm>
+            header of a resumed load)
+    """
+
+    def __init__(self, stream, data=b'', position=0, head=b''):
+        self.stream = stream
+        self.buffer = head + data
+        self.uncounted = len(head)
+        self.position = position
+
+    def read(self, size=-1):
+        if not self.buffer:
+            data = self.stream.read(size)
+        elif size is None or size < 0:
+            data, self.buffer = self.buffer + self.stream.read(), b''
+        else:
+            data, self.buffer = self.buffer[:size], self.buffer[size:]
+        self.position += max(0, len(data) - self.uncounted)
+        self.uncounted = max(0, self.uncounted - len(data))
+        return data
+
+    def tell(self):
+        """Return the position of the stream, for the progress"""
+        return self.stream.tell()
+
+    def close(self):
+        self.stream.close()
+
+def read_bytes(stream, size, keep=True):
+    """Read size bytes of a stream whose reads may return less, or up to
+    its end, keeping them or not"""
+    parts = []
+    while size > 0:
+        data = stream.read(min(size, CHUNK_SIZE))
+        if not data:
+            break
+        if keep:
+            parts.append(data)
+        size -= len(data)
+    return b''.join(parts)
+
+def resume_reader(osm_file, position, last, window=RESUME_WINDOW):
+    """Open an OSM file after the last element written before a checkpoint
+    
+    The element is searched in the window bytes before the input position
+    of the checkpoint. Uncompressed files are seeked, compressed ones are
+    decompressed up to the window.
+    
+    Args:
+        osm_file: OSM file, possibly compressed
+        position: input position of the checkpoint (see CheckpointReader)
+        last: (element type, element id) of the last element written
+        window: bytes searched before position
+    Returns:
+        CheckpointReader
+    
+    """
+    stream = compression.open_input(osm_file)
+    start = max(0, position - window)
+    if compression.is_compressed(osm_file):
+        read_bytes(stream, start, keep=False)
+    else:
+        stream.seek(start)
+    data = read_bytes(stream, position - start)
 
-    context = ET.iterparse(osm_file, events=('start', 'end'))
-    _, root = next(context)
-    for event, elem in context:
-        if event == 'end' and elem.tag in tags:
-            yield elem
-            root.clear()
+    element_type, element_id = last
+    tag = element_type.encode()
+    pattern = re.compile(rb'<' + tag + rb'\s[^>]*?\bid=["\']' +
+                         re.escape(str(element_id).encode()) + rb'["\'][^>]*>')
+    matches = list(pattern.finditer(data))
+    end = -1
+    if matches:
+        end = matches[-1].end()
+        if not data[:end].endswith(b'/>'):
+            end = data.find(b'</' + tag + b'>', end)
+            if end >= 0:
+                end += len(tag) + 3
+    if end < 0:
+        stream.close()
+        raise ValueError('{0} {1} of the checkpoint not found before byte {2} of '
+                         '{3}'.format(element_type, element_id, position, osm_file))
+    return CheckpointReader(stream, data[end:], start + end, OSM_HEAD)
+
+def next_element_offset(osm_file, offset, block_size=1 << 16):
+    """Return the offset of the first top level element starting at or after
+    offset, or None if there is none
+    
+    Args:
+        osm_file: opened (binary) OSM file
+        offset: byte offset to search from
+        block_size: size of the blocks read while searching
+    Returns:
+        byte offset of the element
+    
+    """
+    osm_file.seek(offset)
+    overlap = b''
+    while True:
+        block = osm_file.read(block_size)
+        if not block:
+            return None
+        buffer = overlap + block
+        m = TOP_LEVEL_ELEMENT.search(buffer)
+        if m:
+            return offset - len(overlap) + m.start()
+        offset += len(block)
+        overlap = buffer[-16:]
+
+def find_shards(osm_file, shards):
+    """Split an OSM file into byte ranges aligned on top level elements
+    
+    Args:
+        osm_file: OSM file
+        shards: number of shards requested
+    Returns:
+        list of (start, end) byte ranges, in file order
+    
+    """
+    size = os.path.getsize(osm_file)
+    with open(osm_file, 'rb') as f:
+        f.seek(max(0, size - (1 << 16)))
+        tail = f.read()
+        end = tail.rfind(OSM_END)
+        if end < 0:
+            raise Exception("No closing </osm> tag found in " + osm_file)
+        end = max(0, size - (1 << 16)) + end
+
+        offsets = []
+        for i in range(shards):
+            offset = next_element_offset(f, size * i // shards)
+            if offset is None or offset >= end:
+                break
+            if not offsets or offset > offsets[-1]:
+                offsets.append(offset)
+
+    return list(zip(offsets, offsets[1:] + [end]))
+
+def iter_chunks(source, chunk_size=CHUNK_SIZE):
+    """Split a stream of an OSM file into chunks of whole top level elements,
+    for the inputs that cannot be split by find_shards (compressed files)
+    
+    Args:
+        source: binary file-like object, see compression.open_input
+        chunk_size: bytes read at a time
+    Returns:
+        (chunk, position) tuples, in file order, position being
+        source.tell() once the chunk is read
+    
+    """
+    buffer = b''
+    started = False
+    while True:
+        block = source.read(chunk_size)
+        buffer += block
+        if not started:
+            m = TOP_LEVEL_ELEMENT.search(buffer)
+            if m is None:
+                if not block:
+                    return
+                # Keep the end of the buffer, it may hold a cut element start
+                buffer = buffer[-16:]
+                continue
+            buffer = buffer[m.start():]
+            started = True
+        if not block:
+            end = buffer.rfind(OSM_END)
+            if end < 0:
+                raise Exception("No closing </osm> tag found")
+            if buffer[:end].strip():
+                yield buffer[:end], source.tell()
+            return
+        # Cut before the last element start: '<' only starts tags in XML
+        cut = max(buffer.rfind(b'<node'), buffer.rfind(b'<way'),
+                  buffer.rfind(b'<relation'))
+        while cut > 0 and not TOP_LEVEL_ELEMENT.match(buffer, cut):
+            cut = max(buffer.rfind(b'<node', 0, cut), buffer.rfind(b'<way', 0, cut),
+                      buffer.rfind(b'<relation', 0, cut))
+        if cut > 0:
+            yield buffer[:cut], source.tell()
+            buffer = buffer[cut:]
+
+def imap_bounded(pool, func, tasks, window):
+    """Apply func to the tasks in a process pool, yielding the results in
+    order, with at most window tasks in flight: unlike pool.imap, a
+    generator of tasks is only consumed as the results are
+    
+    Args:
+        pool: multiprocessing.Pool
+        func: function of a task
+        tasks: iterable of the tasks
+        window: maximum number of tasks submitted and not yet yielded
+    Returns:
+        results
+    
+    """
+    pending = collections.deque()
+    for task in tasks:
+        pending.append(pool.apply_async(func, (task,)))
+        if len(pending) >= window:
+            yield pending.popleft().get()
+    while pending:
+        yield pending.popleft().get()
 
 # ================================================== #
 #               Transform Functions                  #
 # ================================================== #
 
-def clean_element_dict(element_dict, tag_type):
+def clean_element_dict(element_dict, tag_type, deferred=None):
     """Retrieve street name, postal code, and house number for cleaning
     
     This function calls functions in transform.py
@@ -157,6 +685,10 @@ def clean_element_dict(element_dict, tag_type):
     Args:
         element_dict: element dictionary to clean
         tag_type: tag type to select
+        deferred: list collecting the postal codes that need a remote lookup,
+            as (tag_type, id, house_number, street_name, postal_code) tuples.
+            These postal codes are left unchanged and must be resolved later
+            with resolve_deferred. If None, they are looked up inline.
     Returns:
         element_dict: cleaned element dictionary
     
@@ -169,7 +701,8 @@ def clean_element_dict(element_dict, tag_type):
         if child['key'] == 'street':
             #Clean Street name in place (does not need to wait for all parameters)
             street_name = child['value']
-            child['value'] = transform.clean_street_name(street_name,transform.mapping)
+            child['value'] = transform.correct_street_name(
+                transform.clean_street_name(street_name,transform.mapping))
         elif child['key'] == 'postcode':
             postal_code = child['value'].strip()
         elif child['key'] == 'housenumber':
@@ -177,34 +710,107 @@ def clean_element_dict(element_dict, tag_type):
             
     #Clean postal code when all parameters are collected
     if (street_name != '') and (postal_code != '') and (house_number != ''):
-        new_postal_code = transform.clean_postal_code(postal_code, house_number, street_name)        
+        if deferred is not None and transform.needs_postal_code_lookup(postal_code):
+            #Keep the old postal code until the deferred lookup replaces it,
+            #unless another element has the same address
+            new_postal_code = transform.indexed_postal_code(house_number, street_name)
+            if new_postal_code is None:
+                new_postal_code = postal_code
+                deferred.append((tag_type, element_dict[tag_type][0]['id'],
+                                 house_number, street_name, postal_code))
+        else:
+            new_postal_code = transform.clean_postal_code(postal_code, house_number, street_name)        
         for child in element_dict[tag_type]:
             if child['key'] == 'postcode':
                 child['value'] = new_postal_code
         
     return element_dict
+
+def resolve_deferred(deferred, concurrency=4, retries=3):
+    """Look up the deferred postal codes concurrently
+    
+    Args:
+        deferred: list of (tag_type, id, house_number, street_name, postal_code)
+            collected by clean_element_dict
+        concurrency: maximum number of requests in flight
+        retries: number of retries of a failed request
+    Returns:
+        patches: dictionary of tag_type: {id: new postal code}
+    
+    """
+    lookup = transform.postal_code_lookup
+    results = lookup.resolve_many([(house_number, street_name) for
+                                   _, _, house_number, street_name, _ in deferred],
+                                  concurrency, retries)
+
+    patches = {'node_tags': {}, 'way_tags': {}, 'relation_tags': {}}
+    for tag_type, element_id, house_number, street_name, postal_code in deferred:
+        result = results[postcode.normalize_key(house_number, street_name)]
+        transform.postal_code_changes['lookup'] += 1
+        if result == 'Error':
+            transform.postal_code_changes['lookup_failed'] += 1
+        if result != 'Error' and result != postal_code:
+            patches[tag_type][element_id] = result
+            print(house_number + ' ' + street_name)
+            print(postal_code + ' --> ' + result)
+
+    print('Resolved {0} of {1} deferred postal codes'.format(
+        sum(len(p) for p in patches.values()), len(deferred)))
+    return patches
+
+def patch_csv(path, patches, key='postcode'):
+    """Replace the values of the key tags of the given ids in a tags csv
+    
+    Args:
+        path: path of nodes_tags.csv or ways_tags.csv
+        patches: dictionary of id: new value
+        key: tag key to patch
+    Returns:
+        csv file
     
+    """
+    tmp_path = path + '.tmp'
+    with open(path, newline='') as f_in, open(tmp_path, 'w', newline='') as f_out:
+        reader = csv.DictReader(f_in)
+        writer = UnicodeDictWriter(f_out, reader.fieldnames)
+        writer.writeheader()
+        for row in reader:
+            if row['key'] == key and row['id'] in patches:
+                row['value'] = patches[row['id']]
+            writer.writerow(row)
+    os.replace(tmp_path, path)
+
 # ================================================== #
 #               Load Helper Functions                #
 # ================================================== #
 
-def validate_element(element, validator, schema=SCHEMA):
+def validate_element(element, validator):
     """Raise ValidationError if element does not match schema
     
     Args:
         element: element to validate
-        validator: validator (cerberus)
-        schema: schema to validate against
+        validator: validator (validation.ElementValidator compiled from
+            schema.py)
     Returns:
         validation results
     """
-    #v = validator(schema)
-    if validator.validate(element, schema) is not True:
-        field, errors = next(validator.errors.iteritems())
-        message_string = "\nElement of type '{0}' has the following errors:\n{1}"
-        error_string = pprint.pformat(errors)
-        
-        raise Exception(message_string.format(field, error_string))
+    validator.validate(element)
+
+def write_validation_report(invalid, path=VALIDATION_REPORT_PATH):
+    """Write the invalid elements found with validate='report' to a csv
+    
+    Args:
+        invalid: list of (element type, element id, errors)
+        path: path of the report
+    Returns:
+        csv file
+    
+    """
+    with codecs.open(path, 'w') as f:
+        writer = csv.writer(f)
+        writer.writerow(['type', 'id', 'errors'])
+        writer.writerows(invalid)
+    print('{0} invalid elements, see {1}'.format(len(invalid), path))
 
 
 class UnicodeDictWriter(csv.DictWriter, object):
@@ -219,6 +825,146 @@ class UnicodeDictWriter(csv.DictWriter, object):
         for row in rows:
             self.writerow(row)
 
+
+class CsvWriter(object):
+    """Write shaped elements to the output csv(s)
+    
+    Args:
+        outputs: list of (key, path, fields) of the output csvs
+        header: boolean to specify if the csv header must be written
+        positions: list of the positions of the output csvs at a checkpoint
+            (see sync), to truncate them to and append to, or None to write
+            them from the start
+    """
+
+    def __init__(self, outputs=CSV_OUTPUTS, header=True, positions=None):
+        self.outputs = outputs
+        self.header = header
+        self.positions = positions
+        self.files = []
+        self.writers = {}
+        self.tuple_writers = {}
+
+    def __enter__(self):
+        for i, (key, path, fields) in enumerate(self.outputs):
+            if self.positions is None:
+                f = codecs.open(path, 'w')
+            else:
+                f = codecs.open(path, 'r+')
+                f.truncate(self.positions[i])
+                f.seek(self.positions[i])
+            self.files.append(f)
+            self.writers[key] = UnicodeDictWriter(f, fields)
+            self.tuple_writers[key] = csv.writer(f)
+            if self.header is True and self.positions is None:
+                self.writers[key].writeheader()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        for f in self.files:
+            f.close()
+
+    def writerow(self, key, row):
+        self.writers[key].writerow(row)
+
+    def writerows(self, key, rows):
+        self.writers[key].writerows(rows)
+
+    def writetuples(self, key, rows):
+        """Write rows given as tuples in the fields order"""
+        self.tuple_writers[key].writerows(rows)
+
+    def sync(self):
+        """Write the files to disk, and return their positions"""
+        positions = []
+        for f in self.files:
+            f.flush()
+            os.fsync(f.fileno())
+            positions.append(f.tell())
+        return positions
+
+
+class Checkpoint(object):
+    """Periodic checkpoints of a serial load, from which it is resumed if it
+    is killed or fails (see process_map)
+    
+    The state of the load, with the input position and the last element
+    written, is saved to path with the positions of the output csvs, or
+    committed with the rows of the sqlite backend (see
+    database.SqliteWriter.checkpoint).
+    
+    Args:
+        reader: CheckpointReader of the input
+        state: dictionary of the state of the load (its input and options,
+            deferred postal code lookups, invalid elements and aggregates,
+            and whether the node store holds all the nodes of the input)
+        path: path of the checkpoint of the csv backend
+        interval: minimum seconds between two checkpoints
+    """
+
+    def __init__(self, reader, state, path=CHECKPOINT_PATH,
+                 interval=CHECKPOINT_INTERVAL):
+        self.reader = reader
+        self.state = state
+        self.path = path
+        self.interval = interval
+        self.next_checkpoint = time.perf_counter() + interval
+
+    def due(self):
+        return time.perf_counter() >= self.next_checkpoint
+
+    def save(self, writer, element_type, element_id, metrics=None, cleaning=None):
+        """Save a checkpoint after the element written last
+        
+        Args:
+            writer: output writer (CsvWriter or database.SqliteWriter)
+            element_type: type of the element
+            element_id: id of the element
+            metrics: instrument.Metrics of the load, or None
+            cleaning: cleaning counts at the start of the load (see
+                transform.cleaning_counts), counted in the metrics
+        Returns:
+            None
+        
+        """
+        self.state.update(position=self.reader.position,
+                          last=(element_type, element_id), metrics=None)
+        if metrics is not None:
+            snapshot = instrument.Metrics()
+            snapshot.merge(metrics.as_dict())
+            snapshot.add_counts(cleaning, transform.cleaning_counts())
+            self.state['metrics'] = snapshot.as_dict()
+        if isinstance(writer, CsvWriter):
+            self.state['positions'] = writer.sync()
+            tmp_path = self.path + '.tmp'
+            with open(tmp_path, 'wb') as f:
+                pickle.dump(self.state, f)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.path)
+        else:
+            writer.checkpoint(pickle.dumps(self.state))
+        self.next_checkpoint = time.perf_counter() + self.interval
+
+def read_checkpoint(backend, path=CHECKPOINT_PATH, db_path=database.DB_PATH):
+    """Return the state of the last checkpoint of an unfinished load, or None
+    
+    Args:
+        backend: 'csv' or 'sqlite'
+        path: path of the checkpoint of the csv backend
+        db_path: path of the database file of the sqlite backend
+    Returns:
+        dictionary of the state (see Checkpoint)
+    
+    """
+    if backend == 'csv':
+        if not os.path.exists(path):
+            return None
+        with open(path, 'rb') as f:
+            return pickle.load(f)
+    state = database.read_checkpoint(db_path)
+    return pickle.loads(state) if state is not None else None
+
 def summarize_dataset(dataset):
     """Return summary of dataset filesize
     
@@ -237,58 +983,671 @@ def summarize_dataset(dataset):
 # ================================================== #
 #               Main Function                        #
 # ================================================== #
-def process_map(file_in, validate):
-    """Iteratively process each XML element and write to csv(s)
+def write_element(writer, element_type, el):
+    """Write the rows of a shaped and cleaned element
     
     Args:
-        file_in: input OSM file
-        validate: boolean to specify if data must be validated or not
+        writer: output writer (CsvWriter, database.SqliteWriter or
+            columnar.ParquetWriter)
+        element_type: 'node', 'way' or 'relation'
+        el: shaped element
     Returns:
-        csv files
+        None
     
     """
+    if element_type == 'node':
+        writer.writerow('node', el['node'])
+        writer.writerows('node_tags', el['node_tags'])
+    elif element_type == 'way':
+        writer.writerow('way', el['way'])
+        writer.writetuples('way_nodes', el['way_nodes'])
+        writer.writerows('way_tags', el['way_tags'])
+        if 'way_geometry' in el:
+            writer.writerow('way_geometry', el['way_geometry'])
+    elif element_type == 'relation':
+        writer.writerow('relation', el['relation'])
+        writer.writetuples('relation_members', el['relation_members'])
+        writer.writerows('relation_tags', el['relation_tags'])
 
-    with codecs.open(NODES_PATH, 'w') as nodes_file, \
-         codecs.open(NODE_TAGS_PATH, 'w') as nodes_tags_file, \
-         codecs.open(WAYS_PATH, 'w') as ways_file, \
-         codecs.open(WAY_NODES_PATH, 'w') as way_nodes_file, \
-         codecs.open(WAY_TAGS_PATH, 'w') as way_tags_file:
-
-        nodes_writer = UnicodeDictWriter(nodes_file, NODE_FIELDS)
-        node_tags_writer = UnicodeDictWriter(nodes_tags_file, NODE_TAGS_FIELDS)
-        ways_writer = UnicodeDictWriter(ways_file, WAY_FIELDS)
-        way_nodes_writer = UnicodeDictWriter(way_nodes_file, WAY_NODES_FIELDS)
-        way_tags_writer = UnicodeDictWriter(way_tags_file, WAY_TAGS_FIELDS)
-
-        nodes_writer.writeheader()
-        node_tags_writer.writeheader()
-        ways_writer.writeheader()
-        way_nodes_writer.writeheader()
-        way_tags_writer.writeheader()
+def load_elements(file_in, validate, writer, deferred=None, invalid=None,
+                  node_store=None, metrics=None, parser='etree', aggregates=None,
+                  checkpoint=None):
+    """Iteratively process each XML element of file_in and write it
+    
+    With a node_store, the node locations are added to the store (unless
+    it is read only), and the geometry of the ways is written too. The store
+    is frozen at the first way: a node after it raises
+    nodestore.NodeOrderError.
+    
+    With metrics, the elements and tags are counted, each stage is timed
+    and the bytes read are reported every PROGRESS_ELEMENTS elements. The
+    only cost without metrics is a test per stage.
+    
+    With a checkpoint, whether one is due is checked every PROGRESS_ELEMENTS
+    elements, after an element is written.
+    
+    Args:
+        file_in: input OSM file, or file-like object
+        validate: True to raise ValidationError on the first invalid element,
+            'report' to collect all the invalid elements in invalid, False
+            not to validate
+        writer: output writer (CsvWriter, database.SqliteWriter or
+            columnar.ParquetWriter)
+        deferred: list collecting the deferred postal code lookups, or None
+            to look them up inline (see clean_element_dict)
+        invalid: list collecting (element type, element id, errors) of the
+            invalid elements, with validate='report'
+        node_store: nodestore.NodeStore of the node locations, or None not to
+            compute the way geometries
+        metrics: instrument.Metrics collecting the metrics of the load, or
+            None
+        parser: XML parser, 'etree', 'lxml' or 'expat' (see parsers.py)
+        aggregates: aggregates.Aggregates updated with the cleaned elements,
+            or None
+        checkpoint: Checkpoint of the load, file_in being its reader, or None
+    Returns:
+        None
+    
+    """
+    fill_store = node_store is not None and not node_store.readonly
+    validator = validation.ElementValidator(SCHEMA, TUPLE_FIELDS)
 
-        validator = cerberus.Validator()
+    timed = metrics is not None
+    source = file_in
+    if timed:
+        if isinstance(file_in, str):
+            # Opened here to know the bytes read
+            source = compression.open_input(file_in)
+        clock = time.perf_counter
+        seconds = metrics.seconds
+        counts = metrics.counts
+        t0 = clock()
+    if timed or checkpoint is not None:
+        cleaning = transform.cleaning_counts()
 
-        for element in get_element(file_in, tags=('node', 'way')):
-            elem = shape_element(element)
+    try:
+        elements = get_element(source, ('node', 'way', 'relation'), parser)
+        for i, element in enumerate(elements):
+            if timed:
+                t1 = clock()
+                seconds['parse'] += t1 - t0
+            elem = shape_element(element, node_store=node_store)
+            if timed:
+                t2 = clock()
+                seconds['shape'] += t2 - t1
             if elem:                
                 if validate is True:
                     validate_element(elem, validator)
+                elif validate == 'report' and not validator.is_valid(elem):
+                    invalid.append((element.tag, element.get('id'),
+                                    validator.errors(elem)))
+                if timed:
+                    t3 = clock()
+                    seconds['validate'] += t3 - t2
+
+                tag_type = element.tag + '_tags'
+                el = clean_element_dict(elem, tag_type, deferred)
+                if fill_store and element.tag == 'node':
+                    node = el['node']
+                    node_store.append(int(node['id']), float(node['lat']),
+                                      float(node['lon']))
+                elif fill_store and element.tag == 'way':
+                    node_store.freeze()
+                if timed:
+                    t4 = clock()
+                    seconds['clean'] += t4 - t3
+                write_element(writer, element.tag, el)
+                if aggregates is not None:
+                    aggregates.add(element.tag, el)
+                if timed:
+                    counts[element.tag] += 1
+                    counts[tag_type] += len(el[tag_type])
+                    if not i % PROGRESS_ELEMENTS:
+                        metrics.progress(source.tell())
+                if (checkpoint is not None and not i % PROGRESS_ELEMENTS and
+                        checkpoint.due()):
+                    checkpoint.save(writer, element.tag, el[element.tag]['id'],
+                                    metrics, cleaning)
+                if timed:
+                    t0 = clock()
+                    seconds['write'] += t0 - t4
+        if timed:
+            seconds['parse'] += clock() - t0
+            metrics.progress(source.tell())
+            metrics.add_counts(cleaning, transform.cleaning_counts())
+    finally:
+        if source is not file_in:
+            source.close()
+
+def get_writer(backend, db_path=database.DB_PATH,
+               parquet_dir=columnar.PARQUET_DIR, encoded=False,
+               checkpoints=False, resume=None):
+    """Return the output writer of a backend
+    
+    Args:
+        backend: 'csv', 'sqlite' or 'parquet'
+        db_path: path of the database file of the sqlite backend
+        parquet_dir: directory of the files of the parquet backend
+        encoded: boolean to specify if the sqlite backend must use the
+            dictionary encoded layout (see database.SqliteWriter)
+        checkpoints: boolean to specify if the load has checkpoints
+        resume: state of the checkpoint the load resumes from, or None
+    Returns:
+        writer
+    
+    """
+    if backend == 'csv':
+        return CsvWriter(positions=resume['positions'] if resume is not None else None)
+    elif backend == 'sqlite':
+        return database.SqliteWriter(FIELDS, db_path, encoded=encoded,
+                                     checkpoints=checkpoints,
+                                     resume=resume is not None)
+    elif checkpoints:
+        raise ValueError("Checkpoints are not supported by the '{0}' backend".format(backend))
+    elif backend == 'parquet':
+        return columnar.ParquetWriter(FIELDS, parquet_dir)
+    raise ValueError("Unknown backend '{0}'".format(backend))
 
-                if element.tag == 'node':
-                    el = clean_element_dict(elem, 'node_tags')
-                    nodes_writer.writerow(el['node'])
-                    node_tags_writer.writerows(el['node_tags'])
-                elif element.tag == 'way':
-                    el = clean_element_dict(elem, 'way_tags')
-                    ways_writer.writerow(el['way'])
-                    way_nodes_writer.writerows(el['way_nodes'])
-                    way_tags_writer.writerows(el['way_tags'])
+def init_worker(limiter, address_index=None, street_name_corrector=None):
+    """Initialize a worker process of process_map
+    
+    The state of transform.py is passed explicitly rather than inherited,
+    so that the workers get it with any start method (spawn on macOS and
+    Windows).
+    
+    Args:
+        limiter: postcode.SharedTokenBucket of the Singapore Post lookups,
+            shared with the other workers, or None
+        address_index: postcode.AddressIndex of the postal codes, or None
+        street_name_corrector: fuzzy.StreetNameCorrector of the street
+            names, or None
+    Returns:
+        None
+    
+    """
+    transform.postal_code_lookup.limiter = limiter
+    transform.address_index = address_index
+    transform.street_name_corrector = street_name_corrector
+
+def process_shard(args):
+    """Process one shard of the OSM file into partial csv(s), without header
+    
+    Args:
+        args: tuple (file_in, start, end, validate, shard_dir, defer,
+            node_store_path, measure, parser, aggregate), file_in being the
+            OSM file or the bytes of a chunk (see iter_chunks),
+            node_store_path the path of the memory-mapped node store, or None
+            not to compute the way geometries, measure a boolean to specify if
+            the metrics of the shard must be collected, parser the XML parser,
+            and aggregate a boolean to specify if the aggregates of the shard
+            must be collected
+    Returns:
+        list of the partial csv paths, in the order of CSV_OUTPUTS, list
+        of the deferred postal code lookups (None if defer is False), list
+        of the invalid elements (with validate='report'), the metrics of
+        the shard (see instrument.Metrics.as_dict, None if measure is
+        False), and the aggregates.Aggregates of the shard (None if
+        aggregate is False)
+    
+    """
+    (file_in, start, end, validate, shard_dir, defer, node_store_path,
+     measure, parser, aggregate) = args
+    deferred = [] if defer is True else None
+    invalid = []
+    metrics = instrument.Metrics() if measure else None
+    aggregates = aggregates_module.Aggregates() if aggregate else None
+    node_store = (nodestore.NodeStore.open(node_store_path)
+                  if node_store_path is not None else None)
+    os.makedirs(shard_dir, exist_ok=True)
+    outputs = [(key, os.path.join(shard_dir, os.path.basename(path)), fields)
+               for key, path, fields in CSV_OUTPUTS]
+
+    reader = ShardReader(file_in, start, end)
+    try:
+        with CsvWriter(outputs, header=False) as writer:
+            load_elements(reader, validate, writer, deferred, invalid, node_store,
+                          metrics, parser, aggregates)
+    finally:
+        reader.close()
+        if node_store is not None:
+            node_store.close()
+    return ([path for _, path, _ in outputs], deferred, invalid,
+            metrics.as_dict() if metrics is not None else None, aggregates)
+
+def merge_shards(parts, writer):
+    """Write the partial csv(s) of each shard with writer, in shard order
+    
+    Args:
+        parts: list of the partial csv paths of each shard, in file order
+        writer: output writer (CsvWriter, database.SqliteWriter or
+            columnar.ParquetWriter)
+    Returns:
+        None
+    
+    """
+    if isinstance(writer, CsvWriter):
+        # Plain concatenation, the partial csvs have no header
+        for f in writer.files:
+            f.flush()
+        for i, f in enumerate(writer.files):
+            with open(f.name, 'ab') as out:
+                for shard_parts in parts:
+                    with open(shard_parts[i], 'rb') as part:
+                        shutil.copyfileobj(part, out)
+    else:
+        for i, (key, _, _) in enumerate(CSV_OUTPUTS):
+            for shard_parts in parts:
+                writer.import_csv(key, shard_parts[i], header=False)
+
+def patch_postal_codes(patches, backend, db_path=database.DB_PATH,
+                       parquet_dir=columnar.PARQUET_DIR):
+    """Write the postal codes resolved by resolve_deferred in bulk
+    
+    Args:
+        patches: dictionary of tag_type: {id: new postal code}
+        backend: 'csv', 'sqlite' or 'parquet'
+        db_path: path of the database file of the sqlite backend
+        parquet_dir: directory of the files of the parquet backend
+    Returns:
+        None
+    
+    """
+    if backend == 'csv':
+        for tag_type, path in [('node_tags', NODE_TAGS_PATH),
+                               ('way_tags', WAY_TAGS_PATH),
+                               ('relation_tags', RELATION_TAGS_PATH)]:
+            if patches[tag_type]:
+                patch_csv(path, patches[tag_type])
+    elif backend == 'parquet':
+        columnar.patch_tags(parquet_dir, patches, key='postcode')
+    else:
+        database.patch_tags(db_path, patches, key='postcode')
+
+def process_map(file_in, validate, processes=1, shards=None, backend='csv',
+                db_path=database.DB_PATH, geocode='inline',
+                parquet_dir=columnar.PARQUET_DIR, geometry=True,
+                node_store_path=None, progress=None, metrics_path=None,
+                parser='etree', encoded=False, address_index_path=None,
+                aggregates_path=None, checkpoint_interval=None, resume=False,
+                checkpoint_path=CHECKPOINT_PATH, fuzzy_streets=False, all_nodes=False):
+    """Iteratively process each XML element and write to csv(s), stream it
+    into the sqlite3 database, or write it to Parquet files
+    
+    With processes > 1, the file is split into shards aligned on top level
+    elements, each shard is processed by a worker of a process pool into
+    partial csv(s), and the partial csv(s) are merged in file order. The
+    output is the same as with a single process.
+    
+    Compressed files (.osm.bz2, .osm.gz) are decompressed while streaming.
+    With processes > 1, they are split into chunks of CHUNK_SIZE
+    decompressed bytes sent to the workers, and the streams of multi-stream
+    bzip2 files are decompressed in parallel too.
+    
+    With geocode='deferred', the postal codes needing a Singapore Post lookup
+    are written unchanged, then looked up concurrently once all the elements
+    are loaded, and patched in the output.
+    
+    With geometry=True, the node locations are kept in a nodestore.NodeStore
+    to write the bounding box, length and centroid of the ways in
+    way_geometry as they are processed. With processes > 1, the store is
+    filled by a first pass over the nodes and memory-mapped by the workers.
+    A serial load fills it while streaming; if a node comes after a way,
+    the load starts again with the store filled by a first pass, so that
+    the ways get the same geometries as with processes > 1.
+    
+    With address_index_path, the postal codes of the addresses of the file
+    are indexed by a first pass (see build_address_index), and the postal
+    codes needing a Singapore Post lookup are taken from the index when
+    another element has the same address.
+    
+    With fuzzy_streets=True, the street names of the file are counted by a
+    first pass (see build_street_corrector), and the misspelled street names
+    and street types not covered by transform.mapping are corrected to the
+    closest frequent ones.
+    
+    With progress or metrics_path, the load is measured (see
+    instrument.Metrics): a progress line is printed to stderr every progress
+    seconds (as the shards complete with processes > 1), and a JSON summary
+    is written to metrics_path.
+    
+    With aggregates_path, the statistics of singapore_queries.sql are
+    aggregated while the elements are streamed (see aggregates.Aggregates,
+    merged from the shards with processes > 1), and written as a JSON
+    summary to aggregates_path, and to the summary table of the sqlite
+    backend. Postal codes looked up with geocode='deferred' are aggregated
+    before the lookup.
+    
+    With checkpoint_interval, a serial load with the csv or sqlite backend
+    saves a checkpoint every checkpoint_interval seconds (see Checkpoint).
+    With resume=True, a load killed or failing after a checkpoint resumes
+    from it: the input is read from the element after the last one written,
+    the output csvs are truncated to their positions at the checkpoint (the
+    rows of the database are rolled back to it), and the node store is
+    filled again with the nodes before it.
+    
+    Args:
+        file_in: input OSM file, possibly compressed
+        validate: True to stop on the first invalid element, 'report' to
+            write all the invalid elements to VALIDATION_REPORT_PATH, False
+            not to validate
+        processes: number of worker processes
+        shards: number of shards of an uncompressed file (defaults to 4 per
+            process)
+        backend: 'csv' to write the csv(s), 'sqlite' to load the database,
+            'parquet' to write Parquet files
+        db_path: path of the database file of the sqlite backend
+        geocode: 'inline' or 'deferred' postal code lookups
+        parquet_dir: directory of the files of the parquet backend
+        geometry: boolean to specify if the way geometries must be computed
+        node_store_path: path of the files of a memory-mapped node store, or
+            None to keep the node store in memory (in SHARDS_DIR with
+            processes > 1)
+        progress: seconds between progress lines, or None for no progress
+        metrics_path: path of the JSON summary of the metrics, or None
+        parser: XML parser, 'etree', 'lxml' or 'expat' (see parsers.py)
+        encoded: boolean to specify if the sqlite backend must use the
+            dictionary encoded layout (see database.create_tables)
+        address_index_path: path of the address index, built if it does
+            not match file_in, or None not to use an address index
+        aggregates_path: path of the JSON summary of the aggregates, or None
+            not to aggregate
+        checkpoint_interval: minimum seconds between two checkpoints, or
+            None for no checkpoints (CHECKPOINT_INTERVAL with resume=True)
+        resume: boolean to specify if the load must resume from its last
+            checkpoint, if there is one
+        checkpoint_path: path of the checkpoint of the csv backend
+        fuzzy_streets: boolean to specify if the misspelled street names
+            must be corrected against the street names of file_in
+        all_nodes: boolean to specify if a serial load must fill the node
+            store with all the nodes of file_in first (the state of a
+            resumed load tells instead)
+    Returns:
+        csv files, sqlite3 database or Parquet files
+    
+    """
+    deferred = [] if geocode == 'deferred' else None
+    invalid = []
+    metrics = None
+    if progress is not None or metrics_path is not None:
+        metrics = instrument.Metrics(os.path.getsize(file_in), progress)
+    aggregates = (aggregates_module.Aggregates() if aggregates_path is not None
+                  else None)
+
+    checkpoints = checkpoint_interval is not None or resume
+    state = resumed = None
+    if checkpoints:
+        if processes > 1:
+            raise ValueError('Checkpoints require a single process')
+        options = {'backend': backend, 'encoded': encoded, 'geometry': geometry,
+                   'validate': validate, 'geocode': geocode, 'parser': parser,
+                   'aggregates': aggregates is not None, 'fuzzy_streets': fuzzy_streets}
+        stat = os.stat(file_in)
+        source_file = {'path': os.path.abspath(file_in), 'size': stat.st_size,
+                       'mtime': stat.st_mtime}
+        if resume:
+            state = read_checkpoint(backend, checkpoint_path, db_path)
+        if state is None:
+            if resume:
+                print('No checkpoint to resume from, loading from the start')
+            state = {'input': source_file, 'options': options, 'deferred': deferred,
+                     'invalid': invalid, 'aggregates': aggregates,
+                     'all_nodes': all_nodes}
+        elif state['input'] != source_file or state['options'] != options:
+            raise ValueError('The checkpoint is of another input file or load options')
+        else:
+            resumed = state
+            deferred, invalid, aggregates = (state['deferred'], state['invalid'],
+                                             state['aggregates'])
+            all_nodes = state.get('all_nodes', False)
+            if metrics is not None and state['metrics'] is not None:
+                metrics.merge(state['metrics'])
+            print('Resuming after {0} {1}'.format(*state['last']))
+    if backend == 'csv' and resumed is None:
+        # Outputs written from the start: an older checkpoint is obsolete
+        if os.path.exists(checkpoint_path):
+            os.remove(checkpoint_path)
+
+    transform.address_index = None
+    if address_index_path is not None:
+        index = build_address_index(file_in, address_index_path, parser)
+        print('Address index: {0} addresses ({1} with conflicting postal codes), '
+              'resolves {2} of the {3} postal codes needing a lookup'.format(
+                  len(index), len(index.conflicts), index.source['resolved'],
+                  index.source['lookups']))
+        transform.address_index = index
+
+    transform.street_name_corrector = None
+    if fuzzy_streets:
+        corrector = build_street_corrector(file_in, parser)
+        print('Street names: {0} distinct, vocabulary of {1} street names and '
+              '{2} street types'.format(len(corrector.names), len(corrector.name_tree),
+                                         len(corrector.type_tree)))
+        transform.street_name_corrector = corrector
+
+    if processes <= 1:
+        node_store = None
+        source = file_in
+        checkpoint = None
+        restart = False
+        try:
+            if geometry and all_nodes:
+                node_store = build_node_store(file_in, node_store_path, parser)
+                # Not filled again while loading
+                node_store.readonly = True
+            elif geometry:
+                node_store = nodestore.NodeStore(node_store_path)
+            if checkpoints:
+                if resumed is not None:
+                    if node_store is not None and not all_nodes:
+                        fill_node_store(node_store, file_in, parser,
+                                        last=resumed['last'], until_way=True)
+                    source = resume_reader(file_in, resumed['position'], resumed['last'])
+                else:
+                    source = CheckpointReader(compression.open_input(file_in))
+                checkpoint = Checkpoint(source, state, checkpoint_path,
+                                        CHECKPOINT_INTERVAL if checkpoint_interval is None
+                                        else checkpoint_interval)
+            with get_writer(backend, db_path, parquet_dir, encoded, checkpoints,
+                            resumed) as writer:
+                load_elements(source, validate, writer, deferred, invalid,
+                              node_store, metrics, parser, aggregates, checkpoint)
+                finish = time.perf_counter()
+            if checkpoints and backend == 'csv' and os.path.exists(checkpoint_path):
+                os.remove(checkpoint_path)
+            if metrics is not None:
+                metrics.seconds['finish'] += time.perf_counter() - finish
+        except nodestore.NodeOrderError:
+            if all_nodes:
+                raise
+            restart = True
+        finally:
+            if source is not file_in:
+                source.close()
+            if node_store is not None:
+                node_store.close()
+        if restart:
+            print('Nodes found after the ways, loading again with all the nodes '
+                  'stored first')
+            return process_map(file_in, validate, processes, shards, backend, db_path,
+                               geocode, parquet_dir, geometry, node_store_path,
+                               progress, metrics_path, parser, encoded,
+                               address_index_path, aggregates_path,
+                               checkpoint.interval if checkpoint is not None else None,
+                               False, checkpoint_path, fuzzy_streets, all_nodes=True)
+    else:
+        if not geometry:
+            node_store_path = None
+        elif node_store_path is None:
+            node_store_path = os.path.join(SHARDS_DIR, 'nodes')
+        positions = []
+
+        def shard_tasks(shard_ranges):
+            """Yield the process_shard tasks of (file or chunk, start, end,
+            input position) shard ranges, keeping their input positions"""
+            for i, (shard, start, end, position) in enumerate(shard_ranges):
+                positions.append(position)
+                yield (shard, start, end, validate,
+                       os.path.join(SHARDS_DIR, 'part-{0:05d}'.format(i)),
+                       deferred is not None, node_store_path, metrics is not None,
+                       parser, aggregates is not None)
+
+        source = None
+        try:
+            if node_store_path is not None:
+                os.makedirs(SHARDS_DIR, exist_ok=True)
+                build_node_store(file_in, node_store_path, parser,
+                                 processes).close()
+            results = []
+            # The workers share the rate limit of the inline lookups
+            limiter = transform.postal_code_lookup.limiter
+            if limiter is not None:
+                limiter = postcode.SharedTokenBucket(limiter.rate, limiter.capacity)
+            with multiprocessing.Pool(processes, initializer=init_worker,
+                                      initargs=(limiter, transform.address_index,
+                                                transform.street_name_corrector)) as pool:
+                if compression.is_compressed(file_in):
+                    # Byte ranges of a compressed file cannot be read on
+                    # their own: the shards are chunks of the decompressed
+                    # stream, opened once the workers are started
+                    source = compression.open_input(file_in, processes)
+                    shard_ranges = ((chunk, 0, len(chunk), position)
+                                    for chunk, position in iter_chunks(source))
+                else:
+                    shard_ranges = ((file_in, start, end, end) for start, end in
+                                    find_shards(file_in, shards or processes * 4))
+                for result in imap_bounded(pool, process_shard, shard_tasks(shard_ranges),
+                                           2 * processes):
+                    results.append(result)
+                    if metrics is not None:
+                        metrics.merge(result[3])
+                        metrics.progress(positions[len(results) - 1])
+                    if aggregates is not None:
+                        aggregates.merge(result[4])
+            merge = time.perf_counter()
+            with get_writer(backend, db_path, parquet_dir, encoded) as writer:
+                merge_shards([result[0] for result in results], writer)
+            if metrics is not None:
+                metrics.seconds['merge'] += time.perf_counter() - merge
+        finally:
+            if source is not None:
+                source.close()
+            shutil.rmtree(SHARDS_DIR, ignore_errors=True)
+        for _, shard_deferred, shard_invalid, _, _ in results:
+            if deferred is not None:
+                deferred.extend(shard_deferred)
+            invalid.extend(shard_invalid)
+
+    if validate == 'report':
+        write_validation_report(invalid)
+    if deferred:
+        if metrics is not None:
+            geocode_start = time.perf_counter()
+            cleaning = transform.cleaning_counts()
+        patch_postal_codes(resolve_deferred(deferred), backend, db_path,
+                           parquet_dir)
+        if metrics is not None:
+            metrics.seconds['geocode'] += time.perf_counter() - geocode_start
+            metrics.add_counts(cleaning, transform.cleaning_counts())
+
+    if metrics is not None:
+        if progress is not None:
+            metrics.report()
+        if metrics_path is not None:
+            metrics.write_json(metrics_path, input=file_in, backend=backend,
+                               processes=processes, validate=validate,
+                               geocode=geocode, geometry=geometry, parser=parser,
+                               encoded=encoded,
+                               address_index=address_index_path,
+                               fuzzy_streets=fuzzy_streets)
+
+    if aggregates is not None:
+        aggregates.write_json(aggregates_path)
+        if backend == 'sqlite':
+            aggregates.write_sqlite(db_path)
 
     print('Loading successful')
 
 
 if __name__ == '__main__':
-    # Note: Validation is ~ 10X slower. For the project consider using a small
-    # sample of the map when validating.
-    process_map(OSM_PATH, validate=False)
-    summarize_dataset(dataset)
\ No newline at end of file
+    parser = argparse.ArgumentParser(description='Load an OSM file into csv(s)')
+    parser.add_argument('file_in', nargs='?', default=OSM_PATH)
+    parser.add_argument('--validate', choices=['raise', 'report'],
+                        help='stop on the first invalid element, or report '
+                             'all of them')
+    parser.add_argument('--processes', type=int, default=1,
+                        help='number of worker processes')
+    parser.add_argument('--backend', choices=['csv', 'sqlite', 'parquet'],
+                        default='csv')
+    parser.add_argument('--db', default=database.DB_PATH,
+                        help='database file of the sqlite backend')
+    parser.add_argument('--parquet-dir', default=columnar.PARQUET_DIR,
+                        help='output directory of the parquet backend')
+    parser.add_argument('--encoded', action='store_true',
+                        help='store the tag keys, tag values and users of the '
+                             'sqlite backend in dictionary tables, behind views '
+                             'of the usual tables')
+    parser.add_argument('--optimize', action='store_true',
+                        help='optimize the database for singapore_queries.sql '
+                             'after a sqlite load (see database.optimize)')
+    parser.add_argument('--no-geometry', action='store_true',
+                        help='do not compute the way geometries')
+    parser.add_argument('--node-store',
+                        help='memory-map the node locations to these files '
+                             'instead of keeping them in memory')
+    parser.add_argument('--geocode', choices=['inline', 'deferred'],
+                        default='inline',
+                        help='look up postal codes inline or after the load')
+    parser.add_argument('--address-index', nargs='?', metavar='PATH',
+                        const=postcode.ADDRESS_INDEX_PATH,
+                        help='take the postal codes needing a lookup from the '
+                             'other elements with the same address, indexed by '
+                             'a first pass and saved to PATH (default: {0})'.format(
+                                 postcode.ADDRESS_INDEX_PATH))
+    parser.add_argument('--fuzzy-streets', action='store_true',
+                        help='correct the misspelled street names not covered by '
+                             'transform.mapping to the closest frequent street '
+                             'names of the file, counted by a first pass')
+    parser.add_argument('--parser', choices=list(parsers.PARSERS), default='etree',
+                        help='XML parser (lxml requires lxml)')
+    parser.add_argument('--progress', type=float, nargs='?', const=5.0,
+                        metavar='SECONDS',
+                        help='print the progress to stderr every SECONDS '
+                             '(default: 5)')
+    parser.add_argument('--metrics', metavar='PATH',
+                        help='write a JSON summary of the metrics of the load '
+                             '(counts, stage times, cleaning outcomes)')
+    parser.add_argument('--aggregates', nargs='?', metavar='PATH',
+                        const=aggregates_module.AGGREGATES_PATH,
+                        help='aggregate the statistics of the report while '
+                             'loading, and write them to PATH (default: {0}) '
+                             'and to the summary table of the sqlite '
+                             'backend'.format(aggregates_module.AGGREGATES_PATH))
+    parser.add_argument('--checkpoint', type=float, nargs='?',
+                        const=CHECKPOINT_INTERVAL, metavar='SECONDS',
+                        help='save a checkpoint of the load every SECONDS '
+                             '(default: {0:g}), to resume it with --resume if it '
+                             'is killed or fails'.format(CHECKPOINT_INTERVAL))
+    parser.add_argument('--resume', action='store_true',
+                        help='resume the load from its last checkpoint')
+    args = parser.parse_args()
+
+    validate = {'raise': True, 'report': 'report'}.get(args.validate, False)
+    process_map(args.file_in, validate=validate, processes=args.processes,
+                backend=args.backend, db_path=args.db, geocode=args.geocode,
+                parquet_dir=args.parquet_dir, geometry=not args.no_geometry,
+                node_store_path=args.node_store, progress=args.progress,
+                metrics_path=args.metrics, parser=args.parser,
+                encoded=args.encoded, address_index_path=args.address_index,
+                aggregates_path=args.aggregates,
+                checkpoint_interval=args.checkpoint, resume=args.resume,
+                fuzzy_streets=args.fuzzy_streets)
+    if args.optimize and args.backend == 'sqlite':
+        database.optimize(args.db)
+    if args.backend == 'csv':
+        summarize_dataset([args.file_in] + dataset[1:])
+    elif args.backend == 'parquet':
+        summarize_dataset([args.file_in] +
+                          [os.path.join(args.parquet_dir, columnar.FILES[key])
+                           for key, _, _ in CSV_OUTPUTS])
+    else:
+        summarize_dataset([args.file_in, args.db])
@@ -0,0 +1,253 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 20:16:52 2026
+
+@author: rogerduong
+
+Compact store of the node locations, filled while the nodes are streamed
+so that the way geometries can be computed without joining ways_nodes and
+nodes. Node ids are kept in an array('q') sorted by id, and the locations
+in an array('i') of interleaved lat, lon in fixed point (1e-7 degree, the
+precision of OSM), i.e. 16 bytes per node. With a path, the arrays are
+written to files and memory-mapped, for extracts bigger than the memory.
+Unsorted nodes are sorted once before the first lookup, by numpy if it is
+installed, and by a merge of their sorted runs otherwise.
+"""
+
+import array
+import bisect
+import mmap
+import os
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+SCALE = 10**7 # fixed point of the coordinates, as in the OSM database
+
+CHUNK_SIZE = 1 << 20 # nodes buffered before being written to the files
+
+
+class NodeOrderError(ValueError):
+    """Node added to a store after its first lookup"""
+
+def merge_runs(ids, coords):
+    """Merge the consecutive pairs of ascending runs of ids, and their coords
+
+    Ties are taken from the first run, so the merge is stable.
+
+    Args:
+        ids: array('q') of node ids
+        coords: array('i') of the interleaved lat, lon of the nodes
+    Returns:
+        (merged ids, merged coords, number of runs after the merge)
+
+    """
+    n = len(ids)
+    merged_ids = array.array('q')
+    merged_coords = array.array('i')
+    runs = 0
+    i = 0
+    while i < n:
+        j = i + 1
+        while j < n and ids[j - 1] <= ids[j]:
+            j += 1
+        k = j + 1 if j < n else n
+        while k < n and ids[k - 1] <= ids[k]:
+            k += 1
+        a, b = i, j
+        while a < j and b < k:
+            if ids[b] < ids[a]:
+                merged_ids.append(ids[b])
+                merged_coords.extend(coords[2 * b:2 * b + 2])
+                b += 1
+            else:
+                merged_ids.append(ids[a])
+                merged_coords.extend(coords[2 * a:2 * a + 2])
+                a += 1
+        merged_ids.extend(ids[a:j])
+        merged_coords.extend(coords[2 * a:2 * j])
+        merged_ids.extend(ids[b:k])
+        merged_coords.extend(coords[2 * b:2 * k])
+        runs += 1
+        i = k
+    return merged_ids, merged_coords, runs
+
+def sort_nodes(ids, coords):
+    """Sort nodes by id, keeping the last location of duplicate ids
+
+    With numpy, the ids are sorted by a stable argsort. Otherwise the
+    ascending runs of the ids (e.g. the nodes before and after the ways of
+    a file) are merged until one is left, without an index per node.
+
+    Args:
+        ids: array('q') of node ids
+        coords: array('i') of the interleaved lat, lon of the nodes
+    Returns:
+        (sorted ids, sorted coords) arrays
+
+    """
+    if np is not None:
+        id_values = np.frombuffer(ids, dtype=np.int64)
+        order = np.argsort(id_values, kind='stable')
+        sorted_ids = id_values[order]
+        # The last of the nodes with the same id
+        keep = np.ones(len(order), dtype=bool)
+        keep[:-1] = sorted_ids[1:] != sorted_ids[:-1]
+        order = order[keep]
+        sorted_ids = array.array('q', sorted_ids[keep].tobytes())
+        sorted_coords = array.array(
+            'i', np.frombuffer(coords, dtype=np.int32).reshape(-1, 2)[order].tobytes())
+        return sorted_ids, sorted_coords
+
+    runs = 2
+    while runs > 1:
+        ids, coords, runs = merge_runs(ids, coords)
+    if all(ids[i - 1] != ids[i] for i in range(1, len(ids))):
+        return ids, coords
+    sorted_ids = array.array('q')
+    sorted_coords = array.array('i')
+    for i in range(len(ids)):
+        if i + 1 < len(ids) and ids[i + 1] == ids[i]:
+            continue
+        sorted_ids.append(ids[i])
+        sorted_coords.extend(coords[2 * i:2 * i + 2])
+    return sorted_ids, sorted_coords
+
+
+class NodeStore(object):
+    """Store of the node locations
+
+    Nodes are appended while streaming (OSM files are sorted by id, other
+    files are sorted once before the first lookup), and looked up by binary
+    search. Appending a node after the first lookup raises NodeOrderError.
+
+    Args:
+        path: prefix of the files (path.ids, path.coords) of a memory-mapped
+            store, or None to keep the store in memory
+    """
+
+    def __init__(self, path=None):
+        self.path = path
+        self.ids = array.array('q')
+        self.coords = array.array('i')
+        self.size = 0
+        self.last_id = None
+        self.sorted = True
+        self.frozen = False
+        self.readonly = False
+        self.maps = []
+        if path is not None:
+            self.files = [open(path + '.ids', 'wb'), open(path + '.coords', 'wb')]
+
+    @classmethod
+    def open(cls, path):
+        """Open the memory-mapped store written at path, read only"""
+        store = cls()
+        store.path = path
+        store.readonly = True
+        store.map_files()
+        return store
+
+    def __len__(self):
+        return self.size
+
+    def append(self, node_id, lat, lon):
+        """Add the location of a node"""
+        if self.readonly:
+            raise ValueError('Cannot add nodes to a read only store')
+        if self.frozen:
+            raise NodeOrderError('Node {0} added after the first lookup'.format(node_id))
+        if self.last_id is not None and node_id <= self.last_id:
+            self.sorted = False
+        self.last_id = node_id
+        self.ids.append(node_id)
+        self.coords.append(round(lat * SCALE))
+        self.coords.append(round(lon * SCALE))
+        self.size += 1
+        if self.path is not None and len(self.ids) >= CHUNK_SIZE:
+            self.write_chunk()
+
+    def write_chunk(self):
+        self.ids.tofile(self.files[0])
+        self.coords.tofile(self.files[1])
+        self.ids = array.array('q')
+        self.coords = array.array('i')
+
+    def freeze(self):
+        """Stop appending, and get the store ready for lookups"""
+        if self.frozen:
+            return
+        self.frozen = True
+        if self.path is not None:
+            self.write_chunk()
+            for f in self.files:
+                f.close()
+            if not self.sorted:
+                self.ids, self.coords = self.read_files()
+                self.sort()
+                with open(self.path + '.ids', 'wb') as f:
+                    self.ids.tofile(f)
+                with open(self.path + '.coords', 'wb') as f:
+                    self.coords.tofile(f)
+            self.map_files()
+        elif not self.sorted:
+            self.sort()
+
+    def read_files(self):
+        ids = array.array('q')
+        coords = array.array('i')
+        with open(self.path + '.ids', 'rb') as f:
+            ids.frombytes(f.read())
+        with open(self.path + '.coords', 'rb') as f:
+            coords.frombytes(f.read())
+        return ids, coords
+
+    def sort(self):
+        """Sort the nodes by id, keeping the last location of duplicate ids"""
+        self.ids, self.coords = sort_nodes(self.ids, self.coords)
+        self.size = len(self.ids)
+        self.sorted = True
+
+    def map_files(self):
+        self.frozen = True
+        self.maps = []
+        views = []
+        for suffix, typecode in (('.ids', 'q'), ('.coords', 'i')):
+            with open(self.path + suffix, 'rb') as f:
+                if os.fstat(f.fileno()).st_size == 0:
+                    views.append(array.array(typecode))
+                    continue
+                m = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            view = memoryview(m)
+            self.maps.append((m, view))
+            views.append(view.cast(typecode))
+        self.ids, self.coords = views
+        self.size = len(self.ids)
+
+    def get(self, node_id):
+        """Return the (lat, lon) of a node, or None if it is not stored"""
+        if not self.frozen:
+            self.freeze()
+        i = bisect.bisect_left(self.ids, node_id)
+        if i == self.size or self.ids[i] != node_id:
+            return None
+        return self.coords[2 * i] / SCALE, self.coords[2 * i + 1] / SCALE
+
+    def close(self):
+        """Release the memory maps; the files are kept"""
+        if self.path is not None and not self.frozen:
+            self.freeze()
+        for view in (self.ids, self.coords):
+            if isinstance(view, memoryview):
+                view.release()
+        for m, view in self.maps:
+            view.release()
+            m.close()
+        self.maps = []
+        if self.path is not None:
+            self.ids = array.array('q')
+            self.coords = array.array('i')
+            self.size = 0
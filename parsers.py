@@ -0,0 +1,293 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 22:24:37 2026
+
+@author: rogerduong
+
+XML parsers of OSM files, yielding the top level elements (nodes, ways,
+relations) one at a time with their children. All the parsers yield objects
+with the interface used by load.shape_element: tag, attrib, get(), and
+iteration over the children, which have a tag and an attrib.
+
+- etree: xml.etree.ElementTree.iterparse, clearing the root after each
+  element (the original parser of load.py)
+- lxml: lxml.etree.iterparse filtered on the tags, clearing each element and
+  deleting its preceding siblings (requires lxml)
+- expat: pyexpat callbacks building lightweight Element objects, without any
+  tree: the attributes are the dictionaries created by expat
+
+Compressed files (.osm.bz2, .osm.gz) are decompressed while parsed.
+
+iterparse_changes yields the elements of osmChange files (.osc), one level
+deeper, with the action (create, modify or delete) enclosing them.
+"""
+
+import compression
+
+import operator
+import xml.etree.ElementTree as ET
+import xml.parsers.expat
+
+try:
+    from lxml import etree as lxml_etree
+except ImportError:
+    lxml_etree = None
+
+TOP_LEVEL_TAGS = ('node', 'way', 'relation')
+
+# Elements of an osmChange file enclosing the changed elements
+ACTIONS = ('create', 'modify', 'delete')
+
+# Bytes fed to expat at a time
+CHUNK_SIZE = 1 << 17
+
+class Child(tuple):
+    """Child element of the expat parser: a (tag, attrib) tuple, created by
+    the tuple constructor, with tag and attrib properties"""
+
+    __slots__ = ()
+
+    tag = property(operator.itemgetter(0))
+    attrib = property(operator.itemgetter(1))
+
+    def get(self, key, default=None):
+        return self[1].get(key, default)
+
+
+class Element(tuple):
+    """Top level element of the expat parser: a (tag, attrib, children)
+    tuple, children being the list of the Child of the element"""
+
+    __slots__ = ()
+
+    tag = property(operator.itemgetter(0))
+    attrib = property(operator.itemgetter(1))
+    children = property(operator.itemgetter(2))
+
+    def __iter__(self):
+        return iter(self[2])
+
+    def __len__(self):
+        return len(self[2])
+
+    def get(self, key, default=None):
+        return self[1].get(key, default)
+
+def iterparse_etree(osm_file, tags=TOP_LEVEL_TAGS):
+    """Yield the top level elements of tags with ElementTree"""
+    context = ET.iterparse(osm_file, events=('start', 'end'))
+    _, root = next(context)
+    depth = 1
+    for event, elem in context:
+        if event == 'start':
+            depth += 1
+            continue
+        depth -= 1
+        if depth == 1:
+            if tags is None or elem.tag in tags:
+                yield elem
+            root.clear()
+
+def iterparse_lxml(osm_file, tags=TOP_LEVEL_TAGS):
+    """Yield the top level elements of tags with lxml
+
+    Only the end events of tags are reported by lxml. Each element is cleared
+    once processed, and the cleared elements before it are deleted from the
+    root so that the tree does not grow.
+    """
+    if lxml_etree is None:
+        raise ImportError('The lxml parser requires lxml')
+    if tags is None:
+        context = lxml_etree.iterparse(osm_file, events=('end',))
+    else:
+        context = lxml_etree.iterparse(osm_file, events=('end',), tag=tags)
+    for _, elem in context:
+        parent = elem.getparent()
+        if parent is None or parent.getparent() is not None:
+            # The root, or a child of a top level element
+            continue
+        yield elem
+        elem.clear(keep_tail=True)
+        while elem.getprevious() is not None:
+            del parent[0]
+
+def iterparse_expat(osm_file, tags=TOP_LEVEL_TAGS):
+    """Yield the top level elements of tags as Element objects, parsed with
+    expat"""
+    parser = xml.parsers.expat.ParserCreate()
+    completed = []
+    depth = 0
+    element = None
+
+    def start(tag, attrib):
+        nonlocal depth, element
+        depth += 1
+        if element is not None:
+            element[2].append(Child((tag, attrib)))
+        elif depth == 2 and (tags is None or tag in tags):
+            element = Element((tag, attrib, []))
+
+    def end(tag):
+        nonlocal depth, element
+        if depth == 2 and element is not None:
+            completed.append(element)
+            element = None
+        depth -= 1
+
+    parser.StartElementHandler = start
+    parser.EndElementHandler = end
+
+    while True:
+        data = osm_file.read(CHUNK_SIZE)
+        parser.Parse(data, not data)
+        yield from completed
+        del completed[:]
+        if not data:
+            break
+
+def iterchanges_etree(osc_file):
+    """Yield the (action, element) of an osmChange file with ElementTree,
+    clearing the action element after each element"""
+    context = ET.iterparse(osc_file, events=('start', 'end'))
+    next(context)
+    depth = 1
+    action = parent = None
+    for event, elem in context:
+        if event == 'start':
+            depth += 1
+            if depth == 2:
+                action = elem.tag if elem.tag in ACTIONS else None
+                parent = elem
+            continue
+        depth -= 1
+        if depth == 2:
+            if elem.tag in TOP_LEVEL_TAGS:
+                yield action, elem
+            parent.clear()
+        elif depth == 1:
+            action = parent = None
+
+def iterchanges_lxml(osc_file):
+    """Yield the (action, element) of an osmChange file with lxml, clearing
+    each element and deleting its preceding siblings"""
+    if lxml_etree is None:
+        raise ImportError('The lxml parser requires lxml')
+    context = lxml_etree.iterparse(osc_file, events=('end',), tag=TOP_LEVEL_TAGS)
+    for _, elem in context:
+        parent = elem.getparent()
+        if parent is None or parent.getparent() is None:
+            continue
+        if parent.getparent().getparent() is not None:
+            # A member of a relation, or another nested element
+            continue
+        yield (parent.tag if parent.tag in ACTIONS else None), elem
+        elem.clear(keep_tail=True)
+        while elem.getprevious() is not None:
+            del parent[0]
+
+def iterchanges_expat(osc_file):
+    """Yield the (action, element) of an osmChange file as Element objects,
+    parsed with expat"""
+    parser = xml.parsers.expat.ParserCreate()
+    completed = []
+    depth = 0
+    action = None
+    element = None
+
+    def start(tag, attrib):
+        nonlocal depth, action, element
+        depth += 1
+        if element is not None:
+            element[2].append(Child((tag, attrib)))
+        elif depth == 2:
+            action = tag if tag in ACTIONS else None
+        elif depth == 3 and tag in TOP_LEVEL_TAGS:
+            element = Element((tag, attrib, []))
+
+    def end(tag):
+        nonlocal depth, element
+        if depth == 3 and element is not None:
+            completed.append((action, element))
+            element = None
+        depth -= 1
+
+    parser.StartElementHandler = start
+    parser.EndElementHandler = end
+
+    while True:
+        data = osc_file.read(CHUNK_SIZE)
+        parser.Parse(data, not data)
+        yield from completed
+        del completed[:]
+        if not data:
+            break
+
+PARSERS = {
+    'etree': iterparse_etree,
+    'lxml': iterparse_lxml,
+    'expat': iterparse_expat,
+}
+
+CHANGE_PARSERS = {
+    'etree': iterchanges_etree,
+    'lxml': iterchanges_lxml,
+    'expat': iterchanges_expat,
+}
+
+def available_parsers():
+    """Return the names of the parsers that can be used"""
+    return [name for name in PARSERS if name != 'lxml' or lxml_etree is not None]
+
+def iterparse(osm_file, tags=TOP_LEVEL_TAGS, parser='etree'):
+    """Yield the top level elements of an OSM file
+
+    An element and its children must be processed before the next one is
+    requested: the etree and lxml parsers clear them.
+
+    Args:
+        osm_file: OSM file (possibly compressed), or binary file-like object
+        tags: tags of the top level elements to yield, or None for all
+        parser: 'etree', 'lxml' or 'expat'
+    Returns:
+        elements
+
+    """
+    try:
+        iterparse_parser = PARSERS[parser]
+    except KeyError:
+        raise ValueError("Unknown parser '{0}'".format(parser))
+    if not isinstance(osm_file, str):
+        return iterparse_parser(osm_file, tags)
+    return iterparse_path(iterparse_parser, osm_file, tags)
+
+def iterparse_path(iterparse_parser, path, tags):
+    with compression.open_input(path) as f:
+        yield from iterparse_parser(f, tags)
+
+def iterparse_changes(osc_file, parser='etree'):
+    """Yield the changed elements of an osmChange file, with their action
+
+    As with iterparse, an element must be processed before the next one is
+    requested.
+
+    Args:
+        osc_file: osmChange file (possibly compressed, e.g. .osc.gz), or
+            binary file-like object
+        parser: 'etree', 'lxml' or 'expat'
+    Returns:
+        (action, element) tuples, action being create, modify, delete, or
+        None outside of them
+
+    """
+    try:
+        iterchanges_parser = CHANGE_PARSERS[parser]
+    except KeyError:
+        raise ValueError("Unknown parser '{0}'".format(parser))
+    if not isinstance(osc_file, str):
+        return iterchanges_parser(osc_file)
+    return iterchanges_path(iterchanges_parser, osc_file)
+
+def iterchanges_path(iterchanges_parser, path):
+    with compression.open_input(path) as f:
+        yield from iterchanges_parser(f)
@@ -0,0 +1,395 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 15:10:47 2026
+
+@author: rogerduong
+"""
+
+import asyncio
+import multiprocessing
+import os
+import re
+import sqlite3
+import threading
+import time
+
+CACHE_PATH = "data/postal_codes.db"
+ADDRESS_INDEX_PATH = "data/address_index.db"
+
+NEGATIVE_TTL = 7 * 24 * 3600 # Retry failed lookups after a week
+
+CREATE_CACHE = """
+CREATE TABLE IF NOT EXISTS postal_codes (
+    house_number TEXT NOT NULL,
+    street_name TEXT NOT NULL,
+    postal_code TEXT,
+    fetched_at REAL NOT NULL,
+    PRIMARY KEY (house_number, street_name)
+);
+"""
+
+CREATE_ADDRESS_INDEX = """
+CREATE TABLE addresses (
+    house_number TEXT NOT NULL,
+    street_name TEXT NOT NULL,
+    postal_code TEXT NOT NULL,
+    other_postal_codes TEXT NOT NULL,
+    PRIMARY KEY (house_number, street_name)
+) WITHOUT ROWID;
+
+CREATE TABLE source (
+    path TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    mtime REAL NOT NULL,
+    rules TEXT NOT NULL,
+    lookups INTEGER NOT NULL,
+    resolved INTEGER NOT NULL
+);
+"""
+
+whitespace = re.compile(r'\s+')
+
+def normalize_key(house_number, street_name):
+    """Return the cache key of an address: stripped, single spaced and
+    case folded house number and street name
+
+    Args:
+        house_number: string of house number
+        street_name: string of street name
+    Returns:
+        (house_number, street_name) tuple
+    """
+    return (whitespace.sub(' ', house_number).strip().casefold(),
+            whitespace.sub(' ', street_name).strip().casefold())
+
+
+class TokenBucket(object):
+    """Token bucket rate limiter
+
+    Allows bursts of capacity requests, then rate requests per second.
+
+    Args:
+        rate: tokens added per second
+        capacity: maximum number of tokens
+    """
+
+    def __init__(self, rate=0.2, capacity=1, clock=time.monotonic,
+                 sleep=time.sleep):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.clock = clock
+        self.sleep = sleep
+        self.updated = clock()
+        self.lock = threading.Lock()
+
+    def delay(self):
+        """Take a token and return the seconds to wait before using it"""
+        with self.lock:
+            now = self.clock()
+            self.tokens = min(self.capacity,
+                              self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens -= 1
+            if self.tokens >= 0:
+                return 0
+            return -self.tokens / self.rate
+
+    def acquire(self):
+        """Block until a token is available"""
+        wait = self.delay()
+        if wait > 0:
+            self.sleep(wait)
+
+
+class SharedTokenBucket(TokenBucket):
+    """Token bucket rate limiter shared by several processes
+
+    The tokens and the time of their last update are kept in shared memory,
+    so that the processes it is passed to (e.g. through the initializer of
+    a multiprocessing.Pool) take their tokens from the same bucket. The
+    clock must be shared by the processes too, as time.monotonic is.
+
+    Args:
+        rate: tokens added per second
+        capacity: maximum number of tokens
+    """
+
+    def __init__(self, rate=0.2, capacity=1, clock=time.monotonic,
+                 sleep=time.sleep):
+        self.rate = rate
+        self.capacity = capacity
+        self.clock = clock
+        self.sleep = sleep
+        self.state = multiprocessing.Array('d', [capacity, clock()])
+
+    def delay(self):
+        """Take a token and return the seconds to wait before using it"""
+        with self.state.get_lock():
+            tokens, updated = self.state[:]
+            now = self.clock()
+            tokens = min(self.capacity, tokens + (now - updated) * self.rate) - 1
+            self.state[:] = [tokens, now]
+        if tokens >= 0:
+            return 0
+        return -tokens / self.rate
+
+
+class PostalCodeCache(object):
+    """Persistent cache of postal code lookups in a sqlite3 database
+
+    Failed lookups are stored as NULL postal codes and expire after
+    negative_ttl seconds. The database is opened on first use.
+
+    Args:
+        path: path of the cache database
+        negative_ttl: seconds before a failed lookup is retried
+    """
+
+    def __init__(self, path=CACHE_PATH, negative_ttl=NEGATIVE_TTL):
+        self.path = path
+        self.negative_ttl = negative_ttl
+        self.conn = None
+
+    def connect(self):
+        if self.conn is None:
+            self.conn = sqlite3.connect(self.path, timeout=30)
+            self.conn.executescript(CREATE_CACHE)
+        return self.conn
+
+    def get(self, key):
+        """Return (found, postal_code) of a normalized key. postal_code is None
+        for a failed lookup that has not expired yet"""
+        row = self.connect().execute(
+            'SELECT postal_code, fetched_at FROM postal_codes '
+            'WHERE house_number = ? AND street_name = ?', key).fetchone()
+        if row is None:
+            return False, None
+        postal_code, fetched_at = row
+        if postal_code is None and time.time() - fetched_at > self.negative_ttl:
+            return False, None
+        return True, postal_code
+
+    def put(self, key, postal_code):
+        """Store the postal code of a normalized key, None for a failure"""
+        with self.connect() as conn:
+            conn.execute('INSERT OR REPLACE INTO postal_codes VALUES (?, ?, ?, ?)',
+                         key + (postal_code, time.time()))
+
+    def close(self):
+        if self.conn is not None:
+            self.conn.close()
+            self.conn = None
+
+
+class PostalCodeLookup(object):
+    """Cached and rate limited postal code lookup
+
+    fetcher(house_number, street_name) returns the postal code, or 'Error'
+    if the address was not found. Exceptions raised by the fetcher (network
+    errors, OSError) are not cached.
+
+    Args:
+        fetcher: function fetching the postal code of an address
+        cache: PostalCodeCache, or None to disable caching
+        limiter: TokenBucket, or None to disable rate limiting
+    """
+
+    def __init__(self, fetcher, cache=None, limiter=None):
+        self.fetcher = fetcher
+        self.cache = cache
+        self.limiter = limiter
+        self.hits = 0
+        self.fetches = 0
+
+    def __call__(self, house_number, street_name):
+        """Return the postal code of an address, or 'Error'"""
+        key = normalize_key(house_number, street_name)
+        if self.cache is not None:
+            found, postal_code = self.cache.get(key)
+            if found:
+                self.hits += 1
+                return postal_code if postal_code is not None else 'Error'
+
+        if self.limiter is not None:
+            self.limiter.acquire()
+        self.fetches += 1
+        try:
+            postal_code = self.fetcher(house_number, street_name)
+        except OSError as e:
+            print('Postal code lookup failed: {0}'.format(e))
+            return 'Error'
+
+        if self.cache is not None:
+            self.cache.put(key, postal_code if postal_code != 'Error' else None)
+        return postal_code
+
+    def resolve_many(self, addresses, concurrency=4, retries=3, backoff=1.0):
+        """Look up the postal codes of many addresses concurrently
+
+        Each distinct address is looked up once. Cached addresses are not
+        fetched; the other ones are fetched by at most concurrency asyncio
+        workers, sharing the rate limiter, and retried with exponential
+        backoff on network errors.
+
+        Args:
+            addresses: iterable of (house_number, street_name)
+            concurrency: maximum number of requests in flight
+            retries: number of retries of a failed request
+            backoff: seconds before the first retry, doubled on each retry
+        Returns:
+            dictionary of normalized key: postal code, or 'Error'
+        """
+        results = {}
+        missing = {}
+        for house_number, street_name in addresses:
+            key = normalize_key(house_number, street_name)
+            if key in results or key in missing:
+                continue
+            found, postal_code = (self.cache.get(key) if self.cache is not None
+                                  else (False, None))
+            if found:
+                self.hits += 1
+                results[key] = postal_code if postal_code is not None else 'Error'
+            else:
+                missing[key] = (house_number, street_name)
+
+        if missing:
+            fetched = asyncio.run(self._fetch_all(missing, concurrency,
+                                                  retries, backoff))
+            for key, postal_code in fetched.items():
+                if postal_code is None: # network error, not cached
+                    results[key] = 'Error'
+                    continue
+                if self.cache is not None:
+                    self.cache.put(key, postal_code if postal_code != 'Error' else None)
+                results[key] = postal_code
+        return results
+
+    async def _fetch_all(self, missing, concurrency, retries, backoff):
+        semaphore = asyncio.Semaphore(concurrency)
+        keys = list(missing)
+        postal_codes = await asyncio.gather(
+            *[self._fetch(missing[key], semaphore, retries, backoff)
+              for key in keys])
+        return dict(zip(keys, postal_codes))
+
+    async def _fetch(self, address, semaphore, retries, backoff):
+        async with semaphore:
+            for attempt in range(retries + 1):
+                if self.limiter is not None:
+                    await asyncio.sleep(self.limiter.delay())
+                self.fetches += 1
+                try:
+                    return await asyncio.to_thread(self.fetcher, *address)
+                except OSError as e:
+                    if attempt == retries:
+                        print('Postal code lookup failed: {0}'.format(e))
+                        return None
+                    await asyncio.sleep(backoff * 2 ** attempt)
+
+
+class AddressIndex(object):
+    """Postal codes of the addresses of a dataset, by normalized key
+
+    Postal codes are unique per building in Singapore, so the postal code of
+    an address can be taken from another element of the same dataset with
+    the same house number and street name, instead of being looked up on
+    the Singapore Post website. Addresses found with different postal codes
+    are kept with the other postal codes, but are not resolved.
+
+    The index is saved to a sqlite3 database with the source it was built
+    from (see source_of), and loaded again while the source is unchanged.
+
+    Attributes:
+        postal_codes: dictionary of key: first postal code of the address
+        conflicts: dictionary of key: set of the other postal codes of the
+            addresses with conflicting postal codes
+        source: dictionary of the source of the index and of its hit rate
+            on the source (lookups needed, resolved by the index)
+        hits: number of get calls resolved
+        misses: number of get calls not resolved
+    """
+
+    def __init__(self):
+        self.postal_codes = {}
+        self.conflicts = {}
+        self.source = None
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self.postal_codes)
+
+    def add(self, key, postal_code):
+        """Add the postal code of an element at a normalized key"""
+        current = self.postal_codes.setdefault(key, postal_code)
+        if current != postal_code:
+            self.conflicts.setdefault(key, set()).add(postal_code)
+
+    def resolve(self, key):
+        """Return the postal code of a normalized key, or None if it is not
+        indexed or has conflicting postal codes"""
+        if key in self.conflicts:
+            return None
+        return self.postal_codes.get(key)
+
+    def get(self, key):
+        """Return the postal code of a normalized key as resolve, counting
+        the hits and misses"""
+        postal_code = self.resolve(key)
+        if postal_code is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return postal_code
+
+    def save(self, path=ADDRESS_INDEX_PATH):
+        """Write the index and its source to a sqlite3 database"""
+        tmp_path = path + '.tmp'
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        conn = sqlite3.connect(tmp_path)
+        with conn:
+            conn.executescript(CREATE_ADDRESS_INDEX)
+            conn.executemany('INSERT INTO addresses VALUES (?, ?, ?, ?)',
+                             [key + (postal_code, ' '.join(sorted(self.conflicts.get(key, ()))))
+                              for key, postal_code in self.postal_codes.items()])
+            conn.execute('INSERT INTO source VALUES (:path, :size, :mtime, :rules, '
+                         ':lookups, :resolved)', self.source)
+        conn.close()
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path=ADDRESS_INDEX_PATH):
+        """Read an index written by save"""
+        index = cls()
+        conn = sqlite3.connect(path)
+        try:
+            for house_number, street_name, postal_code, others in conn.execute(
+                    'SELECT * FROM addresses'):
+                key = (house_number, street_name)
+                index.postal_codes[key] = postal_code
+                if others:
+                    index.conflicts[key] = set(others.split(' '))
+            columns = ['path', 'size', 'mtime', 'rules', 'lookups', 'resolved']
+            row = conn.execute('SELECT {0} FROM source'.format(', '.join(columns))).fetchone()
+            index.source = dict(zip(columns, row)) if row is not None else None
+        finally:
+            conn.close()
+        return index
+
+def source_of(osm_file, rules):
+    """Return the identity of the source of an address index
+
+    Args:
+        osm_file: OSM file the index is built from
+        rules: string identifying the normalization rules of the street
+            names, so that the index is rebuilt when they change
+    Returns:
+        dictionary of path, size, mtime and rules
+    """
+    stat = os.stat(osm_file)
+    return {'path': os.path.abspath(osm_file), 'size': stat.st_size,
+            'mtime': stat.st_mtime, 'rules': rules}
@@ -0,0 +1,308 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Mon Oct 19 00:31:44 2026
+
+@author: rogerduong
+
+Re-clean the address tags of an already loaded dataset, without parsing the
+OSM file again: after a change of transform.mapping or of the postal code
+rules, the street, postcode and housenumber tags are read from the csv
+files or the sqlite3 database into pandas DataFrames, and the rules of
+load.clean_element_dict are applied to the whole columns at once:
+
+- street names are cleaned once per distinct name, and mapped back to the
+  rows by their factorized codes
+- postal codes are padded or trimmed by vectorized string operations, and
+  the remaining ones are looked up once per distinct address (see
+  postcode.PostalCodeLookup.resolve_many)
+
+Only the changed rows are written back: updated in one transaction in the
+database, or replaced in the csv files (each file is rewritten to a
+temporary file, then renamed). The rules are applied to the stored values,
+which have already been cleaned once.
+
+As with load.py --address-index and --fuzzy-streets, the postal codes
+needing a lookup can be taken from the other elements with the same
+address, and the misspelled street names corrected against the frequent
+ones: the address index and the vocabulary are built from the stored tags
+rather than from the OSM file.
+
+Requires pandas.
+"""
+
+import audit
+import database
+import fuzzy
+import load
+import postcode
+import transform
+
+import argparse
+import collections
+import os
+import time
+
+try:
+    import numpy as np
+    import pandas as pd
+except ImportError:
+    np = pd = None
+
+ADDRESS_KEYS = ['street', 'postcode', 'housenumber']
+
+TAG_PATHS = [('node_tags', load.NODE_TAGS_PATH), ('way_tags', load.WAY_TAGS_PATH),
+             ('relation_tags', load.RELATION_TAGS_PATH)]
+
+def read_tags_csv(path):
+    """Read a tags csv file, with all its columns as strings"""
+    return pd.read_csv(path, dtype=str, keep_default_na=False, na_filter=False)
+
+def write_tags_csv(tags, path):
+    """Write a tags DataFrame as load.CsvWriter does"""
+    tmp_path = path + '.tmp'
+    tags.to_csv(tmp_path, index=False, lineterminator='\r\n')
+    return tmp_path
+
+def read_tags_db(conn, tag_type):
+    """Read the address tags of a tags table of the database"""
+    return pd.read_sql_query(
+        'SELECT id, key, value FROM {0} WHERE key IN ({1})'.format(
+            database.TABLES[tag_type], ', '.join('?' * len(ADDRESS_KEYS))),
+        conn, params=ADDRESS_KEYS)
+
+def last_values(tags, key):
+    """Return the Series of id: last value of the key tags, as
+    load.clean_element_dict keeps the last one"""
+    rows = tags[tags['key'] == key]
+    return rows.drop_duplicates('id', keep='last').set_index('id')['value']
+
+def build_street_corrector(frames):
+    """Build the corrector of the misspelled street names from the stored
+    street names, as load.build_street_corrector does from the OSM file
+
+    Args:
+        frames: list of tags DataFrames
+    Returns:
+        fuzzy.StreetNameCorrector
+
+    """
+    counts = collections.Counter()
+    for tags in frames:
+        for name, count in tags.loc[tags['key'] == 'street', 'value'].value_counts().items():
+            counts[transform.street_name_normalizer.normalize(name)] += count
+    return fuzzy.StreetNameCorrector(counts)
+
+def build_address_index(frames):
+    """Index the correct postal codes of the stored addresses, as
+    load.build_address_index does from the OSM file
+
+    Args:
+        frames: list of tags DataFrames
+    Returns:
+        postcode.AddressIndex
+
+    """
+    index = postcode.AddressIndex()
+    for tags in frames:
+        addresses = pd.concat([last_values(tags, key) for key in ADDRESS_KEYS],
+                              axis=1, join='inner', keys=ADDRESS_KEYS)
+        for street_name, postal_code, house_number in addresses.itertuples(index=False):
+            postal_code = postal_code.strip()
+            if street_name and house_number and audit.postal_code_correct.match(postal_code):
+                index.add(transform.address_key(house_number, street_name), postal_code)
+    return index
+
+def clean_street_names(values, mapping, counts=None):
+    """Clean a Series of street names, once per distinct name
+
+    The street names are corrected by transform.street_name_corrector too,
+    if it is set.
+
+    Args:
+        values: Series of street names
+        mapping: dictionary of incorrect and correct street types
+        counts: counter of the outcomes, counting the corrected street
+            names, or None
+    Returns:
+        numpy array of the cleaned street names
+
+    """
+    codes, uniques = pd.factorize(values)
+    normalizer = transform.StreetNameNormalizer(mapping, maxsize=0)
+    normalized = [normalizer.normalize(name) for name in uniques]
+    cleaned = np.array([transform.correct_street_name(name) for name in normalized],
+                       dtype=object)
+    if counts is not None:
+        corrected = cleaned != np.array(normalized, dtype=object)
+        counts['street_names_corrected'] += int(np.count_nonzero(corrected[codes]))
+    return cleaned[codes]
+
+def clean_postal_codes(codes, house_numbers, street_names, counts):
+    """Clean a Series of stripped postal codes with the rules of
+    transform.clean_postal_code: the ones needing a lookup are taken from
+    transform.address_index first, if it is set
+
+    Args:
+        codes: Series of postal codes
+        house_numbers: Series of the house numbers of their elements
+        street_names: Series of the street names of their elements
+        counts: counter of the outcomes, as transform.postal_code_changes
+    Returns:
+        Series of the cleaned postal codes
+
+    """
+    correct = codes.str.match(audit.postal_code_correct.pattern)
+    padded = ~correct & codes.str.match(transform.postal_code_incorrect_5.pattern)
+    trimmed = ~(correct | padded) & codes.str.match(transform.postal_code_incorrect_6.pattern)
+    lookup = ~(correct | padded | trimmed)
+
+    cleaned = codes.copy()
+    cleaned[padded] = '0' + codes[padded]
+    cleaned[trimmed] = codes[trimmed].str[-6:]
+    if lookup.any():
+        addresses = list(zip(house_numbers[lookup], street_names[lookup]))
+        indexed = [transform.indexed_postal_code(house_number, street_name)
+                   for house_number, street_name in addresses]
+        missing = [address for address, code in zip(addresses, indexed) if code is None]
+        results = transform.postal_code_lookup.resolve_many(missing)
+        found = [code if code is not None else
+                 results[postcode.normalize_key(house_number, street_name)]
+                 for code, (house_number, street_name) in zip(indexed, addresses)]
+        cleaned[lookup] = [code if result == 'Error' else result
+                           for result, code in zip(found, codes[lookup])]
+        counts['postal_codes_indexed'] += len(addresses) - len(missing)
+        counts['postal_codes_lookup'] += len(missing)
+        counts['postal_codes_lookup_failed'] += found.count('Error')
+    counts['postal_codes_padded'] += int(padded.sum())
+    counts['postal_codes_trimmed'] += int(trimmed.sum())
+    return cleaned
+
+def clean_address_tags(tags, mapping, counts):
+    """Return the cleaned values of the tags of a tags DataFrame
+
+    The street names are cleaned, and the postal codes of the elements with
+    a street name, a postal code and a house number, as load.clean_element_dict
+    does (with the street name before cleaning).
+
+    Args:
+        tags: DataFrame of tags, with id, key and value columns
+        mapping: dictionary of incorrect and correct street types
+        counts: counter of the cleaning outcomes
+    Returns:
+        Series of the new values, indexed as tags
+
+    """
+    values = tags['value'].astype(object)
+    new_values = values.copy()
+
+    street = (tags['key'] == 'street').to_numpy()
+    if street.any():
+        new_values.iloc[street] = clean_street_names(values[street], mapping, counts)
+
+    rows = (tags['key'] == 'postcode').to_numpy()
+    if rows.any():
+        ids = tags.loc[rows, 'id']
+        codes = ids.map(last_values(tags, 'postcode').str.strip())
+        street_names = ids.map(last_values(tags, 'street')).fillna('')
+        house_numbers = ids.map(last_values(tags, 'housenumber')).fillna('')
+        complete = ((codes != '') & (street_names != '') &
+                    (house_numbers != '')).to_numpy()
+        if complete.any():
+            new_values.iloc[np.flatnonzero(rows)[complete]] = clean_postal_codes(
+                codes[complete], house_numbers[complete], street_names[complete],
+                counts).to_numpy()
+    return new_values
+
+def reclean(backend='csv', db_path=database.DB_PATH, mapping=None,
+            address_index=False, fuzzy_streets=False):
+    """Re-clean the address tags of the loaded dataset in place
+
+    With address_index or fuzzy_streets, the address tags are read a first
+    time, to build transform.address_index (see build_address_index) or
+    transform.street_name_corrector (see build_street_corrector).
+
+    Args:
+        backend: 'csv' for the csv files of load.py, 'sqlite' for the database
+        db_path: path of the database file of the sqlite backend
+        mapping: dictionary of incorrect and correct street types (defaults
+            to transform.mapping)
+        address_index: boolean to specify if the postal codes needing a
+            lookup must be taken from the other stored addresses first
+        fuzzy_streets: boolean to specify if the misspelled street names
+            must be corrected against the stored street names
+    Returns:
+        counter of the changed tags by key, and of the cleaning outcomes
+
+    """
+    if pd is None:
+        raise ImportError('reclean requires pandas')
+    if backend not in ('csv', 'sqlite'):
+        raise ValueError("Unknown backend '{0}'".format(backend))
+    mapping = transform.mapping if mapping is None else mapping
+    counts = collections.Counter()
+    updates = {}
+    replaced = []
+    conn = database.connect(db_path) if backend == 'sqlite' else None
+    try:
+        def read_tags(tag_type, path):
+            return read_tags_csv(path) if conn is None else read_tags_db(conn, tag_type)
+
+        frames = []
+        if address_index or fuzzy_streets:
+            for tag_type, path in TAG_PATHS:
+                tags = read_tags(tag_type, path)
+                frames.append(tags[tags['key'].isin(ADDRESS_KEYS)])
+        transform.address_index = build_address_index(frames) if address_index else None
+        transform.street_name_corrector = (build_street_corrector(frames)
+                                           if fuzzy_streets else None)
+        del frames
+
+        for tag_type, path in TAG_PATHS:
+            tags = read_tags(tag_type, path)
+            new_values = clean_address_tags(tags, mapping, counts)
+            changed = (new_values != tags['value'].astype(object)).to_numpy()
+            if not changed.any():
+                continue
+            counts.update(tags.loc[changed, 'key'])
+            if conn is None:
+                tags.loc[changed, 'value'] = new_values[changed]
+                replaced.append((write_tags_csv(tags, path), path))
+            else:
+                rows = tags[changed]
+                updates[tag_type] = list(zip(new_values[changed], rows['id'].tolist(),
+                                             rows['key'], rows['value']))
+    finally:
+        if conn is not None:
+            conn.close()
+    if updates:
+        database.update_tags(db_path, updates)
+    for tmp_path, path in replaced:
+        os.replace(tmp_path, path)
+    return counts
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Re-clean the address tags of the '
+                                     'loaded dataset with the current rules of '
+                                     'transform.py, without reparsing the OSM file')
+    parser.add_argument('--backend', choices=['csv', 'sqlite'], default='csv')
+    parser.add_argument('--db', default=database.DB_PATH,
+                        help='database file of the sqlite backend')
+    parser.add_argument('--address-index', action='store_true',
+                        help='take the postal codes needing a lookup from the '
+                             'other stored elements with the same address')
+    parser.add_argument('--fuzzy-streets', action='store_true',
+                        help='correct the misspelled street names not covered by '
+                             'transform.mapping to the closest frequent stored '
+                             'street names')
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    counts = reclean(args.backend, args.db, address_index=args.address_index,
+                     fuzzy_streets=args.fuzzy_streets)
+    for key in ADDRESS_KEYS:
+        print('{0:<12} {1} tags changed'.format(key, counts[key]))
+    for outcome, count in sorted(counts.items()):
+        if outcome not in ADDRESS_KEYS:
+            print('{0:<28} {1}'.format(outcome, count))
+    print('Re-cleaned in {0:.2f} s'.format(time.perf_counter() - start))
@@ -1,19 +1,21 @@
+# Queries of the optimized database: run `python database.py` once the
+# dataset is loaded, to add the primary keys, the covering indexes and the
+# tags table (tags of nodes, ways and relations, with their element_type)
+
 SELECT tags.value, COUNT(*) as count 
-FROM (SELECT * FROM nodes_tags 
-	  UNION ALL 
-      SELECT * FROM ways_tags) tags
-WHERE tags.key='postcode'
+FROM tags
+WHERE tags.key='postcode' AND
+      tags.element_type IN ('node', 'way')
 GROUP BY tags.value
 ORDER BY count DESC;
 
 
 #Show the entries with w 5-digit postal code 
 SELECT tags.value, COUNT(*) as count 
-FROM (SELECT * FROM nodes_tags 
-	  UNION ALL 
-      SELECT * FROM ways_tags) as tags
+FROM tags
 WHERE tags.key='postcode' AND
-LENGTH(tags.value) <> 6
+      tags.element_type IN ('node', 'way') AND
+      LENGTH(tags.value) <> 6
 GROUP BY tags.value;
 
 #Results
@@ -30,9 +32,9 @@ GROUP BY tags.value;
 
 #Sort cities by count
 SELECT tags.key, tags.value, COUNT(*) as count 
-FROM (SELECT * FROM nodes_tags UNION ALL 
-      SELECT * FROM ways_tags) tags
-WHERE tags.key = 'city'
+FROM tags
+WHERE tags.key = 'city' AND
+      tags.element_type IN ('node', 'way')
 GROUP BY tags.value
 ORDER BY count DESC;
 
@@ -43,25 +45,25 @@ city,singapore,1
 
 #List all tags
 SELECT tags.key, COUNT(*) as count 
-FROM (SELECT * FROM nodes_tags UNION ALL 
-      SELECT * FROM ways_tags) tags
+FROM tags
+WHERE tags.element_type IN ('node', 'way')
 GROUP BY tags.key
 ORDER BY count DESC;
 
-SELECT *
-FROM (SELECT * FROM nodes_tags UNION ALL 
-      SELECT * FROM ways_tags) tags
-WHERE tags.key = "zu";
+SELECT tags.id, tags.key, tags.value, tags.type
+FROM tags
+WHERE tags.key = "zu" AND
+      tags.element_type IN ('node', 'way');
 
-SELECT *
-FROM (SELECT * FROM nodes_tags UNION ALL 
-      SELECT * FROM ways_tags) tags
-WHERE tags.id = "424313428";
+SELECT tags.id, tags.key, tags.value, tags.type
+FROM tags
+WHERE tags.id = "424313428" AND
+      tags.element_type IN ('node', 'way');
 
 #List top 20 tags
 SELECT tags.key, COUNT(*) as count 
-FROM (SELECT * FROM nodes_tags UNION ALL 
-      SELECT * FROM ways_tags) tags
+FROM tags
+WHERE tags.element_type IN ('node', 'way')
 GROUP BY tags.key
 ORDER BY count DESC
 LIMIT 20;
@@ -92,9 +94,9 @@ dmastin82,16963
 
 #List amenities
 SELECT tags.key, tags.value, COUNT(*) as count 
-FROM (SELECT * FROM nodes_tags UNION ALL 
-      SELECT * FROM ways_tags) tags
-WHERE tags.key = "amenity"
+FROM tags
+WHERE tags.key = "amenity" AND
+      tags.element_type IN ('node', 'way')
 GROUP BY tags.value
 ORDER BY count DESC
 LIMIT 10;
@@ -114,11 +116,9 @@ amenity,swimming_pool,230
 #Total number of restaurants
 SELECT COUNT(*) as count 
 FROM nodes_tags
-    JOIN (SELECT DISTINCT(id)
-    FROM nodes_tags
-    WHERE nodes_tags.value = "restaurant") as nt
-    ON nt.id = nodes_tags.id
-WHERE nodes_tags.key = "cuisine";
+WHERE nodes_tags.key = 'cuisine' AND
+      nodes_tags.id IN (SELECT id FROM nodes_tags
+                        WHERE value = 'restaurant');
 
 #Results
 636
@@ -126,11 +126,9 @@ WHERE nodes_tags.key = "cuisine";
 #List top 10 cuisines of restaurants
 SELECT nodes_tags.value, COUNT(*) as count 
 FROM nodes_tags
-    JOIN (SELECT DISTINCT(id)
-    FROM nodes_tags
-    WHERE nodes_tags.value = "restaurant") as nt
-    ON nt.id = nodes_tags.id
-WHERE nodes_tags.key = "cuisine"
+WHERE nodes_tags.key = 'cuisine' AND
+      nodes_tags.id IN (SELECT id FROM nodes_tags
+                        WHERE value = 'restaurant')
 GROUP BY nodes_tags.value
 ORDER BY count DESC
 LIMIT 20;
@@ -160,11 +158,9 @@ steak_house,5
 #Total number of cafe
 SELECT COUNT(*) as count 
 FROM nodes_tags
-    JOIN (SELECT DISTINCT(id)
-    FROM nodes_tags
-    WHERE nodes_tags.value = "cafe") as nt
-    ON nt.id = nodes_tags.id
-WHERE nodes_tags.key = "cuisine";
+WHERE nodes_tags.key = 'cuisine' AND
+      nodes_tags.id IN (SELECT id FROM nodes_tags
+                        WHERE value = 'cafe');
 
 #Results
 91
@@ -172,11 +168,9 @@ WHERE nodes_tags.key = "cuisine";
 #List top 20 styles of cafe
 SELECT nodes_tags.value, COUNT(*) as count 
 FROM nodes_tags
-    JOIN (SELECT DISTINCT(id)
-    FROM nodes_tags
-    WHERE nodes_tags.value = "cafe") as nt
-    ON nt.id = nodes_tags.id
-WHERE nodes_tags.key = "cuisine"
+WHERE nodes_tags.key = 'cuisine' AND
+      nodes_tags.id IN (SELECT id FROM nodes_tags
+                        WHERE value = 'cafe')
 GROUP BY nodes_tags.value
 ORDER BY count DESC
 LIMIT 20;
@@ -205,11 +199,9 @@ coffee_shop;coffee,1
 #Total number of fast-foods
 SELECT COUNT(*) as count 
 FROM nodes_tags
-    JOIN (SELECT DISTINCT(id)
-    FROM nodes_tags
-    WHERE nodes_tags.value = "fast_food") as nt
-    ON nt.id = nodes_tags.id
-WHERE nodes_tags.key = "cuisine";
+WHERE nodes_tags.key = 'cuisine' AND
+      nodes_tags.id IN (SELECT id FROM nodes_tags
+                        WHERE value = 'fast_food');
 
 #Results
 153
@@ -217,11 +209,9 @@ WHERE nodes_tags.key = "cuisine";
 #List top 20 styles of fast-foods
 SELECT nodes_tags.value, COUNT(*) as count 
 FROM nodes_tags
-    JOIN (SELECT DISTINCT(id)
-    FROM nodes_tags
-    WHERE nodes_tags.value = "fast_food") as nt
-    ON nt.id = nodes_tags.id
-WHERE nodes_tags.key = "cuisine"
+WHERE nodes_tags.key = 'cuisine' AND
+      nodes_tags.id IN (SELECT id FROM nodes_tags
+                        WHERE value = 'fast_food')
 GROUP BY nodes_tags.value
 ORDER BY count DESC
 LIMIT 20;
@@ -251,9 +241,9 @@ fish;burger;breakfast;ice_cream;tea;cake;coffee_shop;american;chicken,1
 
 #List top 10 sports
 SELECT tags.value, COUNT(*) as count 
-FROM (SELECT * FROM nodes_tags UNION ALL 
-      SELECT * FROM ways_tags) tags
-WHERE tags.key = "sport"
+FROM tags
+WHERE tags.key = "sport" AND
+      tags.element_type IN ('node', 'way')
 GROUP BY tags.value
 ORDER BY count DESC
 LIMIT 10;
@@ -272,9 +262,9 @@ yoga,7
 
 #List top 10 leisure
 SELECT tags.value, COUNT(*) as count 
-FROM (SELECT * FROM nodes_tags UNION ALL 
-      SELECT * FROM ways_tags) tags
-WHERE tags.key = "leisure"
+FROM tags
+WHERE tags.key = "leisure" AND
+      tags.element_type IN ('node', 'way')
 GROUP BY tags.value
 ORDER BY count DESC
 LIMIT 10;
@@ -293,10 +283,10 @@ recreation_ground,23
 
 #List the places of worship
 SELECT nodes_tags.value, COUNT(*) as num
-FROM nodes_tags 
-    JOIN (SELECT DISTINCT(id) FROM nodes_tags WHERE value='place_of_worship') i
-    ON nodes_tags.id=i.id
-WHERE nodes_tags.key='religion'
+FROM nodes_tags
+WHERE nodes_tags.key = 'religion' AND
+      nodes_tags.id IN (SELECT id FROM nodes_tags
+                        WHERE value = 'place_of_worship')
 GROUP BY nodes_tags.value
 ORDER BY num DESC
 LIMIT 10;
\ No newline at end of file
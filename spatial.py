@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 19:02:44 2026
+
+@author: rogerduong
+
+Spatial queries on the sqlite3 database loaded by load.py, using the
+nodes_rtree and ways_rtree R*Tree indexes built by database.SqliteWriter.
+
+The R*Tree stores the coordinates as 32-bit floats, rounded outwards, so it
+is only used to select the candidates: the exact coordinates are checked
+against the nodes table.
+"""
+
+import database
+
+import argparse
+import heapq
+import math
+import sqlite3
+
+EARTH_RADIUS = 6371008.8 # mean Earth radius, in meters
+
+# Metres per degree of latitude
+METERS_PER_DEGREE = math.pi * EARTH_RADIUS / 180
+
+ELEMENT_TABLES = {'node': ('nodes_rtree', 'nodes_tags'),
+                  'way': ('ways_rtree', 'ways_tags')}
+
+def haversine(lat1, lon1, lat2, lon2):
+    """Return the great circle distance between two points, in meters"""
+    lat1, lon1, lat2, lon2 = map(math.radians, (lat1, lon1, lat2, lon2))
+    a = (math.sin((lat2 - lat1) / 2) ** 2 +
+         math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2)
+    return 2 * EARTH_RADIUS * math.asin(min(1, math.sqrt(a)))
+
+def radius_bbox(lat, lon, meters):
+    """Return the (min_lat, min_lon, max_lat, max_lon) box containing the
+    circle of a radius around a point"""
+    dlat = meters / METERS_PER_DEGREE
+    dlon = meters / (METERS_PER_DEGREE * max(math.cos(math.radians(lat)), 1e-6))
+    return (lat - dlat, max(lon - dlon, -180.0), lat + dlat, min(lon + dlon, 180.0))
+
+def parse_tag(tag):
+    """Return the (type, key, value) filter of a tag string
+
+    'amenity=restaurant' matches the amenity key with the restaurant value,
+    'addr:street' any value of the street key of type addr. value is None if
+    there is no '='; type is 'regular' if the key has no ':'.
+
+    Args:
+        tag: tag string
+    Returns:
+        (type, key, value) tuple
+    """
+    key, _, value = tag.partition('=')
+    tag_type, _, key = key.rpartition(':')
+    return tag_type or 'regular', key, value or None
+
+def tag_filter(tag, element_type, alias):
+    """Return the SQL condition and parameters restricting the elements to the
+    ones having a tag"""
+    if tag is None:
+        return '', []
+    tag_type, key, value = parse_tag(tag)
+    sql = ' AND {0}.id IN (SELECT id FROM {1} WHERE type = ? AND key = ?'.format(
+        alias, ELEMENT_TABLES[element_type][1])
+    params = [tag_type, key]
+    if value is not None:
+        sql += ' AND value = ?'
+        params.append(value)
+    return sql + ')', params
+
+def bbox(conn, min_lat, min_lon, max_lat, max_lon, tag=None, element_type='node'):
+    """Return the elements within a bounding box
+
+    Nodes are returned if they are inside the box, ways if their bounding
+    box intersects it.
+
+    Args:
+        conn: sqlite3 connection
+        min_lat, min_lon, max_lat, max_lon: bounding box
+        tag: optional tag filter, see parse_tag
+        element_type: 'node' or 'way'
+    Returns:
+        list of (id, lat, lon); lat and lon are the center of the bounding box
+        of a way
+    """
+    rtree = ELEMENT_TABLES[element_type][0]
+    where, params = tag_filter(tag, element_type, 'r')
+    if element_type == 'node':
+        sql = ('SELECT n.id, n.lat, n.lon FROM nodes_rtree r '
+               'JOIN nodes n ON n.id = r.id '
+               'WHERE r.min_lat <= ? AND r.max_lat >= ? '
+               'AND r.min_lon <= ? AND r.max_lon >= ? '
+               'AND n.lat BETWEEN ? AND ? AND n.lon BETWEEN ? AND ?')
+        params = [max_lat, min_lat, max_lon, min_lon,
+                  min_lat, max_lat, min_lon, max_lon] + params
+    else:
+        sql = ('SELECT r.id, (r.min_lat + r.max_lat) / 2, (r.min_lon + r.max_lon) / 2 '
+               'FROM {0} r WHERE r.min_lat <= ? AND r.max_lat >= ? '
+               'AND r.min_lon <= ? AND r.max_lon >= ?'.format(rtree))
+        params = [max_lat, min_lat, max_lon, min_lon] + params
+    return conn.execute(sql + where, params).fetchall()
+
+def radius(conn, lat, lon, meters, tag=None):
+    """Return the nodes within a distance of a point, nearest first
+
+    Args:
+        conn: sqlite3 connection
+        lat, lon: coordinates of the point
+        meters: distance, in meters
+        tag: optional tag filter, see parse_tag
+    Returns:
+        list of (distance, id, lat, lon)
+    """
+    results = []
+    for node_id, node_lat, node_lon in bbox(conn, *radius_bbox(lat, lon, meters),
+                                            tag=tag):
+        distance = haversine(lat, lon, node_lat, node_lon)
+        if distance <= meters:
+            results.append((distance, node_id, node_lat, node_lon))
+    results.sort()
+    return results
+
+def nearest(conn, lat, lon, k=1, tag=None, meters=100, max_meters=EARTH_RADIUS * math.pi):
+    """Return the k nearest nodes of a point
+
+    The search radius starts at meters and is doubled until k nodes are
+    found, or max_meters is reached.
+
+    Args:
+        conn: sqlite3 connection
+        lat, lon: coordinates of the point
+        k: number of nodes
+        tag: optional tag filter, see parse_tag
+        meters: initial search radius, in meters
+        max_meters: maximum search radius, in meters
+    Returns:
+        list of (distance, id, lat, lon), nearest first
+    """
+    while True:
+        results = radius(conn, lat, lon, meters, tag)
+        if len(results) >= k or meters >= max_meters:
+            return heapq.nsmallest(k, results)
+        meters *= 2
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--db', default=database.DB_PATH)
+    parser.add_argument('--tag', help="tag filter, e.g. amenity=restaurant")
+    subparsers = parser.add_subparsers(dest='query', required=True)
+    p = subparsers.add_parser('bbox')
+    p.add_argument('coords', type=float, nargs=4,
+                   metavar=('MIN_LAT', 'MIN_LON', 'MAX_LAT', 'MAX_LON'))
+    p.add_argument('--ways', action='store_true')
+    p = subparsers.add_parser('radius')
+    p.add_argument('coords', type=float, nargs=2, metavar=('LAT', 'LON'))
+    p.add_argument('meters', type=float)
+    p = subparsers.add_parser('nearest')
+    p.add_argument('coords', type=float, nargs=2, metavar=('LAT', 'LON'))
+    p.add_argument('-k', type=int, default=5)
+    args = parser.parse_args()
+
+    conn = sqlite3.connect(args.db)
+    if args.query == 'bbox':
+        rows = bbox(conn, *args.coords, tag=args.tag,
+                    element_type='way' if args.ways else 'node')
+    elif args.query == 'radius':
+        rows = radius(conn, *args.coords, args.meters, tag=args.tag)
+    else:
+        rows = nearest(conn, *args.coords, k=args.k, tag=args.tag)
+    for row in rows:
+        print(*row, sep='\t')
+    conn.close()
@@ -4,35 +4,394 @@
 Created on Sun Sep 10 18:34:19 2017
 
 @author: rogerduong
+
+Take a sample of an OSM file, streaming with constant memory:
+
+- ratio: keep each element with a probability
+- reservoir: keep a fixed number of elements
+- stratified: keep each element with a probability per element type
+- bbox: keep the nodes in a bounding box, and the ways and relations using them
+
+The sample is closed over way nodes: the nodes of the sampled ways are kept
+too, so that the ways are complete. The elements are copied as they are in
+the input, without being parsed as XML.
 """
 
-from lxml import etree  # Use cElementTree or lxml if too slow
+import load
+import compression
+
+import argparse
+import os
+import random
+import re
+import time
 
 OSM_FILE = "data/osm/singapore.osm"  # Replace this with your osm file
 SAMPLE_FILE = "data/osm/singapore-short.osm"
 
-k = 10 # Parameter: take every k-th top level element
+RATIO = 0.1 # Parameter: keep 1 top level element out of 10
+
+BLOCK_SIZE = 1 << 20
+
+TYPES = ('node', 'way', 'relation')
+
+TOP_LEVEL_ELEMENT = re.compile(rb'<(node|way|relation)[\s/>]')
+ELEMENT_ID = re.compile(rb'\sid="(-?\d+)"')
+LAT = re.compile(rb'\slat="([^"]+)"')
+LON = re.compile(rb'\slon="([^"]+)"')
+ND_REF = re.compile(rb'<nd\s[^>]*ref="(-?\d+)"')
+MEMBER = re.compile(rb'<member\s[^>]*>')
+MEMBER_TYPE = re.compile(rb'\stype="(\w+)"')
+MEMBER_REF = re.compile(rb'\sref="(-?\d+)"')
+
+MASK = (1 << 64) - 1
+
+
+class IdBitmap(object):
+    """Set of element ids stored as a bitmap, in pages of 4096 ids (512
+    bytes) allocated on first use, i.e. about 1 bit per id in the ranges
+    used"""
+
+    PAGE_BITS = 12
+
+    def __init__(self):
+        self.pages = {}
+        self.count = 0
+
+    def add(self, element_id):
+        page = self.pages.get(element_id >> self.PAGE_BITS)
+        if page is None:
+            page = self.pages[element_id >> self.PAGE_BITS] = bytearray(
+                1 << (self.PAGE_BITS - 3))
+        offset = element_id & ((1 << self.PAGE_BITS) - 1)
+        bit = 1 << (offset & 7)
+        if not page[offset >> 3] & bit:
+            page[offset >> 3] |= bit
+            self.count += 1
+
+    def __contains__(self, element_id):
+        page = self.pages.get(element_id >> self.PAGE_BITS)
+        if page is None:
+            return False
+        offset = element_id & ((1 << self.PAGE_BITS) - 1)
+        return bool(page[offset >> 3] & (1 << (offset & 7)))
+
+    def __len__(self):
+        return self.count
+
+    def nbytes(self):
+        return len(self.pages) << (self.PAGE_BITS - 3)
+
+def uniform(element_type, element_id, seed=0):
+    """Return a pseudo random number in [0, 1) for an element, always the
+    same for the same element and seed (splitmix64 hash)"""
+    x = (element_id * 3 + TYPES.index(element_type) +
+         seed * 0x9E3779B97F4A7C15) & MASK
+    x = ((x ^ (x >> 30)) * 0xBF58476D1CE4E5B9) & MASK
+    x = ((x ^ (x >> 27)) * 0x94D049BB133111EB) & MASK
+    return (x ^ (x >> 31)) / 2**64
+
+def element_id(data):
+    return int(ELEMENT_ID.search(data).group(1))
+
+def node_refs(data):
+    """Return the node ids of a way"""
+    return [int(ref) for ref in ND_REF.findall(data)]
+
+def members(data):
+    """Return the (type, id) of the members of a relation"""
+    result = []
+    for member in MEMBER.findall(data):
+        member_type = MEMBER_TYPE.search(member)
+        ref = MEMBER_REF.search(member)
+        if member_type and ref:
+            result.append((member_type.group(1).decode(), int(ref.group(1))))
+    return result
+
+def iter_elements(osm_file, start, end, block_size=BLOCK_SIZE):
+    """Yield (type, bytes) of the top level elements of a byte range, or of
+    a whole stream
+
+    The bytes of an element run up to the start of the next one, so that
+    writing them all back gives the range unchanged. The bytes of a whole
+    stream before the first element and after the last one are yielded with
+    the type None.
+
+    Args:
+        osm_file: opened (binary) OSM file, or stream if end is None
+        start: offset of the first top level element, or None for a stream
+        end: offset after the last top level element, or None to read the
+            stream to its end, without seeking
+        block_size: size of the blocks read
+    Returns:
+        (type, bytes) tuples
+
+    """
+    if end is None:
+        remaining = float('inf')
+    else:
+        osm_file.seek(start)
+        remaining = end - start
+    buffer = b''
+    scan = 0
+    tag = None
+    while True:
+        block = osm_file.read(min(block_size, remaining)) if remaining > 0 else b''
+        remaining -= len(block)
+        buffer += block
+        current = 0
+        for m in TOP_LEVEL_ELEMENT.finditer(buffer, scan):
+            if tag is not None or m.start() > 0:
+                yield tag, buffer[current:m.start()]
+            current = m.start()
+            tag = m.group(1).decode()
+        buffer = buffer[current:]
+        if not block:
+            trailer = b''
+            if end is None:
+                osm_end = buffer.rfind(load.OSM_END)
+                if osm_end >= 0:
+                    buffer, trailer = buffer[:osm_end], buffer[osm_end:]
+            if buffer:
+                yield tag, buffer
+            if trailer:
+                yield None, trailer
+            return
+        # An element start cut by the end of the block is found next time
+        scan = max(1, len(buffer) - 16)
+
+def top_level_elements(osm_file, start, end):
+    """Yield the (type, bytes) of iter_elements, without the bytes before
+    and after the elements of a stream"""
+    return ((element_type, data) for element_type, data in
+            iter_elements(osm_file, start, end) if element_type is not None)
 
-def get_element(osm_file, tags=('node', 'way', 'relation')):
-    """Yield element if it is the right type of tag
+def bytes_read(osm_file, start, end):
+    """Return the bytes read by a pass over a byte range, or over a stream
+    (in the compressed file, see compression.open_input)"""
+    return osm_file.tell() if end is None else end - start
+
+def find_first(osm_file, element_type, start, end):
+    """Return the offset of the first element of a type, or of the first
+    element after them, by binary search (OSM files list the nodes, then
+    the ways, then the relations)
+
+    Args:
+        osm_file: opened (binary) OSM file
+        element_type: 'way' or 'relation'
+        start: offset of the first top level element
+        end: offset after the last top level element
+    Returns:
+        byte offset
+
+    """
+    rank = TYPES.index(element_type)
+    lo, hi = start, end
+    while lo < hi:
+        mid = (lo + hi) // 2
+        offset = load.next_element_offset(osm_file, mid)
+        if offset is None or offset >= end:
+            hi = mid
+            continue
+        osm_file.seek(offset)
+        tag = TOP_LEVEL_ELEMENT.match(osm_file.read(16)).group(1).decode()
+        if TYPES.index(tag) < rank:
+            lo = offset + 1
+        else:
+            hi = mid
+    offset = load.next_element_offset(osm_file, lo)
+    return end if offset is None or offset > end else offset
+
+
+class Sample(object):
+    """Selection of the elements of a sample
+
+    Elements are selected either by a ratio per type (ratios, without
+    storing anything) or by id (ids, IdBitmap per type). needed holds the
+    nodes of the selected ways.
+    """
+
+    def __init__(self, ratios=None, seed=0):
+        self.ratios = ratios
+        self.seed = seed
+        self.ids = {element_type: IdBitmap() for element_type in TYPES}
+        self.needed = IdBitmap()
+
+    def selected(self, element_type, element_id):
+        if self.ratios is not None:
+            return uniform(element_type, element_id, self.seed) < self.ratios[element_type]
+        return element_id in self.ids[element_type]
+
+    def kept(self, element_type, element_id):
+        return (self.selected(element_type, element_id) or
+                (element_type == 'node' and element_id in self.needed))
+
+    def nbytes(self):
+        return (self.needed.nbytes() +
+                sum(bitmap.nbytes() for bitmap in self.ids.values()))
+
+def select_ratios(f, start, end, sample, closure):
+    """First pass of the ratio and stratified modes: mark the nodes of the
+    selected ways, reading from the first way only (unless f is a stream)"""
+    if not closure:
+        return 0
+    if end is not None:
+        start = find_first(f, 'way', start, end)
+        end = find_first(f, 'relation', start, end)
+    for element_type, data in top_level_elements(f, start, end):
+        if element_type == 'way' and sample.selected('way', element_id(data)):
+            for ref in node_refs(data):
+                sample.needed.add(ref)
+    return bytes_read(f, start, end)
+
+def select_reservoir(f, start, end, sample, count, seed, closure):
+    """First pass of the reservoir mode: keep count elements, uniformly
+    (algorithm R), with the node ids of the ways"""
+    rng = random.Random(seed)
+    reservoir = []
+    for i, (element_type, data) in enumerate(top_level_elements(f, start, end)):
+        j = i if i < count else rng.randrange(i + 1)
+        if j < count:
+            refs = node_refs(data) if element_type == 'way' and closure else ()
+            item = (element_type, element_id(data), refs)
+            if i < count:
+                reservoir.append(item)
+            else:
+                reservoir[j] = item
+    for element_type, selected_id, refs in reservoir:
+        sample.ids[element_type].add(selected_id)
+        for ref in refs:
+            sample.needed.add(ref)
+    return bytes_read(f, start, end)
+
+def select_bbox(f, start, end, sample, bbox, closure):
+    """First pass of the bbox mode: keep the nodes in the box, the ways with
+    a node in the box, and the relations with a kept member"""
+    min_lat, min_lon, max_lat, max_lon = bbox
+    for element_type, data in top_level_elements(f, start, end):
+        if element_type == 'node':
+            lat = float(LAT.search(data).group(1))
+            lon = float(LON.search(data).group(1))
+            if min_lat <= lat <= max_lat and min_lon <= lon <= max_lon:
+                sample.ids['node'].add(element_id(data))
+        elif element_type == 'way':
+            refs = node_refs(data)
+            if any(ref in sample.ids['node'] for ref in refs):
+                sample.ids['way'].add(element_id(data))
+                if closure:
+                    for ref in refs:
+                        sample.needed.add(ref)
+        else:
+            if any(member_type in sample.ids and ref in sample.ids[member_type]
+                   for member_type, ref in members(data)):
+                sample.ids['relation'].add(element_id(data))
+    return bytes_read(f, start, end)
+
+def take_sample(osm_file=OSM_FILE, sample_file=SAMPLE_FILE, ratio=RATIO,
+                count=None, ratios=None, bbox=None, seed=0, closure=True):
+    """Write a sample of an OSM file
+
+    The mode is given by the argument set: count (reservoir), ratios
+    (stratified), bbox, or ratio otherwise.
+
+    Compressed files (.osm.bz2, .osm.gz) are decompressed while streaming.
+    They cannot be seeked, so both passes read the whole file.
+
+    Args:
+        osm_file: input OSM file, possibly compressed
+        sample_file: output OSM file
+        ratio: probability of keeping an element
+        count: number of elements to keep
+        ratios: dictionary of element type: probability of keeping it
+        bbox: (min_lat, min_lon, max_lat, max_lon) bounding box
+        seed: random seed
+        closure: boolean to specify if the nodes of the sampled ways must be
+            kept too
+    Returns:
+        dictionary of statistics: elements kept per type, bytes read,
+        seconds, bitmap bytes
 
-    Reference:
-    http://stackoverflow.com/questions/3095434/inserting-newlines-in-xml-file-generated-via-xml-etree-elementtree-in-python
     """
-    context = iter(etree.iterparse(osm_file, events=('start', 'end')))
-    _, root = next(context)
-    for event, elem in context:
-        if event == 'end' and elem.tag in tags:
-            yield elem
-            root.clear()
-            
-with open(SAMPLE_FILE, 'wb') as output:
-    output.write(b'<?xml version="1.0" encoding="UTF-8"?>\n')
-    output.write(b'<osm>\n  ')
-
-    # Write every kth top level element
-    for i, element in enumerate(get_element(OSM_FILE)):
-        if i % k == 0:
-            output.write(etree.tostring(element, encoding='utf-8'))
-
-    output.write(b'</osm>')
\ No newline at end of file
+    start_time = time.perf_counter()
+    if compression.is_compressed(osm_file):
+        start = end = None
+    else:
+        (start, end), = load.find_shards(osm_file, 1)
+    if ratios is None and count is None and bbox is None:
+        ratios = dict.fromkeys(TYPES, ratio)
+    sample = Sample(ratios, seed)
+
+    with compression.open_input(osm_file) as f:
+        if count is not None:
+            read = select_reservoir(f, start, end, sample, count, seed, closure)
+        elif bbox is not None:
+            read = select_bbox(f, start, end, sample, bbox, closure)
+        else:
+            read = select_ratios(f, start, end, sample, closure)
+
+    stats = dict.fromkeys(TYPES, 0)
+    with compression.open_input(osm_file) as f, open(sample_file, 'wb') as output:
+        if end is None:
+            # The header and trailer have the type None
+            for element_type, data in iter_elements(f, None, None):
+                if element_type is None:
+                    output.write(data)
+                elif sample.kept(element_type, element_id(data)):
+                    output.write(data)
+                    stats[element_type] += 1
+            read += f.tell()
+        else:
+            header = f.read(start)
+            output.write(header)
+            for element_type, data in iter_elements(f, start, end):
+                if sample.kept(element_type, element_id(data)):
+                    output.write(data)
+                    stats[element_type] += 1
+            f.seek(end)
+            output.write(f.read())
+            read += os.path.getsize(osm_file)
+
+    stats['bytes'] = read
+    stats['seconds'] = time.perf_counter() - start_time
+    stats['bitmap_bytes'] = sample.nbytes()
+    return stats
+
+def parse_ratios(text):
+    """Parse the ratios of the stratified mode: node=0.01,way=0.1,relation=1"""
+    ratios = dict.fromkeys(TYPES, 0.0)
+    for item in text.split(','):
+        element_type, _, value = item.partition('=')
+        if element_type not in ratios:
+            raise argparse.ArgumentTypeError('Unknown element type ' + element_type)
+        ratios[element_type] = float(value)
+    return ratios
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('osm_file', nargs='?', default=OSM_FILE)
+    parser.add_argument('sample_file', nargs='?', default=SAMPLE_FILE)
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument('--ratio', type=float, default=RATIO,
+                      help='probability of keeping an element')
+    mode.add_argument('--count', type=int,
+                      help='number of elements to keep (reservoir sampling)')
+    mode.add_argument('--stratified', type=parse_ratios, metavar='RATIOS',
+                      help='probability per type, e.g. node=0.01,way=0.1,relation=1')
+    mode.add_argument('--bbox', type=float, nargs=4,
+                      metavar=('MIN_LAT', 'MIN_LON', 'MAX_LAT', 'MAX_LON'))
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--no-closure', action='store_true',
+                        help='do not add the nodes of the sampled ways')
+    args = parser.parse_args()
+
+    stats = take_sample(args.osm_file, args.sample_file, ratio=args.ratio,
+                        count=args.count, ratios=args.stratified, bbox=args.bbox,
+                        seed=args.seed, closure=not args.no_closure)
+    megabytes = stats['bytes'] / 10**6
+    print('{0} nodes, {1} ways, {2} relations written to {3}'.format(
+        stats['node'], stats['way'], stats['relation'], args.sample_file))
+    print('{0:.2f} MB read in {1:.2f} s ({2:.2f} MB/s), {3:.2f} MB of bitmaps'.format(
+        megabytes, stats['seconds'], megabytes / stats['seconds'],
+        stats['bitmap_bytes'] / 10**6))
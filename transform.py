@@ -6,11 +6,13 @@ Created on Sun Sep 10 12:26:51 2017
 @author: rogerduong
 """
 import audit
+import postcode
 
+import collections
+import functools
 import re
 from bs4 import BeautifulSoup
 import requests
-import time
 
 mapping = {
     'Lor' : 'Lorong',
@@ -42,46 +44,103 @@ postal_code_html_page = 'http://www.singpost.com/find-postal-code'
 postal_code_incorrect_5 = re.compile(r'[0-9]{5}$')
 postal_code_incorrect_6 = re.compile(r'[0-9]{6}$')
 
+class StreetNameNormalizer(object):
+    """Clean street names, by replacing the street types found in mapping
+    
+    The street types of mapping are compiled into a single regular expression,
+    and the cleaned names are memoized in an LRU cache keyed by the raw street
+    name, as the same street names are repeated across many elements.
+    
+    The street type is the last word of the street name, or the word before
+    the street number, like 'Avenue' in 'Ang Mo Kio Avenue 3'.
+    
+    Args:
+        mapping: dictionary of incorrect and correct street types
+        maxsize: maximum number of street names in the cache
+    Attributes:
+        changes: counter of (street_name, new_street_name) changes
+    """
+
+    def __init__(self, mapping, maxsize=65536):
+        self.mapping = mapping
+        types = sorted((re.escape(k) for k in mapping if re.match(r'^[A-Za-z]+$', k)),
+                       key=len, reverse=True)
+        alternatives = '|'.join(types) or '(?!)'
+        self.matcher = re.compile(
+            r'(?<![A-Za-z])(?P<end>{0})$|(?:^| )(?P<num>{0}) [^ ]*[0-9]$'.format(alternatives))
+        self.changes = collections.Counter()
+        self.normalize = functools.lru_cache(maxsize=maxsize)(self._normalize)
+
+    def __call__(self, street_name):
+        new_street_name = self.normalize(street_name)
+        if new_street_name != street_name:
+            self.changes[(street_name, new_street_name)] += 1
+        return new_street_name
+
+    def _normalize(self, street_name):
+        if audit.lower.match(street_name):
+            street_name = street_name.title()
+        elif audit.lower_colon.match(street_name):
+            street_name = audit.lower_colon.sub(' ', street_name)
+        elif audit.problemchars.match(street_name):
+            street_name = audit.problemchars.sub(' ', street_name)
+
+        m = self.matcher.search(street_name)
+        if m is None:
+            return street_name
+        group = 'end' if m.group('end') is not None else 'num'
+        start, end = m.span(group)
+        return street_name[:start] + self.mapping[m.group(group)] + street_name[end:]
+
+    def cache_info(self):
+        return self.normalize.cache_info()
+
+street_name_normalizer = StreetNameNormalizer(mapping)
+
 def clean_street_name(street_name, mapping):
     """Clean street name, by replacing dictionary strings found
     in street_name in mapping
     
+    Changes are counted in street_name_normalizer.changes.
+    
     Args:
         street_name: string of street name
         mapping: dictionary of incorrect and correct street types
     Returns:
-        new_street_name: cleaned street name
+        new_street_name: cleaned street name, or street_name if its street
+            type is not in mapping
     
     """
+    if mapping is street_name_normalizer.mapping:
+        return street_name_normalizer(street_name)
+    return StreetNameNormalizer(mapping, maxsize=0)(street_name)
+
+# Corrector of the misspelled street names not covered by mapping, against
+# the street names of the dataset (see load.build_street_corrector), or None
+street_name_corrector = None
+
+def correct_street_name(street_name):
+    """Correct a misspelled street name with street_name_corrector
     
-    if audit.lower.match(street_name):
-        street_name = street_name.title()
-    elif audit.lower_colon.match(street_name):
-        street_name = re.sub(audit.lower_colon, ' ', street_name)
-    elif audit.problemchars.match(street_name):
-        street_name = re.sub(audit.problemchars, ' ', street_name)
-    
-    m_end = audit.street_type_end.search(street_name)
-    m_num = audit.street_type_num.search(street_name)
-    street_type = ''
-    if m_end:
-        street_type = m_end.group()
-    elif m_num:
-        if len(re.split(' ', street_name)) >=2:
-            street_type = re.split(' ', street_name)[-2]
-        else:
-            street_type = re.split(' ', street_name)[-1]
-        
-    if street_type in mapping.keys():
-        new_street_name = street_name.replace(street_type, mapping[street_type])
-        print(street_name+ ' --> ' + new_street_name)
-        return(new_street_name)
+    Corrections are counted in street_name_corrector.changes.
+    
+    Args:
+        street_name: string of street name, cleaned with clean_street_name
+    Returns:
+        corrected street name, or street_name if street_name_corrector is
+            None or has no correction
+    
+    """
+    if street_name_corrector is None:
+        return street_name
+    return street_name_corrector(street_name)
 
 def get_postal_code(html_page, house_number, street_name):
     """Get Postal Code from web page of Singapore Post
     
     This function performs a post request on the specified url and then scrapes
-    the results page.
+    the results page. Requests are not delayed here, use postal_code_lookup
+    which caches the results and rate limits the requests.
     
     Args:
         html_page: url of singpost postal code search page
@@ -91,8 +150,6 @@ def get_postal_code(html_page, house_number, street_name):
         postal_code: string of correct postal code returned by web request
     """
     
-    time.sleep(5) #Delay start of scraping for 5 seconds
-    
     headers = {'user-agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_12_5) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/60.0.3112.113 Safari/537.36'}
     data = {'building': house_number,
             'street_name': street_name}
@@ -104,6 +161,7 @@ def get_postal_code(html_page, house_number, street_name):
     
     result = soup.find(id = 'datatable-1')
     
+    postal_code = 'Error'
     if result is not None: #scrape through the result page to datatable-1
         for val in result.findAll('p'):
             if len(val.text) == 6:
@@ -112,6 +170,85 @@ def get_postal_code(html_page, house_number, street_name):
     else:
         return('Error')
 
+# Lookups are cached in data/postal_codes.db, and limited to one request
+# every 5 seconds to avoid being blocked by the Singapore Post website (the
+# workers of load.process_map share a postcode.SharedTokenBucket)
+postal_code_lookup = postcode.PostalCodeLookup(
+    functools.partial(get_postal_code, postal_code_html_page),
+    cache=postcode.PostalCodeCache(),
+    limiter=postcode.TokenBucket(rate=0.2, capacity=1))
+
+# Outcomes of clean_postal_code: 'padded' (leading zero restored), 'trimmed'
+# (6 last digits kept), 'indexed' (found in address_index), 'lookup' and
+# 'lookup_failed' (Singapore Post lookups)
+postal_code_changes = collections.Counter()
+
+# Postal codes of the other addresses of the dataset, consulted before the
+# Singapore Post lookups (see load.build_address_index), or None
+address_index = None
+
+def cleaning_counts():
+    """Return the cumulative counts of the cleaning outcomes
+    
+    Returns:
+        dictionary of outcome: count, to be compared between two calls
+    
+    """
+    counts = {'street_names_fixed': sum(street_name_normalizer.changes.values()),
+              'street_names_corrected': (sum(street_name_corrector.changes.values())
+                                         if street_name_corrector is not None else 0),
+              'postal_code_cache_hits': postal_code_lookup.hits,
+              'postal_code_fetches': postal_code_lookup.fetches}
+    for outcome in ('padded', 'trimmed', 'indexed', 'lookup', 'lookup_failed'):
+        counts['postal_codes_' + outcome] = postal_code_changes[outcome]
+    return counts
+
+def address_key(house_number, street_name):
+    """Return the key of an address in address_index: the street name is
+    cleaned first, so that 'Orchard Rd' and 'Orchard Road' have the same key
+    
+    Args:
+        house_number: string of house number
+        street_name: string of street name
+    Returns:
+        normalized (house_number, street_name) tuple
+    
+    """
+    return postcode.normalize_key(house_number,
+                                  street_name_normalizer.normalize(street_name))
+
+def indexed_postal_code(house_number, street_name):
+    """Return the postal code of an address from address_index
+    
+    Args:
+        house_number: string of house number
+        street_name: string of street name
+    Returns:
+        postal_code: string of postal code, or None if there is no index,
+            or if the address is not in it or has conflicting postal codes
+    
+    """
+    if address_index is None:
+        return None
+    postal_code = address_index.get(address_key(house_number, street_name))
+    if postal_code is not None:
+        postal_code_changes['indexed'] += 1
+    return postal_code
+
+def needs_postal_code_lookup(postal_code):
+    """Return True if the postal code can only be cleaned by querying the
+    Singapore Post website
+    
+    Args:
+        postal_code: string of postal code to clean
+    Returns:
+        boolean
+    
+    """
+    return not (audit.postal_code_correct.match(postal_code)
+                or postal_code_incorrect_5.match(postal_code)
+                or postal_code_incorrect_6.match(postal_code))
+
 def clean_postal_code(old_postal_code, house_number, street_name):
     """Clean postal code, by replacing old_postal_code with new name retrieved
     from Singapore Post
@@ -136,17 +273,27 @@ def clean_postal_code(old_postal_code, house_number, street_name):
     elif postal_code_incorrect_5.match(old_postal_code):
         #to account for leading zeros being removed
         new_postal_code = '0' + old_postal_code
+        postal_code_changes['padded'] += 1
     elif postal_code_incorrect_6.match(old_postal_code):
         #to account for postal codes like 'Singapore 123456'
         new_postal_code = old_postal_code[-6:]
-    else: #get the postal code by querying the Singapore Post website
-        get_result = get_postal_code(postal_code_html_page, house_number, street_name)
-        if get_result != 'Error':
-            new_postal_code = get_result
-            print('Successfully retrieved postal code from Singpost for')
+        postal_code_changes['trimmed'] += 1
+    else:
+        #get the postal code from another element with the same address,
+        #or by querying the Singapore Post website
+        new_postal_code = indexed_postal_code(house_number, street_name)
+        if new_postal_code is not None:
+            print('Found postal code in the address index for')
         else:
-            new_postal_code = old_postal_code
-            print('Error retrieving postal code from Singpost for')
+            get_result = postal_code_lookup(house_number, street_name)
+            postal_code_changes['lookup'] += 1
+            if get_result != 'Error':
+                new_postal_code = get_result
+                print('Successfully retrieved postal code from Singpost for')
+            else:
+                new_postal_code = old_postal_code
+                postal_code_changes['lookup_failed'] += 1
+                print('Error retrieving postal code from Singpost for')
     
     print(house_number + ' ' + street_name)
     print(old_postal_code + ' --> ' + str(new_postal_code))
@@ -0,0 +1,214 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 16:48:20 2026
+
+@author: rogerduong
+
+Validation of the shaped elements against schema.schema. The schema is
+compiled once into one checker function per element key, which only tries
+the type coercions and required fields of each row; the detailed errors are
+only worked out for the elements that fail.
+"""
+
+import schema
+
+SCHEMA = schema.schema
+
+# Python type of the cerberus types used in schema.py
+TYPES = {'integer': int, 'float': float, 'string': str}
+
+
+class ValidationError(Exception):
+    """Raised when a shaped element does not match the schema"""
+
+
+def field_statements(expr, rule):
+    """Return the lines of code checking a field value
+
+    Args:
+        expr: Python expression of the field value
+        rule: cerberus rule of the field
+    Returns:
+        list of lines of code, raising KeyError, TypeError or ValueError
+        if the value does not match the rule
+    """
+    coerce = rule.get('coerce')
+    if coerce is not None:
+        # The coerced value is the one of the rule type
+        return ['{0}({1})'.format(coerce.__name__, expr)]
+    return ['if not isinstance({0}, {1}): raise TypeError'.format(
+        expr, TYPES[rule['type']].__name__)]
+
+def compile_rows(key, rule, fields=None):
+    """Compile the checker of the value of an element key
+
+    Args:
+        key: element key ('node', 'node_tags', ...)
+        rule: cerberus rule of the key ('dict' or 'list' of 'dict')
+        fields: list of fields if the rows are tuples in this order, None if
+            the rows are dictionaries
+    Returns:
+        function checking the value, raising KeyError, TypeError or
+        ValueError if it does not match the rule
+    """
+    is_list = rule['type'] == 'list'
+    row_rule = rule['schema']['schema'] if is_list else rule['schema']
+
+    body = []
+    if fields is None:
+        body.append('if len(row) != {0}: raise KeyError'.format(len(row_rule)))
+        for name, field_rule in row_rule.items():
+            if field_rule.get('required'):
+                body.extend(field_statements('row[{0!r}]'.format(name), field_rule))
+            else:
+                body.append('value = row.get({0!r})'.format(name))
+                body.append('if value is not None:')
+                body.extend('    ' + line
+                            for line in field_statements('value', field_rule))
+    else:
+        body.append('if len(row) != {0}: raise KeyError'.format(len(fields)))
+        for i, name in enumerate(fields):
+            body.extend(field_statements('row[{0}]'.format(i), row_rule[name]))
+
+    if is_list:
+        lines = ['for row in rows:'] + ['    ' + line for line in body]
+    else:
+        lines = ['row = rows'] + body
+    source = 'def check_{0}(rows):\n{1}\n'.format(
+        key, '\n'.join('    ' + line for line in lines))
+
+    namespace = {}
+    exec(compile(source, '<schema {0}>'.format(key), 'exec'), namespace)
+    return namespace['check_' + key]
+
+def row_errors(row, row_rule, fields=None):
+    """Return the error messages of a row, in the style of cerberus
+
+    Args:
+        row: dictionary, or tuple in the order of fields
+        row_rule: dictionary of field: cerberus rule
+        fields: list of fields if row is a tuple
+    Returns:
+        dictionary of field: list of error messages
+    """
+    if fields is not None:
+        if not isinstance(row, (tuple, list)) or len(row) != len(fields):
+            return {'': ['must be a tuple of {0} fields'.format(len(fields))]}
+        row = dict(zip(fields, row))
+    elif not isinstance(row, dict):
+        return {'': ['must be of dict type']}
+
+    errors = {}
+    for name in row:
+        if name not in row_rule:
+            errors[name] = ['unknown field']
+    for name, rule in row_rule.items():
+        if name not in row or row[name] is None:
+            if rule.get('required'):
+                errors[name] = ['required field']
+            continue
+        try:
+            for line in field_statements('value', rule):
+                exec(line, {}, {'value': row[name]})
+        except (TypeError, ValueError) as e:
+            if rule.get('coerce') is not None:
+                errors[name] = ["field '{0}' cannot be coerced: {1}".format(name, e)]
+            else:
+                errors[name] = ['must be of {0} type'.format(rule['type'])]
+    return errors
+
+
+class ElementValidator(object):
+    """Validator of shaped elements compiled from schema.schema
+
+    Args:
+        schema: cerberus schema of the shaped elements
+        tuple_fields: dictionary of element key: list of fields, for the keys
+            whose rows are tuples (way_nodes, relation_members)
+    """
+
+    def __init__(self, schema=SCHEMA, tuple_fields=None):
+        self.schema = schema
+        self.tuple_fields = tuple_fields or {}
+        self.checkers = {key: compile_rows(key, rule, self.tuple_fields.get(key))
+                         for key, rule in schema.items()}
+
+    def is_valid(self, element):
+        """Return True if the shaped element matches the schema"""
+        try:
+            for key, value in element.items():
+                self.checkers[key](value)
+        except (KeyError, TypeError, ValueError):
+            return False
+        return True
+
+    def errors(self, element):
+        """Return the errors of a shaped element
+
+        Args:
+            element: shaped element
+        Returns:
+            dictionary of element key: {row index or field: errors}, empty
+            if the element is valid
+        """
+        if self.is_valid(element):
+            return {}
+
+        errors = {}
+        for key, value in element.items():
+            if key not in self.schema:
+                errors[key] = ['unknown field']
+                continue
+            rule = self.schema[key]
+            fields = self.tuple_fields.get(key)
+            if rule['type'] == 'list':
+                row_rule = rule['schema']['schema']
+                key_errors = {}
+                for i, row in enumerate(value):
+                    row_error = row_errors(row, row_rule, fields)
+                    if row_error:
+                        key_errors[i] = row_error
+            else:
+                key_errors = row_errors(value, rule['schema'], fields)
+            if key_errors:
+                errors[key] = key_errors
+        return errors
+
+    def validate(self, element):
+        """Raise ValidationError if the shaped element does not match the schema"""
+        errors = self.errors(element)
+        if errors:
+            field, field_errors = next(iter(errors.items()))
+            raise ValidationError(
+                "\nElement {0} of type '{1}' has the following errors:\n{2}".format(
+                    element_id(element), field, field_errors))
+
+    def validate_batch(self, elements):
+        """Validate a batch of shaped elements
+
+        Args:
+            elements: iterable of shaped elements
+        Returns:
+            list of (element type, element id, errors) of the invalid elements
+        """
+        invalid = []
+        for element in elements:
+            if not self.is_valid(element):
+                invalid.append((element_type(element), element_id(element),
+                                self.errors(element)))
+        return invalid
+
+def element_type(element):
+    """Return the type (node, way or relation) of a shaped element"""
+    for key in ('node', 'way', 'relation'):
+        if key in element:
+            return key
+    return None
+
+def element_id(element):
+    """Return the id of a shaped element"""
+    key = element_type(element)
+    if key is None or not isinstance(element[key], dict):
+        return None
+    return element[key].get('id')